@@ -4,16 +4,21 @@ import json
 from typing import Optional, Dict, List
 
 from dotenv import load_dotenv
-from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough
 from langchain_openai import ChatOpenAI
 
 from agent.prompt.patch_agent import system_prompt
+from tool.lexical_index import LexicalIndex
+from tool.llm_cache import CachedChain
 from tool.patch_tool import PatchGenerator
+from tool.query_builder import build_retrieval_query, extract_traceback_frames
+from tool.retrieval import RetrievalContext
+from tool.upstream import get_upstream
 
 load_dotenv()
 LLM_MODEL = "arcee-ai/trinity-large-preview:free"
+# Chunks of repository code given to the model as context
+RETRIEVAL_K = 10
 openrouter_key = os.environ.get("OPEN_ROUTER_API_KEY")
 
 logging.basicConfig(
@@ -34,6 +39,8 @@ class PatchAgent:
         repo_name: str,
         model_name: str = LLM_MODEL,
         patches_dir: str = "./patches",
+        k: int = RETRIEVAL_K,
+        lexical: Optional[LexicalIndex] = None,
     ):
         """
         Initialize the patch agent.
@@ -44,25 +51,28 @@ class PatchAgent:
             repo_name: Repository name (GitHub)
             model_name: LLM model to use
             patches_dir: Directory to save generated patches
+            k: Number of code chunks retrieved as context
+            lexical: BM25 index of the same index version, for hybrid
+                retrieval
         """
         self.repo_owner = repo_owner
         self.repo_name = repo_name
         self.patches_dir = patches_dir
         
+        temperature = 0.1
         self._llm = ChatOpenAI(
             model=model_name,
             openai_api_base="https://openrouter.ai/api/v1",
-            temperature=0.1,
+            temperature=temperature,
             api_key=openrouter_key,
         )
-        self._retriever = vectorstore.as_retriever(search_kwargs={"k": 10})
+        self._vectorstore = vectorstore
+        self._lexical = lexical
+        self.k = k
         self._prompt = ChatPromptTemplate.from_template(system_prompt)
         
-        self._patch_gen_chain = (
-            {"context": self._retriever, "question": RunnablePassthrough()}
-            | self._prompt
-            | self._llm
-            | StrOutputParser()
+        self._patch_gen_chain = CachedChain(
+            self._prompt, self._llm, model_name, temperature
         )
         
         self._patch_generator = PatchGenerator(
@@ -71,6 +81,28 @@ class PatchAgent:
         
         logger.info(f"PatchAgent initialized for {repo_owner}/{repo_name}")
 
+    def _retrieval(
+        self,
+        issue_title: str,
+        issue_body: str,
+        custom_query: Optional[str],
+        retrieval: Optional[RetrievalContext],
+    ) -> RetrievalContext:
+        if retrieval is not None:
+            return retrieval
+        # Search for the issue itself; the analysis in the prompt is prose
+        if custom_query:
+            query = build_retrieval_query(custom_query)
+        else:
+            query = build_retrieval_query(issue_body, title=issue_title)
+        return RetrievalContext(
+            self._vectorstore,
+            query,
+            self.k,
+            self._lexical,
+            frames=extract_traceback_frames(custom_query or issue_body),
+        )
+
     def generate_patch(
         self,
         issue_id: int,
@@ -78,6 +110,7 @@ class PatchAgent:
         issue_body: str,
         analysis: str,
         custom_query: Optional[str] = None,
+        retrieval: Optional[RetrievalContext] = None,
     ) -> Dict:
         """
         Generate a patch from an issue analysis.
@@ -88,14 +121,80 @@ class PatchAgent:
             issue_body: Issue description
             analysis: AI analysis of the issue
             custom_query: Optional custom query for the agent
+            retrieval: Retrieval shared with the agent that analysed the
+                issue; by default a compact query built from the issue is
+                searched for
 
         Returns:
-            Dictionary containing patch generation results
+            Dictionary containing patch generation results; ``cached`` tells
+            whether the specification came from the LLM response cache
         """
         logger.info(f"Generating patch for issue #{issue_id}: {issue_title}")
+        query = self._build_query(
+            issue_id, issue_title, issue_body, analysis, custom_query
+        )
+
+        try:
+            # Get patch specification from agent
+            context = self._retrieval(
+                issue_title, issue_body, custom_query, retrieval
+            ).documents(self.k)
+            patch_spec, cached = self._patch_gen_chain.invoke({"context": context, "question": query})
+            result = self._save_patch(
+                issue_id, issue_title, issue_body, analysis, patch_spec
+            )
+            return {**result, "cached": cached}
+        except Exception as e:
+            logger.error(f"Error generating patch: {e}", exc_info=True)
+            return {
+                "status": "error",
+                "message": str(e),
+                "issue_id": issue_id,
+            }
+
+    async def agenerate_patch(
+        self,
+        issue_id: int,
+        issue_title: str,
+        issue_body: str,
+        analysis: str,
+        custom_query: Optional[str] = None,
+        retrieval: Optional[RetrievalContext] = None,
+    ) -> Dict:
+        """Async ``generate_patch`` for the request path; never blocks the event loop."""
+        logger.info(f"Generating patch for issue #{issue_id}: {issue_title}")
+        query = self._build_query(
+            issue_id, issue_title, issue_body, analysis, custom_query
+        )
+
+        try:
+            context = await self._retrieval(
+                issue_title, issue_body, custom_query, retrieval
+            ).adocuments(self.k)
+            patch_spec, cached = await self._patch_gen_chain.ainvoke(
+                {"context": context, "question": query}
+            )
+            result = await get_upstream("files").run(
+                self._save_patch, issue_id, issue_title, issue_body, analysis, patch_spec
+            )
+            return {**result, "cached": cached}
+        except Exception as e:
+            logger.error(f"Error generating patch: {e}", exc_info=True)
+            return {
+                "status": "error",
+                "message": str(e),
+                "issue_id": issue_id,
+            }
 
-        # Prepare the query for the agent
-        query = custom_query or f"""
+    @staticmethod
+    def _build_query(
+        issue_id: int,
+        issue_title: str,
+        issue_body: str,
+        analysis: str,
+        custom_query: Optional[str],
+    ) -> str:
+        return custom_query or f"""
 Based on this GitHub issue and analysis, generate a detailed patch/fix:
 
 **Issue #{issue_id}: {issue_title}**
@@ -116,69 +215,84 @@ Please provide:
 Format your response as a structured patch specification that can be converted to a git patch.
 """
 
-        try:
-            # Get patch specification from agent
-            patch_spec = self._patch_gen_chain.invoke({"context": self._retriever, "question": query})
-            
-            logger.info("Patch specification generated")
-            
-            # Parse the patch specification
-            changes = self._parse_patch_specification(patch_spec)
-            
-            if not changes:
-                logger.warning("No code changes found in patch specification")
-                return {
-                    "status": "warning",
-                    "message": "Patch specification generated but contains no code changes",
-                    "specification": patch_spec,
-                }
-            
-            # Create the actual patch file
-            patch_filename = f"issue_{issue_id}_{self.repo_name}_fix.patch"
-            patch_path = self._patch_generator.create_patch_file(
-                changes=changes,
-                patch_name=patch_filename,
-                description=f"Fix for {issue_title}\n\nIssue: #{issue_id}\n{issue_body[:500]}",
-                author="GIAS Patch Agent",
-            )
-            
-            # Save metadata
-            changed_files = list(changes.keys())
-            metadata_path = self._patch_generator.save_patch_metadata(
-                patch_filename=patch_filename,
-                issue_id=issue_id,
-                issue_title=issue_title,
-                analysis=analysis,
-                files_changed=changed_files,
-            )
-            
-            # Create commit message
-            commit_message = self._patch_generator.create_commit_message(
-                issue_id=issue_id,
-                issue_title=issue_title,
-                description=analysis[:1000],
-            )
-            
-            logger.info(f"Patch generated successfully: {patch_path}")
-            
+    def _save_patch(
+        self,
+        issue_id: int,
+        issue_title: str,
+        issue_body: str,
+        analysis: str,
+        patch_spec: str,
+    ) -> Dict:
+        """
+        Turn a patch specification into a patch file with metadata.
+
+        The patch is checked against the repository's cached checkout; one
+        that does not apply cleanly is reported as a warning. If the checkout
+        is missing or busy the check is skipped and ``applies_cleanly`` is None.
+        """
+        logger.info("Patch specification generated")
+
+        # Parse the patch specification
+        changes = self._parse_patch_specification(patch_spec)
+
+        if not changes:
+            logger.warning("No code changes found in patch specification")
             return {
-                "status": "success",
-                "issue_id": issue_id,
-                "issue_title": issue_title,
-                "patch_file": patch_path,
-                "metadata_file": metadata_path,
-                "commit_message": commit_message,
-                "files_changed": changed_files,
+                "status": "warning",
+                "message": "Patch specification generated but contains no code changes",
                 "specification": patch_spec,
             }
 
-        except Exception as e:
-            logger.error(f"Error generating patch: {e}", exc_info=True)
-            return {
-                "status": "error",
-                "message": str(e),
-                "issue_id": issue_id,
-            }
+        # Create the actual patch file
+        patch_filename = f"issue_{issue_id}_{self.repo_name}_fix.patch"
+        patch_path = self._patch_generator.create_patch_file(
+            changes=changes,
+            patch_name=patch_filename,
+            description=f"Fix for {issue_title}\n\nIssue: #{issue_id}\n{issue_body[:500]}",
+            author="GIAS Patch Agent",
+        )
+
+        # Save metadata
+        changed_files = list(changes.keys())
+        metadata_path = self._patch_generator.save_patch_metadata(
+            patch_name=patch_filename,
+            issue_id=issue_id,
+            issue_title=issue_title,
+            analysis=analysis,
+            files_changed=changed_files,
+        )
+
+        # Create commit message
+        commit_message = self._patch_generator.create_commit_message(
+            issue_id=issue_id,
+            issue_title=issue_title,
+            description=analysis[:1000],
+        )
+
+        # The changes come from the model's view of the code, which may be
+        # stale or paraphrased; a patch that does not apply is still saved
+        applies = self._patch_generator.check_patch_against_repo(patch_path)
+        if applies is False:
+            logger.warning(f"Patch does not apply cleanly: {patch_path}")
+            status = "warning"
+            message = "Patch generated but does not apply cleanly to the indexed code"
+        else:
+            logger.info(f"Patch generated successfully: {patch_path}")
+            status = "success"
+            message = None if applies else "Patch generated but not checked"
+
+        return {
+            "status": status,
+            "message": message,
+            "applies_cleanly": applies,
+            "issue_id": issue_id,
+            "issue_title": issue_title,
+            "patch_file": patch_path,
+            "metadata_file": metadata_path,
+            "commit_message": commit_message,
+            "files_changed": changed_files,
+            "specification": patch_spec,
+        }
 
     def _parse_patch_specification(self, spec_text: str) -> Dict[str, Dict[str, str]]:
         """
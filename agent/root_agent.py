@@ -1,15 +1,20 @@
 import logging
 import os
+from typing import AsyncIterator, Dict, Optional, Tuple
 
 from dotenv import load_dotenv
-from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough
 from langchain_openai import ChatOpenAI
 
 from agent.prompt.root_agent import system_prompt
+from tool.lexical_index import LexicalIndex
+from tool.llm_cache import CachedChain
+from tool.query_builder import build_retrieval_query, extract_traceback_frames
+from tool.retrieval import RetrievalContext
 
 LLM_MODEL = "arcee-ai/trinity-large-preview:free"
+# Chunks of repository code given to the model as context
+RETRIEVAL_K = 5
 load_dotenv()
 openrouter_key = os.environ.get("OPEN_ROUTER_API_KEY")
 
@@ -22,25 +27,91 @@ logger = logging.getLogger(__name__)
 
 
 class root_agent:
-    def __init__(self, vectorstore, model_name: str = LLM_MODEL):
+    def __init__(
+        self,
+        vectorstore,
+        model_name: str = LLM_MODEL,
+        k: int = RETRIEVAL_K,
+        lexical: Optional[LexicalIndex] = None,
+    ):
+        temperature = 0.1
         self._llm = ChatOpenAI(
             model=model_name,
             openai_api_base="https://openrouter.ai/api/v1",
-            temperature=0.1,
+            temperature=temperature,
             api_key=openrouter_key,
         )
-        self._retriever = vectorstore.as_retriever(search_kwargs={"k": 5})
+        self._vectorstore = vectorstore
+        # BM25 index of the same version, for hybrid retrieval
+        self._lexical = lexical
+        self.model_name = model_name
+        self.k = k
         self._prompt = ChatPromptTemplate.from_template(system_prompt)
-        self._rag_chain = (
-            {"context": self._retriever, "question": RunnablePassthrough()}
-            | self._prompt
-            | self._llm
-            | StrOutputParser()
-        )
+        self._rag_chain = CachedChain(self._prompt, self._llm, model_name, temperature)
         logger.info("Root agent initialized successfully.")
 
-    def run(self, user_input: str) -> str:
-        result = self._rag_chain.invoke(
-            {"context": self._retriever, "question": user_input}
+    def _retrieval(
+        self, user_input: str, retrieval: Optional[RetrievalContext]
+    ) -> RetrievalContext:
+        if retrieval is not None:
+            return retrieval
+        return RetrievalContext(
+            self._vectorstore,
+            build_retrieval_query(user_input),
+            self.k,
+            self._lexical,
+            frames=extract_traceback_frames(user_input),
+        )
+
+    def answer(
+        self, user_input: str, retrieval: Optional[RetrievalContext] = None
+    ) -> Dict:
+        """
+        Answer ``user_input`` from the top-k chunks of the repository.
+
+        Args:
+            user_input: Issue or question
+            retrieval: Retrieval shared with other agents serving the same
+                request; by default a compact query built from
+                ``user_input`` is searched for
+
+        Returns:
+            Dictionary with the ``result`` and whether it was ``cached``
+        """
+        context = self._retrieval(user_input, retrieval).documents(self.k)
+        result, cached = self._rag_chain.invoke(
+            {"context": context, "question": user_input}
         )
-        return result
+        return {"result": result, "cached": cached}
+
+    async def aanswer(
+        self, user_input: str, retrieval: Optional[RetrievalContext] = None
+    ) -> Dict:
+        """Async ``answer`` for the request path; never blocks the event loop."""
+        context = await self._retrieval(user_input, retrieval).adocuments(self.k)
+        result, cached = await self._rag_chain.ainvoke(
+            {"context": context, "question": user_input}
+        )
+        return {"result": result, "cached": cached}
+
+    async def astream(
+        self, user_input: str, retrieval: Optional[RetrievalContext] = None
+    ) -> AsyncIterator[Tuple[str, bool]]:
+        """
+        Stream the answer to ``user_input`` as ``(chunk, cached)`` pairs.
+
+        A cached answer arrives as a single chunk.
+        """
+        context = await self._retrieval(user_input, retrieval).adocuments(self.k)
+        async for chunk, cached in self._rag_chain.astream(
+            {"context": context, "question": user_input}
+        ):
+            yield chunk, cached
+
+    def run(self, user_input: str, retrieval: Optional[RetrievalContext] = None) -> str:
+        return self.answer(user_input, retrieval)["result"]
+
+    async def arun(
+        self, user_input: str, retrieval: Optional[RetrievalContext] = None
+    ) -> str:
+        return (await self.aanswer(user_input, retrieval))["result"]
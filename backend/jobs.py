@@ -0,0 +1,304 @@
+"""
+In-process queue for RAG index builds.
+
+Cloning, chunking and embedding a repository takes minutes, far longer than
+an HTTP request should stay open. Builds are therefore submitted as jobs and
+run on a small pool of worker threads; clients poll the job for its status
+and progress (files loaded, chunks embedded, estimated time left) and may
+cancel it.
+
+There is at most one queued or running job per repository: submitting a
+build for a repository that already has one attaches to it instead of
+starting a second build.
+"""
+
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from tool.rag_pipeline import PipelineCancelled
+
+load_dotenv()
+BUILD_WORKERS = int(os.getenv("GIAS_BUILD_WORKERS", 1))
+BUILD_JOB_HISTORY = int(os.getenv("GIAS_BUILD_JOB_HISTORY", 100))
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class BuildJob:
+    """One submitted build and its progress."""
+
+    def __init__(self, owner: str, repo: str, params: Dict):
+        self.id = uuid.uuid4().hex[:12]
+        self.owner = owner
+        self.repo = repo
+        self.params = params
+        self.status = QUEUED
+        self.phase = QUEUED
+        self.progress: Dict = {}
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        # The exception a failed build raised, for callers waiting on the job
+        self.exception: Optional[BaseException] = None
+        # Submits that were attached to this job instead of starting a build
+        self.attached = 0
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.cancel_event = threading.Event()
+        self._phase_started_at = self.created_at
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def key(self) -> str:
+        return f"{self.owner}/{self.repo}"
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def update(self, progress: Dict):
+        """
+        Merge build progress into the job.
+
+        A ``phase`` key switches the job to a new phase (e.g. ``checkout``,
+        ``copying``, ``embedding``); the rate behind the ETA is measured from
+        the start of the current phase.
+        """
+        with self._lock:
+            progress = dict(progress)
+            phase = progress.pop("phase", None)
+            if phase is not None and phase != self.phase:
+                self.phase = phase
+                self._phase_started_at = time.time()
+            self.progress.update(progress)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the job has finished; False if ``timeout`` expired."""
+        return self._done.wait(timeout)
+
+    def _start(self) -> bool:
+        with self._lock:
+            if self.status != QUEUED:
+                return False
+            self.status = RUNNING
+            self.started_at = time.time()
+            return True
+
+    def _cancel_queued(self) -> bool:
+        """Cancel the job if no worker has started it yet."""
+        with self._lock:
+            if self.status != QUEUED:
+                return False
+            self.status = self.phase = CANCELLED
+            self.error = "Cancelled before start"
+            self.finished_at = time.time()
+        self._done.set()
+        return True
+
+    def _finish(
+        self,
+        status: str,
+        result: Optional[Dict] = None,
+        exception: Optional[BaseException] = None,
+    ):
+        with self._lock:
+            if self._done.is_set():
+                return
+            self.status = status
+            self.phase = status
+            self.result = result
+            self.exception = exception
+            self.error = str(exception) if exception is not None else None
+            self.finished_at = time.time()
+        self._done.set()
+
+    def eta_seconds(self) -> Optional[float]:
+        """
+        Estimated seconds until the embedding phase completes.
+
+        The total number of chunks is extrapolated from the chunks per file
+        split so far and the number of files to index; the rate is the
+        chunks upserted since embedding started. None until both are known.
+        """
+        with self._lock:
+            if self.phase != "embedding":
+                return None
+            files_total = self.progress.get("files_total")
+            files_split = self.progress.get("files_split", 0)
+            chunks_split = self.progress.get("chunks_split", 0)
+            chunks_upserted = self.progress.get("chunks_upserted", 0)
+            elapsed = time.time() - self._phase_started_at
+        if not files_total or not files_split or not chunks_upserted or elapsed <= 0:
+            return None
+        chunks_total = chunks_split * max(files_total, files_split) / files_split
+        rate = chunks_upserted / elapsed
+        return max(0.0, (chunks_total - chunks_upserted) / rate)
+
+    def to_dict(self) -> Dict:
+        eta = self.eta_seconds()
+        with self._lock:
+            return {
+                "id": self.id,
+                "owner": self.owner,
+                "repo": self.repo,
+                "params": dict(self.params),
+                "status": self.status,
+                "phase": self.phase,
+                "progress": dict(self.progress),
+                "eta_seconds": eta,
+                "result": self.result,
+                "error": self.error,
+                "attached": self.attached,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+            }
+
+
+class BuildJobQueue:
+    """Runs build jobs on a bounded pool of worker threads."""
+
+    def __init__(
+        self,
+        run_build: Callable[..., Dict],
+        workers: int = BUILD_WORKERS,
+        max_history: int = BUILD_JOB_HISTORY,
+    ):
+        """
+        Args:
+            run_build: Called as ``run_build(owner, repo, cancel_event=...,
+                on_progress=..., **params)`` on a worker thread; returns the
+                build result and raises ``PipelineCancelled`` when cancelled
+            workers: Builds running at the same time
+            max_history: Finished jobs kept for status queries
+        """
+        self.run_build = run_build
+        self.workers = max(1, workers)
+        self.max_history = max_history
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="rag-build"
+        )
+        self._jobs: "OrderedDict[str, BuildJob]" = OrderedDict()
+        # repository -> its queued or running job
+        self._active: Dict[str, BuildJob] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, owner: str, repo: str, **params) -> Tuple[BuildJob, bool]:
+        """
+        Queue a build of ``owner/repo``.
+
+        Returns:
+            Tuple of (job, created). ``created`` is False if the repository
+            already had a queued or running job, which is returned instead;
+            ``params`` of the later submit are ignored in that case.
+        """
+        key = f"{owner}/{repo}"
+        with self._lock:
+            job = self._active.get(key)
+            if job is not None:
+                job.attached += 1
+                logger.info(f"Attached build request for {key} to job {job.id}")
+                return job, False
+            job = BuildJob(owner, repo, params)
+            self._jobs[job.id] = job
+            self._active[key] = job
+            self._trim()
+        logger.info(f"Queued build job {job.id} for {key}")
+        self._executor.submit(self._run, job)
+        return job, True
+
+    def _run(self, job: BuildJob):
+        if not job._start():
+            # Cancelled while queued
+            return
+        logger.info(f"Running build job {job.id} for {job.key}")
+        try:
+            result = self.run_build(
+                job.owner,
+                job.repo,
+                cancel_event=job.cancel_event,
+                on_progress=job.update,
+                **job.params,
+            )
+        except PipelineCancelled as e:
+            logger.info(f"Build job {job.id} for {job.key} cancelled")
+            job._finish(CANCELLED, exception=e)
+        except Exception as e:
+            logger.error(f"Build job {job.id} for {job.key} failed: {e}", exc_info=True)
+            job._finish(FAILED, exception=e)
+        else:
+            job._finish(SUCCEEDED, result=result)
+        finally:
+            self._release(job)
+
+    def _release(self, job: BuildJob):
+        with self._lock:
+            if self._active.get(job.key) is job:
+                del self._active[job.key]
+
+    def _trim(self):
+        """Forget the oldest finished jobs beyond ``max_history``."""
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[: max(0, len(finished) - self.max_history)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[BuildJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[BuildJob]:
+        """All known jobs, newest first."""
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def cancel(self, job_id: str) -> Optional[BuildJob]:
+        """
+        Cancel a job. A queued job is cancelled immediately; a running one
+        stops at its next checkpoint and keeps the live index untouched.
+
+        Returns:
+            The job, or None if it is unknown
+        """
+        job = self.get(job_id)
+        if job is None or job.done:
+            return job
+        job.cancel_event.set()
+        if job._cancel_queued():
+            self._release(job)
+        logger.info(f"Cancellation of build job {job.id} for {job.key} requested")
+        return job
+
+    def stats(self) -> Dict:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        counts: Dict[str, int] = {}
+        for job in jobs:
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {"workers": self.workers, "counts": counts}
+
+    def shutdown(self):
+        """Cancel every unfinished job and wait for the workers to stop."""
+        for job in self.list():
+            if not job.done:
+                self.cancel(job.id)
+        self._executor.shutdown(wait=True)
@@ -1,4 +1,4 @@
-from typing import Optional, List
+from typing import Dict, Optional, List
 
 from pydantic import BaseModel
 
@@ -8,6 +8,7 @@ class AnalysisRequest(BaseModel):
     repo: str
     issue_id: int
     query: Optional[str] = None
+    reuse_similar: bool = True  # Reuse the analysis of a near-duplicate issue
 
 
 class PatchInfo(BaseModel):
@@ -18,6 +19,7 @@ class PatchInfo(BaseModel):
     commit_message: Optional[str] = None
     files_changed: List[str] = []
     status: str = "not_generated"  # not_generated, success, failed, warning
+    cached: bool = False  # Specification served from the LLM response cache
 
 
 class AnalysisResponse(BaseModel):
@@ -27,16 +29,22 @@ class AnalysisResponse(BaseModel):
     analysis: str
     status: str
     patch: Optional[PatchInfo] = None  # NEW: Include patch info
+    cached: bool = False  # Result served from the LLM response cache
+    duplicate_of: Optional[int] = None  # Issue whose analysis was reused
+    similarity: Optional[float] = None  # Cosine similarity to that issue
 
 
 class QueryRequest(BaseModel):
     query: str
+    owner: Optional[str] = None  # Defaults to the last repository built
+    repo: Optional[str] = None
 
 
 class QueryResponse(BaseModel):
     result: str
     status: str
     patch: Optional[PatchInfo] = None  # NEW: Include patch info
+    cached: bool = False  # Result served from the LLM response cache
 
 
 class PatchGenerationRequest(BaseModel):
@@ -61,6 +69,7 @@ class PatchGenerationResponse(BaseModel):
     files_changed: List[str] = []
     specification: str = ""
     message: Optional[str] = None
+    cached: bool = False  # Specification served from the LLM response cache
 
 
 class RAGBuildRequest(BaseModel):
@@ -68,6 +77,7 @@ class RAGBuildRequest(BaseModel):
     owner: str
     repo: str
     save_code: bool = True  # Whether to save repository code to disk
+    incremental: bool = True  # Only re-embed files changed since the last build
 
 
 class RAGBuildResponse(BaseModel):
@@ -76,6 +86,45 @@ class RAGBuildResponse(BaseModel):
     message: str
     document_count: int
     saved_repo_path: Optional[str] = None
+    commit: Optional[str] = None
+    incremental: bool = False
+    files_reused: int = 0
+    chunks_reused: int = 0
+    files_reembedded: int = 0
+    chunks_reembedded: int = 0
+    files_deleted: int = 0
+
+
+class BuildJobInfo(BaseModel):
+    """Status and progress of a RAG build job"""
+    id: str
+    owner: str
+    repo: str
+    params: dict = {}
+    status: str  # queued, running, succeeded, failed, cancelled
+    phase: str  # status, or checkout/copying/embedding while running
+    progress: dict = {}  # files_total, files_loaded, chunks_embedded, ...
+    eta_seconds: Optional[float] = None
+    result: Optional[dict] = None  # RAGBuildResponse fields once succeeded
+    error: Optional[str] = None
+    attached: int = 0  # Build requests joined to this job
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+
+class BuildJobSubmitResponse(BaseModel):
+    """Response to a build job submission"""
+    status: str  # queued, or attached to an existing job
+    message: str
+    job: BuildJobInfo
+
+
+class BuildJobListResponse(BaseModel):
+    """Recent build jobs"""
+    jobs: List[BuildJobInfo] = []
+    workers: int
+    counts: Dict[str, int] = {}
 
 
 class PatchListResponse(BaseModel):
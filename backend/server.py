@@ -1,24 +1,30 @@
 import asyncio
+import json
 import logging
 import os
 import sys
-from typing import Optional
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Callable, Optional
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from langchain_community.embeddings import OllamaEmbeddings
-from langchain_community.vectorstores import Chroma
 from pydantic import BaseModel
 
 from agent.root_agent import root_agent
 from agent.patch_agent import PatchAgent
+from backend.jobs import CANCELLED, SUCCEEDED, BuildJob, BuildJobQueue
 from backend.model import (
     AnalysisRequest,
     AnalysisResponse,
+    BuildJobInfo,
+    BuildJobListResponse,
+    BuildJobSubmitResponse,
     QueryRequest,
     QueryResponse,
     PatchInfo,
@@ -28,8 +34,26 @@ from backend.model import (
     RAGBuildResponse,
     PatchListResponse,
 )
-from tool.github_tool import get_issue_by_issue_id, get_repo_content_by_git
-from tool.rag_tool import create_rag_knowledge_base
+from tool.github_api import get_github_api
+from tool.github_tool import get_issue_by_issue_id, checkout_repo_changes
+from tool.index_registry import IndexHandle, IndexNotFoundError, get_index_registry
+from tool.rag_tool import (
+    CHROMA_DB_PATH,
+    create_rag_knowledge_base,
+    get_embeddings,
+    get_splitter,
+    load_index_state,
+    open_lexical_index,
+    read_index_state,
+    update_rag_knowledge_base,
+)
+from tool.analysis_cache import get_analysis_cache
+from tool.lexical_index import LexicalIndex
+from tool.llm_cache import get_llm_cache
+from tool.query_builder import build_retrieval_query, extract_traceback_frames
+from tool.retrieval import RetrievalContext
+from tool.snapshot import SNAPSHOT_PATHS, SnapshotError, open_snapshot
+from tool.upstream import get_upstream, upstream_stats
 
 logging.basicConfig(
     level=logging.INFO,
@@ -39,11 +63,8 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Configuration
-OLLAMA_EMBEDDING_MODEL = "embeddinggemma"
-OLLAMA_BASE_URL = "http://localhost:11434"
-CHROMA_DB_PATH = "./chroma_db"
 PATCHES_DIR = "./patches"
-# Default repository for patch agent initialization
+# Default repository for requests that do not name one
 DEFAULT_REPO_OWNER = "psf"
 DEFAULT_REPO_NAME = "requests"
 
@@ -59,125 +80,225 @@ app.add_middleware(
 )
 
 # Global variables
-_agent = None
-_vectorstore = None
-_patch_agent = None
+# Repository used by requests that do not name one (the last one built)
 _current_repo_owner = DEFAULT_REPO_OWNER
 _current_repo_name = DEFAULT_REPO_NAME
+# One build at a time per repository
+_build_locks = {}
+_build_locks_guard = threading.Lock()
 
 
 async def initialize_agent():
-    """Initialize the root agent with vectorstore"""
-    global _agent, _vectorstore
-
+    """Initialize embeddings and open the default repository's index"""
     try:
         logger.info("Initializing embeddings...")
-        embeddings = OllamaEmbeddings(
-            model=OLLAMA_EMBEDDING_MODEL, base_url=OLLAMA_BASE_URL
-        )
+        get_embeddings()
 
-        logger.info(f"Loading vectorstore from {CHROMA_DB_PATH}...")
-        _vectorstore = Chroma(
-            persist_directory=CHROMA_DB_PATH, embedding_function=embeddings
+        logger.info(
+            f"Opening index for {_current_repo_owner}/{_current_repo_name} "
+            f"from {CHROMA_DB_PATH}..."
         )
-
-        logger.info("Initializing root agent...")
-        _agent = root_agent(_vectorstore)
+        handle = await get_upstream("retrieval").run(
+            get_index_registry().get, _current_repo_owner, _current_repo_name
+        )
+        await _get_agent(handle)
         logger.info("Agent initialized successfully")
+    except IndexNotFoundError:
+        logger.warning(
+            f"No index for {_current_repo_owner}/{_current_repo_name} yet. "
+            f"Call /api/build-rag to build one."
+        )
     except Exception as e:
         logger.error(f"Failed to initialize agent: {e}")
         raise
 
 
-def _initialize_patch_agent():
-    """Initialize patch agent for current repository"""
-    global _patch_agent, _vectorstore, _current_repo_owner, _current_repo_name
-    
-    if _vectorstore and _current_repo_owner and _current_repo_name:
-        _patch_agent = PatchAgent(
-            _vectorstore,
-            _current_repo_owner,
-            _current_repo_name,
+async def _get_index(owner: str, repo: str) -> IndexHandle:
+    """Return the index of a repository or fail the request with 404"""
+    try:
+        # Opening an index reads it from disk
+        return await get_upstream("retrieval").run(
+            get_index_registry().get, owner, repo
+        )
+    except IndexNotFoundError:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No index for {owner}/{repo}. Please call /api/build-rag first.",
+        )
+
+
+@asynccontextmanager
+async def _lease_index(owner: str, repo: str):
+    """
+    Pin the live index version of a repository for one request (404 if none).
+
+    A build swapping in a new version meanwhile does not affect the request;
+    the version it holds is dropped only after the lease is released.
+    Acquiring (which may open the index) and releasing (which may drop a
+    retired version) run on the retrieval pool.
+    """
+    retrieval = get_upstream("retrieval")
+    lease = get_index_registry().lease(owner, repo)
+    try:
+        handle = await retrieval.run(lease.__enter__)
+    except IndexNotFoundError:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No index for {owner}/{repo}. Please call /api/build-rag first.",
+        )
+    try:
+        yield handle
+    finally:
+        # Shielded: a disconnecting client must not leak the lease
+        await asyncio.shield(retrieval.run(lease.__exit__, None, None, None))
+
+
+def _read_patch_file(patch_file: Optional[str]) -> Optional[str]:
+    """Content of a generated patch file to send to the frontend, if readable"""
+    if not patch_file or not os.path.exists(patch_file):
+        return None
+    try:
+        with open(patch_file, "r", encoding="utf-8") as f:
+            return f.read()
+    except Exception as e:
+        logger.warning(f"Could not read patch file: {e}")
+        return None
+
+
+def _get_lexical(handle: IndexHandle) -> Optional[LexicalIndex]:
+    """BM25 index of an index version, None if it was built without one"""
+    return handle.get_or_create(
+        "lexical", lambda: open_lexical_index(handle.collection)
+    )
+
+
+def _agent_of(handle: IndexHandle) -> root_agent:
+    """Root agent of an index, created on first use"""
+    # Resolved first: get_or_create holds the handle lock while creating
+    lexical = _get_lexical(handle)
+    return handle.get_or_create(
+        "agent", lambda: root_agent(handle.vectorstore, lexical=lexical)
+    )
+
+
+def _patch_agent_of(handle: IndexHandle) -> PatchAgent:
+    """Patch agent of an index, created on first use"""
+    lexical = _get_lexical(handle)
+
+    def create():
+        logger.info(f"Patch agent initialized for {handle.owner}/{handle.repo}")
+        return PatchAgent(
+            handle.vectorstore,
+            handle.owner,
+            handle.repo,
             patches_dir=PATCHES_DIR,
+            lexical=lexical,
         )
-        logger.info(f"Patch agent initialized for {_current_repo_owner}/{_current_repo_name}")
 
+    return handle.get_or_create("patch_agent", create)
 
-def _generate_patch_internal(
-    owner: str,
-    repo: str,
+
+def _retrieval_of(handle: IndexHandle, query: str, text: str) -> RetrievalContext:
+    k = max(_agent_of(handle).k, _patch_agent_of(handle).k)
+    return RetrievalContext(
+        handle.vectorstore,
+        query,
+        k,
+        _get_lexical(handle),
+        frames=extract_traceback_frames(text),
+    )
+
+
+# Creating the agents opens the lexical index and builds their chains, so
+# the first use of an index does it on the retrieval pool, like opening it
+
+
+async def _get_agent(handle: IndexHandle) -> root_agent:
+    """Root agent of an index, created on first use"""
+    return await get_upstream("retrieval").run(_agent_of, handle)
+
+
+async def _get_patch_agent(handle: IndexHandle) -> PatchAgent:
+    """Patch agent of an index, created on first use"""
+    return await get_upstream("retrieval").run(_patch_agent_of, handle)
+
+
+async def _new_retrieval(
+    handle: IndexHandle, query: str, text: str
+) -> RetrievalContext:
+    """
+    Retrieval for one request, deep enough for both agents
+
+    Args:
+        handle: Leased index of the repository
+        query: Compact query to search for
+        text: Issue body or question, whose traceback frames lead the context
+    """
+    return await get_upstream("retrieval").run(_retrieval_of, handle, query, text)
+
+
+async def _patch_info(result: dict) -> PatchInfo:
+    """
+    PatchInfo of a successful or warning patch generation result.
+
+    Carries the written patch file's content; a specification that yielded
+    no patch file is sent as is.
+    """
+    patch_file = result.get("patch_file")
+    patch_content = await get_upstream("files").run(_read_patch_file, patch_file)
+    if patch_content is None:
+        patch_content = result.get("specification", "")
+    return PatchInfo(
+        patch_file=patch_file,
+        patch_content=patch_content,
+        metadata_file=result.get("metadata_file"),
+        commit_message=result.get("commit_message"),
+        files_changed=result.get("files_changed", []),
+        status=result["status"],
+        cached=result.get("cached", False),
+    )
+
+
+async def _generate_patch_internal(
+    handle: IndexHandle,
     issue_id: int,
     issue_title: str,
     issue_body: str,
     analysis: str,
+    retrieval: Optional[RetrievalContext] = None,
 ) -> PatchInfo:
     """
     Internal helper to generate a patch and return PatchInfo.
     This is called automatically after analysis.
     
     Args:
-        owner: Repository owner
-        repo: Repository name
+        handle: Leased index of the repository
         issue_id: GitHub issue ID
         issue_title: Issue title
         issue_body: Issue description
         analysis: AI analysis result
+        retrieval: Retrieval of the analysis, reused as the patch context
         
     Returns:
         PatchInfo object with patch details or empty if generation failed
     """
     try:
-        # Only generate patch if patch agent is initialized and repo matches
-        if not _patch_agent:
-            logger.warning(
-                f"⚠️  Patch agent not initialized. "
-                f"Please call /api/build-rag with owner='{owner}' and repo='{repo}' first to enable patch generation."
-            )
-            return PatchInfo(status="not_generated")
-        
-        if _current_repo_owner != owner or _current_repo_name != repo:
-            logger.warning(
-                f"⚠️  Repository mismatch for patch generation. "
-                f"Expected: {_current_repo_owner}/{_current_repo_name}, "
-                f"Got: {owner}/{repo}. "
-                f"Please call /api/build-rag for {owner}/{repo} to generate patches for this repository."
-            )
-            return PatchInfo(status="not_generated")
-        
         logger.info(f"Auto-generating patch for issue #{issue_id}...")
-        
+
         # Generate the patch
-        result = _patch_agent.generate_patch(
+        patch_agent = await _get_patch_agent(handle)
+        result = await patch_agent.agenerate_patch(
             issue_id=issue_id,
             issue_title=issue_title,
             issue_body=issue_body,
             analysis=analysis,
+            retrieval=retrieval,
         )
         
-        if result["status"] == "success":
-            # Read patch content to send to frontend
-            patch_content = None
-            patch_file = result.get("patch_file")
-            if patch_file and os.path.exists(patch_file):
-                try:
-                    with open(patch_file, "r", encoding="utf-8") as f:
-                        patch_content = f.read()
-                except Exception as e:
-                    logger.warning(f"Could not read patch file: {e}")
-            
-            return PatchInfo(
-                patch_file=patch_file,
-                patch_content=patch_content,
-                metadata_file=result.get("metadata_file"),
-                commit_message=result.get("commit_message"),
-                files_changed=result.get("files_changed", []),
-                status="success",
-            )
-        elif result["status"] == "warning":
-            return PatchInfo(
-                patch_content=result.get("specification", ""),
-                status="warning",
-            )
+        if result["status"] in ("success", "warning"):
+            if result["status"] == "warning":
+                logger.warning(f"Patch generated with warning: {result.get('message')}")
+            return await _patch_info(result)
         else:
             logger.warning(f"Patch generation failed: {result.get('message')}")
             return PatchInfo(status="failed")
@@ -187,14 +308,72 @@ def _generate_patch_internal(
         return PatchInfo(status="failed")
 
 
+async def _similar_analysis_response(
+    similar: dict, issue_url: str, issue_title: str, issue_body: str
+) -> AnalysisResponse:
+    """AnalysisResponse for an issue answered with the analysis of a near-duplicate"""
+    patch = similar["patch"]
+    patch_content = await get_upstream("files").run(
+        _read_patch_file, patch["patch_file"]
+    )
+    return AnalysisResponse(
+        issue_url=issue_url,
+        issue_title=issue_title,
+        issue_body=issue_body[:500],
+        analysis=similar["analysis"],
+        status="success",
+        patch=PatchInfo(patch_content=patch_content, cached=True, **patch),
+        cached=True,
+        duplicate_of=similar["issue_id"],
+        similarity=similar["similarity"],
+    )
+
+
+def _prune_analyses():
+    """Delete stored analyses of index versions that are no longer live"""
+    analysis_cache = get_analysis_cache()
+    if analysis_cache is not None:
+        analysis_cache.prune(
+            index["collection"] for index in get_index_registry().list()
+        )
+
+
+def _mount_snapshots():
+    """Serve the snapshots listed in GIAS_SNAPSHOTS read-only"""
+    registry = get_index_registry()
+    for path in SNAPSHOT_PATHS:
+        start = time.perf_counter()
+        try:
+            snapshot = open_snapshot(path)
+        except (SnapshotError, OSError) as e:
+            logger.error(f"Could not mount snapshot {path}: {e}")
+            continue
+        if read_index_state(snapshot.owner, snapshot.repo) is not None:
+            logger.info(
+                f"Not mounting {path}: {snapshot.owner}/{snapshot.repo} has a local index"
+            )
+            continue
+        handle = registry.mount(
+            snapshot.owner, snapshot.repo, snapshot.vectorstore, snapshot.info()
+        )
+        handle.get_or_create("lexical", lambda: snapshot.lexical)
+        logger.info(
+            f"Mounted snapshot {path} for {snapshot.owner}/{snapshot.repo} "
+            f"in {(time.perf_counter() - start) * 1000:.0f}ms"
+        )
+
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize agent on startup"""
+    # Index versions orphaned by a crash during a previous build or swap
+    dropped = get_index_registry().collect_orphans()
+    if dropped:
+        logger.info(f"Dropped {len(dropped)} orphaned index versions")
+    _mount_snapshots()
+    _prune_analyses()
     await initialize_agent()
 
-    # Initialize patch agent with default repository
-    _initialize_patch_agent()
-
 # API Routes
 @app.get("/")
 async def read_root():
@@ -202,6 +381,72 @@ async def read_root():
     return FileResponse("server/frontend.html")
 
 
+async def _fetch_issue(request: AnalysisRequest) -> tuple[str, str, str]:
+    """Title, body and URL of the issue to analyze (404 if it cannot be fetched)"""
+    try:
+        issue = await get_upstream("github").run(
+            get_issue_by_issue_id,
+            f"{request.owner}/{request.repo}",
+            request.issue_id,
+        )
+        return issue.title, issue.body or "No description provided", issue.html_url
+    except Exception as e:
+        logger.error(f"Failed to fetch issue: {e}")
+        raise HTTPException(status_code=404, detail=f"Issue not found: {e}")
+
+
+def _analysis_queries(
+    request: AnalysisRequest, issue_title: str, issue_body: str
+) -> tuple[str, str]:
+    """Question for the root agent and query embedded for retrieval"""
+    if request.query:
+        return request.query, build_retrieval_query(request.query)
+    user_query = f"Issue Title: {issue_title}\n\nIssue Description:\n{issue_body}"
+    # Embed the title, error lines and identifiers, not the whole body
+    return user_query, build_retrieval_query(issue_body, title=issue_title)
+
+
+async def _find_similar_analysis(
+    analysis_cache, retrieval_query: str, handle: IndexHandle
+) -> Optional[dict]:
+    """Stored analysis of a near-duplicate issue against the same index version"""
+    agent = await _get_agent(handle)
+    similar = await get_upstream("retrieval").run(
+        analysis_cache.lookup, retrieval_query, handle.collection, agent.model_name
+    )
+    if similar is not None:
+        logger.info(
+            f"Reusing analysis of issue #{similar['issue_id']} "
+            f"(similarity {similar['similarity']:.3f})"
+        )
+    return similar
+
+
+async def _store_analysis(
+    analysis_cache,
+    retrieval_query: str,
+    handle: IndexHandle,
+    request: AnalysisRequest,
+    issue_url: str,
+    issue_title: str,
+    analysis: str,
+    patch_info: PatchInfo,
+):
+    """Store a completed analysis for reuse by near-duplicate issues"""
+    agent = await _get_agent(handle)
+    await get_upstream("retrieval").run(
+        analysis_cache.store,
+        retrieval_query,
+        handle.collection,
+        agent.model_name,
+        issue_id=request.issue_id,
+        issue_url=issue_url,
+        issue_title=issue_title,
+        analysis=analysis,
+        patch=patch_info.model_dump(),
+    )
+
+
 @app.post("/api/analyze-issue", response_model=AnalysisResponse)
 async def analyze_issue(request: AnalysisRequest):
     """
@@ -213,52 +458,66 @@ async def analyze_issue(request: AnalysisRequest):
         repo: Repository name
         issue_id: GitHub issue ID
         query: Optional custom query (if not provided, uses issue content)
+        reuse_similar: Answer with the stored analysis of a near-duplicate
+            issue, if the analysis cache is enabled
     """
     try:
-        if _agent is None:
-            raise HTTPException(
-                status_code=503,
-                detail="Agent not initialized. Please check Ollama and database connection.",
-            )
+        # Fail fast before fetching the issue
+        await _get_index(request.owner, request.repo)
 
         logger.info(
             f"Analyzing issue: {request.owner}/{request.repo}#{request.issue_id}"
         )
 
-        # Fetch issue from GitHub
-        try:
-            issue = get_issue_by_issue_id(
-                f"{request.owner}/{request.repo}", request.issue_id
-            )
-            issue_title = issue.title
-            issue_body = issue.body or "No description provided"
-            issue_url = issue.html_url
-        except Exception as e:
-            logger.error(f"Failed to fetch issue: {e}")
-            raise HTTPException(status_code=404, detail=f"Issue not found: {e}")
+        issue_title, issue_body, issue_url = await _fetch_issue(request)
+        user_query, retrieval_query = _analysis_queries(
+            request, issue_title, issue_body
+        )
 
-        # Prepare query
-        if request.query:
-            user_query = request.query
-        else:
-            user_query = (
-                f"Issue Title: {issue_title}\n\nIssue Description:\n{issue_body}"
-            )
+        logger.info(
+            f"Running analysis with query length: {len(user_query)} "
+            f"(retrieval query: {len(retrieval_query)})"
+        )
 
-        logger.info(f"Running analysis with query length: {len(user_query)}")
+        # Analyses are reused only for the issue itself, not custom questions
+        analysis_cache = None if request.query else get_analysis_cache()
 
         # Run analysis through agent
-        analysis_result = _agent.run(user_query)
+        async with _lease_index(request.owner, request.repo) as handle:
+            if analysis_cache is not None and request.reuse_similar:
+                similar = await _find_similar_analysis(
+                    analysis_cache, retrieval_query, handle
+                )
+                if similar is not None:
+                    return await _similar_analysis_response(
+                        similar, issue_url, issue_title, issue_body
+                    )
 
-        # AUTO-GENERATE PATCH from analysis result
-        patch_info = _generate_patch_internal(
-            owner=request.owner,
-            repo=request.repo,
-            issue_id=request.issue_id,
-            issue_title=issue_title,
-            issue_body=issue_body,
-            analysis=analysis_result,
-        )
+            # One search serves the analysis and the patch
+            retrieval = await _new_retrieval(
+                handle, retrieval_query, request.query or issue_body
+            )
+            agent = await _get_agent(handle)
+            answer = await agent.aanswer(
+                user_query, retrieval=retrieval
+            )
+            analysis_result = answer["result"]
+
+            # AUTO-GENERATE PATCH from analysis result
+            patch_info = await _generate_patch_internal(
+                handle,
+                issue_id=request.issue_id,
+                issue_title=issue_title,
+                issue_body=issue_body,
+                analysis=analysis_result,
+                retrieval=retrieval,
+            )
+
+            if analysis_cache is not None:
+                await _store_analysis(
+                    analysis_cache, retrieval_query, handle, request,
+                    issue_url, issue_title, analysis_result, patch_info,
+                )
 
         return AnalysisResponse(
             issue_url=issue_url,
@@ -267,6 +526,7 @@ async def analyze_issue(request: AnalysisRequest):
             analysis=analysis_result,
             status="success",
             patch=patch_info,  # Include patch in response
+            cached=answer["cached"],
         )
 
     except HTTPException:
@@ -276,6 +536,127 @@ async def analyze_issue(request: AnalysisRequest):
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
 
+def _sse(event: str, data) -> str:
+    """One server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/api/analyze-issue/stream")
+async def analyze_issue_stream(request: AnalysisRequest):
+    """
+    Streaming variant of /api/analyze-issue, as server-sent events.
+
+    The request body is the same. Failures before the analysis starts (no
+    index, issue not found) are plain HTTP errors; afterwards the stream
+    carries these events, each with a JSON payload:
+
+        issue          {issue_url, issue_title, issue_body}
+        retrieval      {chunks} - code context retrieved
+        token          {text} - analysis text as the LLM produces it
+        analysis       {analysis, cached, duplicate_of, similarity}
+        patch_started  {}
+        patch          PatchInfo
+        done           AnalysisResponse
+        error          {detail}
+
+    A reused analysis of a near-duplicate issue skips retrieval, token and
+    patch_started events.
+    """
+    await _get_index(request.owner, request.repo)
+    logger.info(
+        f"Streaming analysis of issue: "
+        f"{request.owner}/{request.repo}#{request.issue_id}"
+    )
+    issue_title, issue_body, issue_url = await _fetch_issue(request)
+    user_query, retrieval_query = _analysis_queries(request, issue_title, issue_body)
+    analysis_cache = None if request.query else get_analysis_cache()
+
+    async def events():
+        issue = {
+            "issue_url": issue_url,
+            "issue_title": issue_title,
+            "issue_body": issue_body[:500],
+        }
+        yield _sse("issue", issue)
+        try:
+            async with _lease_index(request.owner, request.repo) as handle:
+                if analysis_cache is not None and request.reuse_similar:
+                    similar = await _find_similar_analysis(
+                        analysis_cache, retrieval_query, handle
+                    )
+                    if similar is not None:
+                        response = await _similar_analysis_response(
+                            similar, issue_url, issue_title, issue_body
+                        )
+                        yield _sse("analysis", {
+                            "analysis": response.analysis,
+                            "cached": True,
+                            "duplicate_of": response.duplicate_of,
+                            "similarity": response.similarity,
+                        })
+                        yield _sse("patch", response.patch.model_dump())
+                        yield _sse("done", response.model_dump())
+                        return
+
+                retrieval = await _new_retrieval(
+                    handle, retrieval_query, request.query or issue_body
+                )
+                context = await retrieval.adocuments()
+                yield _sse("retrieval", {"chunks": len(context)})
+
+                chunks = []
+                cached = False
+                agent = await _get_agent(handle)
+                async for chunk, cached in agent.astream(
+                    user_query, retrieval=retrieval
+                ):
+                    chunks.append(chunk)
+                    yield _sse("token", {"text": chunk})
+                analysis_result = "".join(chunks)
+                yield _sse("analysis", {
+                    "analysis": analysis_result,
+                    "cached": cached,
+                    "duplicate_of": None,
+                    "similarity": None,
+                })
+
+                yield _sse("patch_started", {})
+                patch_info = await _generate_patch_internal(
+                    handle,
+                    issue_id=request.issue_id,
+                    issue_title=issue_title,
+                    issue_body=issue_body,
+                    analysis=analysis_result,
+                    retrieval=retrieval,
+                )
+                yield _sse("patch", patch_info.model_dump())
+
+                if analysis_cache is not None:
+                    await _store_analysis(
+                        analysis_cache, retrieval_query, handle, request,
+                        issue_url, issue_title, analysis_result, patch_info,
+                    )
+
+            response = AnalysisResponse(
+                **issue,
+                analysis=analysis_result,
+                status="success",
+                patch=patch_info,
+                cached=cached,
+            )
+            yield _sse("done", response.model_dump())
+        except Exception as e:
+            logger.error(f"Error streaming analysis: {e}", exc_info=True)
+            yield _sse("error", {"detail": f"Analysis failed: {str(e)}"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Proxies must pass events through as they are produced
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.post("/api/query", response_model=QueryResponse)
 async def query_agent(request: QueryRequest):
     """
@@ -284,20 +665,28 @@ async def query_agent(request: QueryRequest):
 
     Args:
         query: The question to ask
+        owner: Repository owner (defaults to the last repository built)
+        repo: Repository name (defaults to the last repository built)
     """
     try:
-        if _agent is None:
-            raise HTTPException(status_code=503, detail="Agent not initialized.")
+        owner = request.owner or _current_repo_owner
+        repo = request.repo or _current_repo_name
+        async with _lease_index(owner, repo) as handle:
+            logger.info(f"Received query for {owner}/{repo}: {request.query[:100]}...")
 
-        logger.info(f"Received query: {request.query[:100]}...")
+            retrieval = await _new_retrieval(
+                handle, build_retrieval_query(request.query), request.query
+            )
+            agent = await _get_agent(handle)
+            answer = await agent.aanswer(
+                request.query, retrieval=retrieval
+            )
+            result = answer["result"]
 
-        result = _agent.run(request.query)
+            # TRY TO AUTO-GENERATE PATCH from query result
+            # Only works if query is about a specific issue or code change
+            patch_info = PatchInfo(status="not_generated")
 
-        # TRY TO AUTO-GENERATE PATCH from query result
-        # Only works if query is about a specific issue or code change
-        patch_info = PatchInfo(status="not_generated")
-        
-        if _patch_agent and _current_repo_owner and _current_repo_name:
             try:
                 # Check if the query mentions an issue ID
                 import re
@@ -305,37 +694,27 @@ async def query_agent(request: QueryRequest):
                 if issue_match:
                     issue_id = int(issue_match.group(1))
                     logger.info(f"Detected issue #{issue_id} in query, attempting patch generation...")
-                    
-                    patch_result = _patch_agent.generate_patch(
+
+                    patch_agent = await _get_patch_agent(handle)
+                    patch_result = await patch_agent.agenerate_patch(
                         issue_id=issue_id,
                         issue_title="Query Result Fix",
                         issue_body=request.query[:500],
                         analysis=result,
+                        retrieval=retrieval,
                     )
-                    
-                    if patch_result["status"] == "success":
-                        patch_content = None
-                        patch_file = patch_result.get("patch_file")
-                        if patch_file and os.path.exists(patch_file):
-                            try:
-                                with open(patch_file, "r", encoding="utf-8") as f:
-                                    patch_content = f.read()
-                            except Exception as e:
-                                logger.warning(f"Could not read patch file: {e}")
-                        
-                        patch_info = PatchInfo(
-                            patch_file=patch_file,
-                            patch_content=patch_content,
-                            metadata_file=patch_result.get("metadata_file"),
-                            commit_message=patch_result.get("commit_message"),
-                            files_changed=patch_result.get("files_changed", []),
-                            status="success",
-                        )
+
+                    if patch_result["status"] in ("success", "warning"):
+                        patch_info = await _patch_info(patch_result)
             except Exception as e:
                 logger.debug(f"Could not auto-generate patch from query: {e}")
 
-        return QueryResponse(result=result, status="success", patch=patch_info)
+        return QueryResponse(
+            result=result, status="success", patch=patch_info, cached=answer["cached"]
+        )
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing query: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Query failed: {str(e)}")
@@ -344,87 +723,300 @@ async def query_agent(request: QueryRequest):
 @app.get("/api/health")
 async def health_check():
     """Health check endpoint"""
+    registry = get_index_registry()
+    llm_cache = get_llm_cache()
+    analysis_cache = get_analysis_cache()
+    default_index = registry.peek(_current_repo_owner, _current_repo_name)
     return {
         "status": "healthy",
-        "agent_initialized": _agent is not None,
-        "vectorstore_initialized": _vectorstore is not None,
-        "patch_agent_initialized": _patch_agent is not None,
+        "agent_initialized": default_index is not None,
+        "vectorstore_initialized": default_index is not None,
+        "patch_agent_initialized": default_index is not None,
         "current_repo": f"{_current_repo_owner}/{_current_repo_name}" if _current_repo_owner and _current_repo_name else None,
+        "indexes": registry.list(),
+        "index_cache": registry.stats(),
+        "github_rate_limit": get_github_api().scheduler.status(),
+        "embedding_cache": get_embeddings().cache.stats(),
+        "build_jobs": _build_jobs.stats(),
+        "upstreams": upstream_stats(),
+        "llm_cache": llm_cache.stats() if llm_cache else None,
+        "analysis_cache": analysis_cache.stats() if analysis_cache else None,
     }
 
 
-@app.post("/api/build-rag", response_model=RAGBuildResponse)
-async def build_rag_for_repo(request: RAGBuildRequest):
+@app.get("/api/indexes")
+async def list_indexes():
+    """List every indexed repository and whether its index is currently open"""
+    registry = get_index_registry()
+    return {"indexes": registry.list(), "cache": registry.stats()}
+
+
+def _build_lock(owner: str, repo: str) -> threading.Lock:
+    with _build_locks_guard:
+        return _build_locks.setdefault(f"{owner}/{repo}", threading.Lock())
+
+
+def _build_rag_index(
+    owner: str,
+    repo: str,
+    save_code: bool = True,
+    incremental: bool = True,
+    cancel_event: Optional[threading.Event] = None,
+    on_progress: Optional[Callable[[dict], None]] = None,
+) -> dict:
     """
-    Build RAG knowledge base for a repository.
-    
-    This endpoint:
-    1. Fetches repository content from GitHub
-    2. Rebuilds the chroma_db in-place (no deletion needed)
-    3. Reinitializes the agent with new data
-    
-    No server restart required - the vectorstore is automatically updated.
+    Clone/update a repository, build a new index version and swap it in.
+
+    Builds are incremental when the vectorstore already holds this repository
+    at a known commit and that commit is still reachable; otherwise every file
+    is streamed through the ingest pipeline. Either way the new version is
+    built next to the live one, which keeps serving queries until the swap.
+
+    Args:
+        cancel_event: Set it to abort the build; the live version is kept
+        on_progress: Optional callback with the build phase and progress
+
+    Returns:
+        Dictionary with the RAGBuildResponse fields
+
+    Raises:
+        ValueError: If the repository contains no indexable documents
+        PipelineCancelled: If ``cancel_event`` was set
+    """
+    with _build_lock(owner, repo):
+        result = _build_rag_version(
+            owner, repo, save_code, incremental, cancel_event, on_progress
+        )
+        previous_collection = result.pop("previous_collection")
+        vectorstore = result.pop("vectorstore")
+        # Swap; requests still reading the previous version keep it alive
+        # until they finish
+        get_index_registry().put(
+            owner, repo, vectorstore, previous_collection=previous_collection
+        )
+    return result
+
+
+def _build_rag_version(
+    owner: str,
+    repo: str,
+    save_code: bool,
+    incremental: bool,
+    cancel_event: Optional[threading.Event] = None,
+    on_progress: Optional[Callable[[dict], None]] = None,
+) -> dict:
+    report = on_progress or (lambda progress: None)
+    previous = read_index_state(owner, repo)
+    state = load_index_state(owner, repo) if incremental else None
+    if incremental and previous is not None and state is None:
+        logger.warning(
+            f"Index of {owner}/{repo} was built with embedding model "
+            f"{previous.get('embedding_model')} and chunker "
+            f"{previous.get('chunker')}, which differ from the current "
+            f"settings: rebuilding it in full"
+        )
+
+    # Load repository content from GitHub
+    logger.info("Fetching repository content from GitHub...")
+    report({"phase": "checkout"})
+    with checkout_repo_changes(
+        owner, repo, since_commit=state["commit"] if state else None
+    ) as changes:
+        saved_repo_path = None
+        report(
+            {
+                "phase": "copying" if changes["incremental"] else "embedding",
+                "commit": changes["head_commit"],
+                "incremental": changes["incremental"],
+                "files_total": changes["file_count"],
+            }
+        )
+
+        if changes["incremental"]:
+            logger.info(f"Incremental build from {state['commit'][:12]}...")
+            vectorstore, stats = update_rag_knowledge_base(
+                changes,
+                owner,
+                repo,
+                cancel_event=cancel_event,
+                on_progress=on_progress,
+            )
+            document_count = stats["files_reembedded"]
+        else:
+            # Build RAG knowledge base
+            logger.info("Building new RAG knowledge base...")
+            vectorstore, saved_repo_path = create_rag_knowledge_base(
+                changes["documents"],
+                repo_owner=owner,
+                repo_name=repo,
+                save_repo_code=save_code,
+                commit=changes["head_commit"],
+                cancel_event=cancel_event,
+                on_progress=on_progress,
+            )
+            files = load_index_state(owner, repo)["files"]
+            stats = {
+                "files_reembedded": len(files),
+                "chunks_reembedded": sum(files.values()),
+            }
+            document_count = len(files)
+
+    return {
+        "vectorstore": vectorstore,
+        "previous_collection": previous["collection"] if previous else None,
+        "document_count": document_count,
+        "saved_repo_path": saved_repo_path,
+        "commit": changes["head_commit"],
+        "incremental": changes["incremental"],
+        **stats,
+    }
+
+
+def _run_build_job(owner: str, repo: str, **params) -> dict:
+    """Build job body: build and swap in the index, then make it the default"""
+    global _current_repo_owner, _current_repo_name
+
+    logger.info(f"Building RAG for {owner}/{repo}...")
+    result = _build_rag_index(owner, repo, **params)
+    _current_repo_owner = owner
+    _current_repo_name = repo
+    _prune_analyses()
+    logger.info("✓ RAG knowledge base rebuilt successfully")
+    return result
+
+
+_build_jobs = BuildJobQueue(_run_build_job)
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Cancel unfinished builds (their staging collections are dropped) and stop the chunking pool"""
+    await asyncio.to_thread(_build_jobs.shutdown)
+    await asyncio.to_thread(get_splitter().close)
+
+
+def _submit_build(request: RAGBuildRequest) -> tuple[BuildJob, bool]:
+    return _build_jobs.submit(
+        request.owner,
+        request.repo,
+        save_code=request.save_code,
+        incremental=request.incremental,
+    )
+
+
+def _get_build_job(job_id: str) -> BuildJob:
+    job = _build_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown build job: {job_id}")
+    return job
+
+
+def _build_message(owner: str, repo: str, result: dict) -> str:
+    message = f"RAG knowledge base built for {owner}/{repo}"
+    if result["incremental"]:
+        message += (
+            f" (incremental: {result['files_reembedded']} files re-embedded, "
+            f"{result['files_reused']} reused)"
+        )
+    if result["saved_repo_path"]:
+        message += f"\nRepository code saved to: {result['saved_repo_path']}"
+    return message
+
+
+@app.post("/api/build-jobs", response_model=BuildJobSubmitResponse, status_code=202)
+async def submit_build_job(request: RAGBuildRequest):
+    """
+    Queue a RAG build for a repository and return immediately.
+
+    Poll /api/build-jobs/{job_id} for its progress. If the repository already
+    has a queued or running build, the request attaches to that job instead
+    of starting another one.
 
     Args:
         owner: Repository owner
         repo: Repository name
         save_code: Whether to save repository code to disk
+        incremental: Whether to reuse chunks of unchanged files
     """
-    try:
-        global _vectorstore, _agent, _patch_agent, _current_repo_owner, _current_repo_name
-        
-        logger.info(f"Building RAG for {request.owner}/{request.repo}...")
+    job, created = _submit_build(request)
+    if created:
+        message = f"Build of {job.key} queued"
+    else:
+        message = f"Build of {job.key} already {job.status}; attached to it"
+    return BuildJobSubmitResponse(
+        status="queued" if created else "attached",
+        message=message,
+        job=BuildJobInfo(**job.to_dict()),
+    )
 
-        # Load repository content from GitHub
-        logger.info("Fetching repository content from GitHub...")
-        documents = get_repo_content_by_git(request.owner, request.repo)
 
-        if not documents:
-            raise HTTPException(
-                status_code=400, detail="No documents retrieved from repository"
-            )
+@app.get("/api/build-jobs", response_model=BuildJobListResponse)
+async def list_build_jobs():
+    """List recent build jobs, newest first"""
+    jobs = [BuildJobInfo(**job.to_dict()) for job in _build_jobs.list()]
+    return BuildJobListResponse(jobs=jobs, **_build_jobs.stats())
 
-        logger.info(f"Retrieved {len(documents)} documents")
-
-        # Build RAG knowledge base
-        # This will rebuild chroma_db in-place without any deletion
-        logger.info("Building new RAG knowledge base...")
-        vectorstore, saved_repo_path = create_rag_knowledge_base(
-            documents,
-            repo_owner=request.owner,
-            repo_name=request.repo,
-            save_repo_code=request.save_code,
-            old_vectorstore=_vectorstore,  # Keep reference but don't close it
-        )
 
-        # Update global variables with new vectorstore
-        _vectorstore = vectorstore
-        _current_repo_owner = request.owner
-        _current_repo_name = request.repo
-        
-        # Reinitialize agent with new vectorstore
-        logger.info("Reinitializing agent with new vectorstore...")
-        _agent = root_agent(_vectorstore)
-        _initialize_patch_agent()
+@app.get("/api/build-jobs/{job_id}", response_model=BuildJobInfo)
+async def get_build_job(job_id: str):
+    """Status and progress (files loaded, chunks embedded, ETA) of a build job"""
+    return BuildJobInfo(**_get_build_job(job_id).to_dict())
 
-        logger.info("✓ RAG knowledge base rebuilt successfully")
 
-        message = f"RAG knowledge base built for {request.owner}/{request.repo}"
-        if saved_repo_path:
-            message += f"\nRepository code saved to: {saved_repo_path}"
+@app.post("/api/build-jobs/{job_id}/cancel", response_model=BuildJobInfo)
+async def cancel_build_job(job_id: str):
+    """
+    Cancel a build job.
+
+    A queued job is cancelled at once; a running one stops at its next
+    checkpoint and drops its staging collection. The live index is never
+    affected.
+    """
+    _get_build_job(job_id)
+    return BuildJobInfo(**_build_jobs.cancel(job_id).to_dict())
+
 
+@app.post("/api/build-rag", response_model=RAGBuildResponse)
+async def build_rag_for_repo(request: RAGBuildRequest):
+    """
+    Build RAG knowledge base for a repository and wait for it.
+    
+    This endpoint:
+    1. Fetches repository content from GitHub
+    2. Builds a new version of the repository's index next to the live
+       one - re-embedding only the files changed since the indexed commit
+       when the repository was indexed before
+    3. Swaps the new version in atomically; requests already running finish
+       on the previous version, which is dropped afterwards
+    
+    No server restart required, queries keep being served during the build,
+    and indexes of other repositories stay available. The build runs as a
+    job of the build queue (see /api/build-jobs), so a build of the same
+    repository that is already running is joined rather than repeated. Prefer
+    /api/build-jobs for large repositories, whose builds can outlast proxy
+    timeouts.
+
+    Args:
+        owner: Repository owner
+        repo: Repository name
+        save_code: Whether to save repository code to disk
+        incremental: Whether to reuse chunks of unchanged files
+    """
+    job, _ = _submit_build(request)
+    # Wait on a worker thread so the event loop keeps serving queries
+    await asyncio.to_thread(job.wait)
+
+    if job.status == SUCCEEDED:
         return RAGBuildResponse(
             status="success",
-            message=message,
-            document_count=len(documents),
-            saved_repo_path=saved_repo_path,
+            message=_build_message(job.owner, job.repo, job.result),
+            **job.result,
         )
-
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Error building RAG: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"RAG build failed: {str(e)}")
+    if job.status == CANCELLED:
+        raise HTTPException(status_code=409, detail=f"RAG build cancelled: {job.error}")
+    if isinstance(job.exception, ValueError):
+        raise HTTPException(status_code=400, detail=job.error)
+    raise HTTPException(status_code=500, detail=f"RAG build failed: {job.error}")
 
 
 @app.post("/api/generate-patch", response_model=PatchGenerationResponse)
@@ -442,22 +1034,18 @@ async def generate_patch(request: PatchGenerationRequest):
         query: Optional custom query for patch generation
     """
     try:
-        if _patch_agent is None:
-            raise HTTPException(
-                status_code=503,
-                detail="Patch agent not initialized. Please build RAG for the repository first.",
-            )
-
         logger.info(f"Generating patch for issue #{request.issue_id}")
 
         # Generate patch
-        result = _patch_agent.generate_patch(
-            issue_id=request.issue_id,
-            issue_title=request.issue_title,
-            issue_body=request.issue_body,
-            analysis=request.analysis,
-            custom_query=request.query,
-        )
+        async with _lease_index(request.owner, request.repo) as handle:
+            patch_agent = await _get_patch_agent(handle)
+            result = await patch_agent.agenerate_patch(
+                issue_id=request.issue_id,
+                issue_title=request.issue_title,
+                issue_body=request.issue_body,
+                analysis=request.analysis,
+                custom_query=request.query,
+            )
 
         if result["status"] == "success":
             return PatchGenerationResponse(
@@ -469,14 +1057,20 @@ async def generate_patch(request: PatchGenerationRequest):
                 commit_message=result.get("commit_message"),
                 files_changed=result.get("files_changed", []),
                 specification=result.get("specification", ""),
+                cached=result.get("cached", False),
             )
         elif result["status"] == "warning":
             return PatchGenerationResponse(
                 status="warning",
                 issue_id=request.issue_id,
                 issue_title=request.issue_title,
+                patch_file=result.get("patch_file"),
+                metadata_file=result.get("metadata_file"),
+                commit_message=result.get("commit_message"),
+                files_changed=result.get("files_changed", []),
                 message=result.get("message"),
                 specification=result.get("specification", ""),
+                cached=result.get("cached", False),
             )
         else:
             raise HTTPException(
@@ -500,10 +1094,13 @@ async def list_patches():
         List of patch information
     """
     try:
-        if _patch_agent is None:
+        try:
+            handle = await _get_index(_current_repo_owner, _current_repo_name)
+        except HTTPException:
             return PatchListResponse(status="success", patches=[], total_count=0)
 
-        patches = _patch_agent.list_generated_patches()
+        patch_agent = await _get_patch_agent(handle)
+        patches = await get_upstream("files").run(patch_agent.list_generated_patches)
 
         return PatchListResponse(
             status="success", patches=patches, total_count=len(patches)
@@ -526,10 +1123,12 @@ async def get_patch_details(patch_name: str):
         Patch details including metadata
     """
     try:
-        if _patch_agent is None:
-            raise HTTPException(status_code=503, detail="Patch agent not initialized")
+        handle = await _get_index(_current_repo_owner, _current_repo_name)
 
-        patch_details = _patch_agent.get_patch_details(patch_name)
+        patch_agent = await _get_patch_agent(handle)
+        patch_details = await get_upstream("files").run(
+            patch_agent.get_patch_details, patch_name
+        )
 
         if patch_details is None:
             raise HTTPException(status_code=404, detail=f"Patch not found: {patch_name}")
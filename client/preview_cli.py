@@ -1,29 +1,29 @@
 import asyncio
+import os
 import sys
 
 sys.path.append(sys.path[0].split("client")[0])
-from langchain_community.embeddings import OllamaEmbeddings
-from langchain_community.vectorstores import Chroma
+from dotenv import load_dotenv
 
 from agent.root_agent import root_agent
+from tool.rag_tool import open_vectorstore
 
-OLLAMA_EMBEDDING_MODEL = "embeddinggemma"
-OLLAMA_BASE_URL = "http://localhost:11434"
-CHROMA_DB_PATH = "./chroma_db"
+load_dotenv()
+REPO_OWNER = os.getenv("TARGET_REPO_OWNER", "psf")
+REPO_NAME = os.getenv("TARGET_REPO_NAME", "requests")
 
 
 async def main():
-    embeddings = OllamaEmbeddings(
-        model=OLLAMA_EMBEDDING_MODEL, base_url=OLLAMA_BASE_URL
-    )
-    vectorstore = Chroma(
-        persist_directory=CHROMA_DB_PATH, embedding_function=embeddings
-    )
+    # Usage: preview_cli.py [owner/repo]
+    owner, name = sys.argv[1].split("/", 1) if len(sys.argv) > 1 else (REPO_OWNER, REPO_NAME)
+    vectorstore = open_vectorstore(owner, name)
     r = root_agent(vectorstore)
     while True:
         user_input = input("Enter your command: ")
-        result = r.run(user_input)
-        print(result)
+        # Print the answer as it is generated
+        async for chunk, _ in r.astream(user_input):
+            print(chunk, end="", flush=True)
+        print()
 
 
 asyncio.run(main())
@@ -0,0 +1,55 @@
+import argparse
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tool.snapshot import (
+    export_snapshot,
+    import_snapshot,
+    read_manifest,
+    verify_snapshot,
+)
+
+
+def main():
+    # Usage:
+    #   snapshot_cli.py export owner/repo path/to/snapshot
+    #   snapshot_cli.py import path/to/snapshot
+    #   snapshot_cli.py info path/to/snapshot [--verify]
+    # Serve snapshots read-only by listing them in GIAS_SNAPSHOTS
+    parser = argparse.ArgumentParser(description="Export and import index snapshots")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="Write the live index of a repository")
+    export.add_argument("repository", help="Indexed repository as owner/repo")
+    export.add_argument("path", help="Snapshot directory to create")
+    imported = commands.add_parser(
+        "import", help="Verify a snapshot and make it the live local index"
+    )
+    imported.add_argument("path", help="Snapshot directory")
+    info = commands.add_parser("info", help="Print the manifest of a snapshot")
+    info.add_argument("path", help="Snapshot directory")
+    info.add_argument("--verify", action="store_true", help="Also check file checksums")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "export":
+            owner, repo = args.repository.split("/", 1)
+            manifest = export_snapshot(owner, repo, args.path)
+        elif args.command == "import":
+            manifest = import_snapshot(args.path)
+        elif args.verify:
+            manifest = verify_snapshot(args.path)
+        else:
+            manifest = read_manifest(args.path)
+    except (ValueError, FileExistsError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    # Per-file chunk counts are too long to print
+    manifest.pop("files", None)
+    print(json.dumps(manifest, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,7 @@ export interface PatchInfo {
   commit_message?: string;
   files_changed: string[];
   status: string; // 'success', 'failed', 'not_generated', 'warning'
+  cached?: boolean;
 }
 
 export interface AnalysisResponse {
@@ -16,6 +17,24 @@ export interface AnalysisResponse {
   analysis: string;
   status: string;
   patch?: PatchInfo; // NEW: Include patch information
+  cached?: boolean;
+  duplicate_of?: number | null; // Issue whose analysis was reused
+  similarity?: number | null;
+}
+
+// Handlers of the events of /analyze-issue/stream, in the order they arrive
+export interface AnalysisStreamHandlers {
+  onIssue?: (issue: { issue_url: string; issue_title: string; issue_body: string }) => void;
+  onRetrieval?: (info: { chunks: number }) => void;
+  onToken?: (text: string) => void;
+  onAnalysis?: (info: {
+    analysis: string;
+    cached: boolean;
+    duplicate_of: number | null;
+    similarity: number | null;
+  }) => void;
+  onPatchStarted?: () => void;
+  onPatch?: (patch: PatchInfo) => void;
 }
 
 export interface QueryResponse {
@@ -88,6 +107,70 @@ export const analyzeIssue = async (
   }
 };
 
+// Streaming variant of analyzeIssue: handlers are called as server-sent
+// events arrive; resolves with the complete response
+export const analyzeIssueStream = async (
+  owner: string,
+  repo: string,
+  issueId: number,
+  query: string | null = null,
+  handlers: AnalysisStreamHandlers = {}
+): Promise<AnalysisResponse> => {
+  // EventSource cannot POST, so the stream is read through fetch
+  const response = await fetch(`${API_BASE_URL}/analyze-issue/stream`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    credentials: 'include',
+    body: JSON.stringify({ owner, repo, issue_id: issueId, query }),
+  });
+  if (!response.ok || !response.body) {
+    const error = await response.json().catch(() => null);
+    throw error || { detail: 'Failed to analyze issue' };
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let result: AnalysisResponse | null = null;
+
+  const dispatch = (event: string, data: any): void => {
+    switch (event) {
+      case 'issue': handlers.onIssue?.(data); break;
+      case 'retrieval': handlers.onRetrieval?.(data); break;
+      case 'token': handlers.onToken?.(data.text); break;
+      case 'analysis': handlers.onAnalysis?.(data); break;
+      case 'patch_started': handlers.onPatchStarted?.(); break;
+      case 'patch': handlers.onPatch?.(data); break;
+      case 'error': throw data;
+    }
+  };
+
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let boundary = buffer.indexOf('\n\n');
+    while (boundary !== -1) {
+      const block = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      let event = 'message';
+      let data = '';
+      for (const line of block.split('\n')) {
+        if (line.startsWith('event: ')) event = line.slice(7);
+        else if (line.startsWith('data: ')) data += line.slice(6);
+      }
+      if (event === 'done') result = JSON.parse(data);
+      else if (data) dispatch(event, JSON.parse(data));
+      boundary = buffer.indexOf('\n\n');
+    }
+  }
+
+  if (!result) {
+    throw { detail: 'Analysis stream ended unexpectedly' };
+  }
+  return result;
+};
+
 export const buildRag = async (
   owner: string,
   repo: string,
@@ -1,6 +1,6 @@
 import React, { useState, useEffect, useRef } from 'react';
 import ReactMarkdown from 'react-markdown';
-import { analyzeIssue, AnalysisResponse, triggerPatchDownload } from '../api';
+import { analyzeIssueStream, AnalysisResponse, triggerPatchDownload } from '../api';
 import '../styles/IssueAnalysisPage.css';
 
 interface IssueAnalysisPageProps {
@@ -23,6 +23,8 @@ function IssueAnalysisPage({
   const [loading, setLoading] = useState<boolean>(false);
   const [error, setError] = useState<string | null>(null);
   const [success, setSuccess] = useState<string | null>(null);
+  // Progress of a streaming analysis (retrieval, analysis, patch)
+  const [stage, setStage] = useState<string | null>(null);
   
   const hasAnalyzedRef = useRef<boolean>(false);
 
@@ -49,20 +51,39 @@ function IssueAnalysisPage({
     setError(null);
     setSuccess(null);
     setAnalysis(null);
+    setStage('Fetching issue...');
 
     try {
-      const response = await analyzeIssue(
+      // Render the analysis as it is generated, then the patch
+      const response = await analyzeIssueStream(
         ownerParam,
         repoParam,
         parseInt(issueIdParam),
-        customQueryParam.trim() || null
+        customQueryParam.trim() || null,
+        {
+          onIssue: (issue) => {
+            setAnalysis({ ...issue, analysis: '', status: 'streaming' });
+            setStage('Retrieving relevant code...');
+          },
+          onRetrieval: ({ chunks }) => setStage(`Analyzing issue with ${chunks} code chunks...`),
+          onToken: (text) =>
+            setAnalysis((prev) => prev && { ...prev, analysis: prev.analysis + text }),
+          onAnalysis: (info) => setAnalysis((prev) => prev && { ...prev, ...info }),
+          onPatchStarted: () => setStage('Generating patch...'),
+          onPatch: (patch) => setAnalysis((prev) => prev && { ...prev, patch }),
+        }
       );
       setAnalysis(response);
-      setSuccess('Issue analyzed successfully!');
+      setSuccess(
+        response.duplicate_of
+          ? `Reused the analysis of near-duplicate issue #${response.duplicate_of}`
+          : 'Issue analyzed successfully!'
+      );
     } catch (err: unknown) {
       const error = err as any;
       setError(error.detail || 'Failed to analyze issue');
     } finally {
+      setStage(null);
       setLoading(false);
     }
   };
@@ -80,6 +101,7 @@ function IssueAnalysisPage({
     setAnalysis(null);
     setError(null);
     setSuccess(null);
+    setStage(null);
     hasAnalyzedRef.current = false;
   };
 
@@ -248,6 +270,8 @@ function IssueAnalysisPage({
           </div>
         )}
 
+        {stage && <div className="alert alert-info">{stage}</div>}
+
         {analysis && (
           <div className="analysis-result">
             <div className="result-header">
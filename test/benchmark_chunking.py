@@ -0,0 +1,94 @@
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tool.code_chunker import split_with_ids
+from tool.parallel_split import ParallelSplitter
+from tool.repo_walker import iter_repo_documents
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+
+def load_documents(repo_path: str, copies: int):
+    """Load a local checkout, optionally repeated to simulate a larger repository."""
+    docs = list(iter_repo_documents(repo_path, "bench", "repo"))
+    if copies > 1:
+        docs = [
+            doc.model_copy(
+                update={
+                    "metadata": {
+                        **doc.metadata,
+                        "source": f"{doc.metadata['source']}~{i}",
+                    }
+                }
+            )
+            for i in range(copies)
+            for doc in docs
+        ]
+    return docs
+
+
+def run_benchmark(docs, worker_counts, window: int, rounds: int):
+    """Split all documents with each worker count and check determinism."""
+    baseline_ids = None
+    results = []
+    for workers in worker_counts:
+        splitter = ParallelSplitter(split_with_ids, workers=workers)
+        # Warm up the pool so process start-up is not measured
+        splitter.split(docs[:window])
+
+        timings = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            ids = []
+            for i in range(0, len(docs), window):
+                for _, chunk_ids in splitter.split(docs[i : i + window]):
+                    ids.extend(chunk_ids)
+            timings.append(time.perf_counter() - start)
+        splitter.close()
+
+        if baseline_ids is None:
+            baseline_ids = ids
+        deterministic = ids == baseline_ids
+        best = min(timings)
+        results.append((workers, best, len(ids), deterministic))
+        logger.info(
+            f"workers={workers:<3} best={best:.3f}s chunks={len(ids)} "
+            f"speedup={results[0][1] / best:.2f}x deterministic={deterministic}"
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parallel chunking")
+    parser.add_argument(
+        "repo_path",
+        nargs="?",
+        default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        help="Local repository checkout to chunk",
+    )
+    parser.add_argument("--copies", type=int, default=20)
+    parser.add_argument("--window", type=int, default=256)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    docs = load_documents(args.repo_path, args.copies)
+    total_chars = sum(len(doc.page_content) for doc in docs)
+    logger.info(f"Loaded {len(docs)} documents ({total_chars / 1e6:.1f}M chars)")
+
+    cpu_count = os.cpu_count() or 1
+    worker_counts = sorted({1, 2, 4, 8, cpu_count} & set(range(1, cpu_count + 1)))
+    run_benchmark(docs, worker_counts, args.window, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tool.rag_tool import load_index_state, open_lexical_index, open_vectorstore
+from tool.retrieval import RetrievalContext
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+# Issue-like phrasings around the symbol names a query is generated from
+TEMPLATES = [
+    "{names} raises an exception when called with None",
+    "Unexpected behaviour in {names} after upgrading",
+    "{names} returns the wrong value for empty input",
+    "Crash in {names}: AttributeError",
+]
+
+
+def sample_queries(vectorstore, count: int, seed: int):
+    """
+    Generate issue-like queries from indexed chunks.
+
+    Each query names the symbols defined in one chunk (from its ``symbol``
+    metadata) in an issue-like sentence; that chunk is the relevant result.
+    """
+    rng = random.Random(seed)
+    collection = vectorstore._collection
+    total = collection.count()
+    queries = []
+    for _ in range(count * 20):
+        if len(queries) >= count:
+            break
+        batch = collection.get(
+            limit=1, offset=rng.randrange(total), include=["metadatas"]
+        )
+        metadata = batch["metadatas"][0] or {}
+        symbols = [s.strip() for s in metadata.get("symbol", "").split(",") if s.strip()]
+        if not symbols or "path" not in metadata:
+            continue
+        names = " and ".join(f"`{name}`" for name in symbols[:2])
+        queries.append(
+            {
+                "query": rng.choice(TEMPLATES).format(names=names),
+                "relevant": [f"{metadata['path']}:{metadata.get('start_line', 1)}"],
+            }
+        )
+    return queries
+
+
+def load_queries(path: str):
+    """
+    Labelled queries, one JSON object per line:
+    ``{"query": "...", "relevant": ["path/to/file.py", "path/to/other.py:120"]}``
+
+    A relevant entry is a repository-relative path, optionally with a line
+    the retrieved chunk must span.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def is_relevant(metadata: dict, relevant) -> bool:
+    for entry in relevant:
+        path, _, line = entry.partition(":")
+        if metadata.get("path") != path:
+            continue
+        if not line or (
+            metadata.get("start_line", 0) <= int(line) <= metadata.get("end_line", 0)
+        ):
+            return True
+    return False
+
+
+def evaluate(vectorstore, lexical, queries, ks):
+    """Recall@k for each k (share of queries with a relevant chunk in the top k) and mean latency."""
+    hits = {k: 0 for k in ks}
+    elapsed = 0.0
+    for item in queries:
+        retrieval = RetrievalContext(vectorstore, item["query"], max(ks), lexical)
+        start = time.perf_counter()
+        documents = retrieval.documents()
+        elapsed += time.perf_counter() - start
+        ranks = [
+            rank
+            for rank, doc in enumerate(documents, start=1)
+            if is_relevant(doc.metadata, item["relevant"])
+        ]
+        for k in ks:
+            if ranks and ranks[0] <= k:
+                hits[k] += 1
+    return {k: hits[k] / len(queries) for k in ks}, elapsed / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Recall@k of hybrid (BM25 + vector) against vector-only retrieval"
+    )
+    parser.add_argument("repository", help="Indexed repository as owner/repo")
+    parser.add_argument(
+        "--queries",
+        help="JSONL file of labelled queries (default: generated from the index)",
+    )
+    parser.add_argument("--count", type=int, default=200, help="Generated queries")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5, 10])
+    args = parser.parse_args()
+
+    owner, repo = args.repository.split("/", 1)
+    state = load_index_state(owner, repo)
+    if state is None:
+        logger.error(f"{owner}/{repo} is not indexed; build it with /api/build-rag first")
+        sys.exit(1)
+    vectorstore = open_vectorstore(owner, repo)
+    lexical = open_lexical_index(state["collection"])
+    if lexical is None:
+        logger.error(f"{state['collection']} has no lexical index; rebuild it")
+        sys.exit(1)
+
+    if args.queries:
+        queries = load_queries(args.queries)
+    else:
+        queries = sample_queries(vectorstore, args.count, args.seed)
+    logger.info(f"Evaluating {len(queries)} queries on {state['collection']}")
+
+    # Embed the queries up front so neither run's latency includes it
+    vectorstore.embeddings.embed_documents([item["query"] for item in queries])
+    results = {
+        "vector": evaluate(vectorstore, None, queries, args.k),
+        "hybrid": evaluate(vectorstore, lexical, queries, args.k),
+    }
+    for name, (recall, latency) in results.items():
+        scores = " ".join(f"recall@{k}={recall[k]:.3f}" for k in args.k)
+        logger.info(f"{name:<7} {scores} latency={latency * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
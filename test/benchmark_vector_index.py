@@ -0,0 +1,104 @@
+import argparse
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark_retrieval import sample_queries
+from tool.flat_index import FlatVectorStore
+from tool.rag_tool import (
+    _copy_vectors,
+    _seal,
+    collection_name,
+    drop_collection,
+    load_index_state,
+    open_vectorstore,
+)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+
+def timed_queries(vectorstore, vectors, k):
+    """Ids of the top ``k`` chunks of each query vector and the mean latency."""
+    collection = vectorstore._collection
+    collection.query(query_embeddings=[vectors[0]], n_results=k)
+    results = []
+    start = time.perf_counter()
+    for vector in vectors:
+        result = collection.query(
+            query_embeddings=[vector], n_results=k, include=["documents", "metadatas"]
+        )
+        results.append(result["ids"][0])
+    return results, (time.perf_counter() - start) / len(vectors)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Latency and recall of the Chroma (HNSW) and flat (NumPy) vector backends"
+    )
+    parser.add_argument("repository", help="Indexed repository as owner/repo")
+    parser.add_argument("--count", type=int, default=200, help="Generated queries")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--k", type=int, default=20)
+    args = parser.parse_args()
+
+    owner, repo = args.repository.split("/", 1)
+    state = load_index_state(owner, repo)
+    if state is None:
+        logger.error(f"{owner}/{repo} is not indexed; build it with /api/build-rag first")
+        sys.exit(1)
+    live = open_vectorstore(owner, repo)
+    # A copy of the live version on the other backend
+    other = "chroma" if isinstance(live, FlatVectorStore) else "flat"
+    copy_name = f"{collection_name(owner, repo)}_bench"
+    drop_collection(copy_name)
+    copy = open_vectorstore(owner, repo, collection=copy_name, backend=other)
+    try:
+        start = time.perf_counter()
+        copied = _copy_vectors(live, copy, set())
+        _seal(copy)
+        logger.info(
+            f"Copied {copied} chunks to the {other} backend in "
+            f"{time.perf_counter() - start:.1f}s"
+        )
+
+        queries = [item["query"] for item in sample_queries(live, args.count, args.seed)]
+        vectors = live.embeddings.embed_documents(queries)
+        if other == "flat":
+            stores = {"flat": copy, "chroma": live}
+        else:
+            stores = {"flat": live, "chroma": copy}
+        results = {}
+        for name, vectorstore in stores.items():
+            results[name], latency = timed_queries(vectorstore, vectors, args.k)
+            logger.info(f"{name:<7} latency={latency * 1000:.2f}ms")
+
+        start = time.perf_counter()
+        stores["flat"]._collection.search(np.asarray(vectors), args.k)
+        logger.info(
+            f"flat batched latency="
+            f"{(time.perf_counter() - start) / len(vectors) * 1000:.2f}ms per query"
+        )
+        # The flat scan is exact, so its top k is the reference
+        recall = np.mean(
+            [
+                len(set(exact) & set(approximate)) / max(len(exact), 1)
+                for exact, approximate in zip(results["flat"], results["chroma"])
+            ]
+        )
+        logger.info(f"HNSW recall@{args.k} against the exact scan: {recall:.3f}")
+    finally:
+        drop_collection(copy_name)
+
+
+if __name__ == "__main__":
+    main()
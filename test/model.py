@@ -10,19 +10,14 @@ from typing import List, Dict
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from dotenv import load_dotenv
-from langchain_community.embeddings import OllamaEmbeddings
-from langchain_community.vectorstores import Chroma
 from langchain_core.documents import Document
 
 from agent.root_agent import root_agent
 from tool.github_tool import get_issue_by_issue_id, get_repo_content_by_git
-from tool.rag_tool import create_rag_knowledge_base
+from tool.rag_tool import CHROMA_DB_PATH, create_rag_knowledge_base, open_vectorstore
 
 # Configuration
 load_dotenv()
-OLLAMA_EMBEDDING_MODEL = "embeddinggemma"
-OLLAMA_BASE_URL = "http://localhost:11434"
-CHROMA_DB_PATH = "./chroma_db"
 
 # Create output directory for test results
 OUTPUT_DIR = "./test_results"
@@ -66,8 +61,9 @@ class TestRootAgentWithDifferentModels:
         logger.info(f"Setting up vectorstore for {self.test_repo_owner}/{self.test_repo_name}...")
 
         try:
-            # Check if chroma db already exists, if not build it
-            if not os.path.exists(CHROMA_DB_PATH):
+            # Each repository has its own collection in CHROMA_DB_PATH
+            self.vectorstore = open_vectorstore(self.test_repo_owner, self.test_repo_name)
+            if self.vectorstore._collection.count() == 0:
                 logger.info("Building RAG knowledge base for test repository...")
                 documents = get_repo_content_by_git(self.test_repo_owner, self.test_repo_name)
 
@@ -76,20 +72,14 @@ class TestRootAgentWithDifferentModels:
                     return False
 
                 logger.info(f"Retrieved {len(documents)} documents")
-                
-                # Create vectorstore
-                embeddings = OllamaEmbeddings(
-                    model=OLLAMA_EMBEDDING_MODEL, base_url=OLLAMA_BASE_URL
+                self.vectorstore, _ = create_rag_knowledge_base(
+                    documents,
+                    self.test_repo_owner,
+                    self.test_repo_name,
+                    save_repo_code=False,
                 )
-                self.vectorstore = create_rag_knowledge_base(documents)
             else:
                 logger.info(f"Loading existing vectorstore from {CHROMA_DB_PATH}...")
-                embeddings = OllamaEmbeddings(
-                    model=OLLAMA_EMBEDDING_MODEL, base_url=OLLAMA_BASE_URL
-                )
-                self.vectorstore = Chroma(
-                    persist_directory=CHROMA_DB_PATH, embedding_function=embeddings
-                )
 
             logger.info("Vectorstore initialized successfully")
             return True
@@ -0,0 +1,117 @@
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.jobs import CANCELLED, FAILED, SUCCEEDED, BuildJobQueue
+from tool.rag_pipeline import PipelineCancelled
+
+
+class FakeBuild:
+    """Build that reports progress, then waits to be released or cancelled."""
+
+    def __init__(self):
+        self.calls = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, owner, repo, cancel_event, on_progress, **params):
+        self.calls.append((owner, repo, params))
+        on_progress({"phase": "embedding", "files_total": 4})
+        self.started.set()
+        while not self.release.wait(0.01):
+            if cancel_event.is_set():
+                raise PipelineCancelled("cancelled at checkpoint")
+        if params.get("fail"):
+            raise RuntimeError("embedding server unreachable")
+        return {"status": "success", "owner": owner, "repo": repo}
+
+
+@pytest.fixture
+def build():
+    return FakeBuild()
+
+
+@pytest.fixture
+def queue(build):
+    queue = BuildJobQueue(build, workers=1)
+    yield queue
+    build.release.set()
+    queue.shutdown()
+
+
+def test_second_submit_attaches_to_the_active_job(queue, build):
+    job, created = queue.submit("o", "r", branch="main")
+    again, created_again = queue.submit("o", "r", branch="dev")
+
+    assert created and not created_again
+    assert again is job
+    assert job.attached == 1
+
+    build.release.set()
+    assert job.wait(5)
+    assert job.status == SUCCEEDED
+    assert job.result["repo"] == "r"
+    # Only the first submit's params were built
+    assert build.calls == [("o", "r", {"branch": "main"})]
+
+
+def test_finished_job_does_not_absorb_new_submits(queue, build):
+    build.release.set()
+    first, _ = queue.submit("o", "r")
+    assert first.wait(5)
+
+    second, created = queue.submit("o", "r")
+
+    assert created
+    assert second is not first
+    assert second.wait(5)
+    assert len(build.calls) == 2
+
+
+def test_cancel_running_job_stops_at_a_checkpoint(queue, build):
+    job, _ = queue.submit("o", "r")
+    assert build.started.wait(5)
+    assert job.to_dict()["phase"] == "embedding"
+
+    assert queue.cancel(job.id) is job
+
+    assert job.wait(5)
+    assert job.status == CANCELLED
+    assert job.error == "cancelled at checkpoint"
+    # The repository is free for a new build
+    _, created = queue.submit("o", "r")
+    assert created
+
+
+def test_cancel_queued_job_never_runs_it(queue, build):
+    running, _ = queue.submit("o", "running")
+    assert build.started.wait(5)
+    queued, _ = queue.submit("o", "queued")
+
+    queue.cancel(queued.id)
+
+    assert queued.done and queued.status == CANCELLED
+    assert queued.started_at is None
+    build.release.set()
+    assert running.wait(5)
+    queue.shutdown()
+    assert [call[1] for call in build.calls] == ["running"]
+
+
+def test_failed_build_keeps_its_exception(queue, build):
+    build.release.set()
+    job, _ = queue.submit("o", "r", fail=True)
+
+    assert job.wait(5)
+    assert job.status == FAILED
+    assert isinstance(job.exception, RuntimeError)
+    assert job.to_dict()["error"] == "embedding server unreachable"
+    assert queue.stats()["counts"] == {FAILED: 1}
+
+
+def test_unknown_job_cannot_be_cancelled(queue):
+    assert queue.cancel("missing") is None
@@ -0,0 +1,175 @@
+import os
+import sys
+import textwrap
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.documents import Document
+
+from tool import code_chunker
+from tool.code_chunker import CHUNKER_VERSION, CodeChunker, split_with_ids
+
+
+def words(text: str) -> int:
+    return len(text.split())
+
+
+def document(path: str, text: str) -> Document:
+    return Document(
+        page_content=text,
+        metadata={
+            "source": f"o/r/{path}",
+            "path": path,
+            "file_type": path.rsplit(".", 1)[-1],
+        },
+    )
+
+
+def function(name: str, body_lines: int) -> str:
+    body = "".join(f"    value = value + {i}  # step {i}\n" for i in range(body_lines))
+    return f"def {name}(value):\n{body}    return value\n"
+
+
+def assert_covers(chunks, text):
+    """Python chunks are consecutive line ranges that together are the file."""
+    lines = text.splitlines(keepends=True)
+    assert chunks[0].metadata["start_line"] == 1
+    assert chunks[-1].metadata["end_line"] == len(lines)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk.metadata["start_line"] == previous.metadata["end_line"] + 1
+    for chunk in chunks:
+        start, end = chunk.metadata["start_line"], chunk.metadata["end_line"]
+        assert chunk.page_content == "".join(lines[start - 1 : end])
+    assert "".join(chunk.page_content for chunk in chunks) == text
+
+
+def test_small_definitions_are_packed_and_keep_their_decorators():
+    text = textwrap.dedent(
+        """\
+        import os
+
+
+        # Adds one
+        @staticmethod
+        def first(value):
+            return value + 1
+
+
+        def second(value):
+            return value + 2
+        """
+    )
+    doc = document("pkg/mod.py", text)
+
+    packed = CodeChunker(chunk_size=200, length_function=words).split_document(doc)
+    assert len(packed) == 1
+    assert packed[0].metadata["symbol"] == "first, second"
+    assert packed[0].metadata["path"] == "pkg/mod.py"
+    assert packed[0].metadata["tokens"] == words(text)
+    assert_covers(packed, text)
+
+    # Too small to pack: the comment and decorator stay with their function
+    split = CodeChunker(chunk_size=10, length_function=words).split_document(doc)
+    assert [chunk.metadata["symbol"] for chunk in split] == ["", "first", "second"]
+    assert "# Adds one\n@staticmethod\ndef first" in split[1].page_content
+    assert_covers(split, text)
+
+
+def test_definitions_are_not_cut_when_they_fit():
+    text = "\n\n".join(function(f"f{i}", 6) for i in range(6))
+    chunker = CodeChunker(chunk_size=60, length_function=words)
+
+    chunks = chunker.split_document(document("mod.py", text))
+
+    assert len(chunks) > 1
+    assert_covers(chunks, text)
+    for chunk in chunks:
+        assert chunk.metadata["tokens"] <= 60
+        # Every function is whole in exactly one chunk
+        names = chunk.metadata["symbol"].split(", ")
+        assert chunk.page_content.count("def ") == len(names)
+        assert chunk.page_content.count("return value") == len(names)
+
+
+def test_large_class_is_split_per_method():
+    methods = "\n".join(
+        textwrap.indent(function(f"method_{i}", 8), "    ") for i in range(4)
+    )
+    text = f'class Service:\n    """Does things."""\n\n    retries = 3\n\n{methods}'
+    chunker = CodeChunker(chunk_size=60, length_function=words)
+
+    chunks = chunker.split_document(document("service.py", text))
+
+    symbols = [chunk.metadata["symbol"] for chunk in chunks]
+    assert symbols[0].startswith("Service")
+    assert "Service.method_3" in symbols[-1]
+    assert all(f"Service.method_{i}" in ", ".join(symbols) for i in range(4))
+    assert "retries = 3" in chunks[0].page_content
+    assert_covers(chunks, text)
+
+
+def test_oversized_definition_is_split_into_windows():
+    text = function("huge", 80)
+    chunker = CodeChunker(chunk_size=50, length_function=words)
+
+    chunks = chunker.split_document(document("huge.py", text))
+
+    assert len(chunks) > 1
+    assert all(chunk.metadata["symbol"] == "huge" for chunk in chunks)
+    assert all(chunk.metadata["tokens"] <= 50 for chunk in chunks)
+    assert_covers(chunks, text)
+
+
+def test_other_languages_record_line_ranges():
+    text = "".join(
+        f"function handler{i}(request) {{\n  return request.value + {i};\n}}\n\n"
+        for i in range(30)
+    )
+    chunker = CodeChunker(chunk_size=40, fallback_overlap=0, length_function=words)
+
+    chunks = chunker.split_document(document("web/app.js", text))
+
+    lines = text.splitlines()
+    assert len(chunks) > 1
+    for chunk in chunks:
+        start, end = chunk.metadata["start_line"], chunk.metadata["end_line"]
+        assert "\n".join(lines[start - 1 : end]).strip() == chunk.page_content.strip()
+        assert chunk.metadata["symbol"].startswith("handler")
+
+
+def test_unparsable_python_falls_back_to_separators():
+    text = "def broken(:\n    pass\n" * 20
+    chunker = CodeChunker(chunk_size=30, fallback_overlap=0, length_function=words)
+
+    chunks = chunker.split_document(document("broken.py", text))
+
+    assert chunks
+    assert all(chunk.metadata["tokens"] <= 30 for chunk in chunks)
+
+
+def test_ids_are_stable_per_source(monkeypatch):
+    # Keep the default chunker off the network-resolved tokenizer
+    monkeypatch.setattr(
+        code_chunker, "_default_chunker", CodeChunker(length_function=words)
+    )
+    doc = document("pkg/mod.py", "\n\n".join(function(f"f{i}", 40) for i in range(8)))
+
+    chunks, ids = split_with_ids(doc)
+    again, ids_again = split_with_ids(doc)
+
+    assert ids == [f"o/r/pkg/mod.py#{i}" for i in range(len(chunks))]
+    assert ids_again == ids
+    assert [chunk.page_content for chunk in again] == [
+        chunk.page_content for chunk in chunks
+    ]
+
+
+def test_signature_names_version_tokenizer_and_size():
+    words.name = "words"
+    try:
+        assert (
+            CodeChunker(chunk_size=128, length_function=words).signature
+            == f"{CHUNKER_VERSION}:words:128"
+        )
+    finally:
+        del words.name
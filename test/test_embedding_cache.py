@@ -0,0 +1,54 @@
+import os
+import sys
+import time
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tool.embedding_cache import CachedEmbeddings, EmbeddingCache
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    calls: int = 0
+
+    def embed_documents(self, texts):
+        self.calls += len(texts)
+        return super().embed_documents(texts)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return EmbeddingCache(path=str(tmp_path / "embeddings.sqlite3"))
+
+
+@pytest.fixture
+def embeddings(cache):
+    return CachedEmbeddings(CountingEmbeddings(size=8), cache, "fake", dimension=8)
+
+
+def last_access(cache: EmbeddingCache) -> float:
+    return cache._conn.execute("SELECT last_access FROM embeddings").fetchone()[0]
+
+
+def test_identical_texts_are_embedded_once(embeddings):
+    first = embeddings.embed_documents(["a", "b", "a"])
+    second = embeddings.embed_documents(["b", "a"])
+
+    assert embeddings.embeddings.calls == 2
+    # Vectors are stored as float32
+    assert second == [pytest.approx(first[1]), pytest.approx(first[0])]
+    assert embeddings.stats()["cache"]["hits"] == 2
+
+
+def test_query_hits_do_not_refresh_the_lru(embeddings, cache):
+    vector = embeddings.embed_documents(["query"])[0]
+    stored = last_access(cache)
+    time.sleep(0.01)
+
+    assert embeddings.embed_query("query") == pytest.approx(vector)
+    assert last_access(cache) == stored
+
+    embeddings.embed_documents(["query"])
+    assert last_access(cache) > stored
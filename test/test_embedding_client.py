@@ -0,0 +1,161 @@
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tool.embedding_client import EmbeddingError, OllamaBatchEmbeddings
+
+
+def fake_vector(text: str) -> list:
+    return [float(len(text)), float(sum(map(ord, text)) % 997), 1.0]
+
+
+class FakeOllama:
+    """Answers ``/api/embed`` like Ollama, with configurable latency and failures."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.batches = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.delay = 0.0
+        # Statuses (with error bodies) to answer the next requests with
+        self.failures = []
+
+    def handler(self):
+        state = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def send_json(self, status, body):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                if self.path != "/api/embed":
+                    return self.send_json(404, {"error": "not found"})
+                request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with state.lock:
+                    state.batches.append(len(request["input"]))
+                    failure = state.failures.pop(0) if state.failures else None
+                    state.in_flight += 1
+                    state.max_in_flight = max(state.max_in_flight, state.in_flight)
+                try:
+                    time.sleep(state.delay)
+                    if failure is not None:
+                        return self.send_json(*failure)
+                    self.send_json(
+                        200,
+                        {
+                            "model": request["model"],
+                            "embeddings": [fake_vector(t) for t in request["input"]],
+                        },
+                    )
+                finally:
+                    with state.lock:
+                        state.in_flight -= 1
+
+        return Handler
+
+
+@pytest.fixture
+def ollama():
+    state = FakeOllama()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), state.handler())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    state.url = f"http://127.0.0.1:{server.server_port}"
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+def texts(count: int) -> list:
+    return [f"def function_{i}(): return {i * i}" for i in range(count)]
+
+
+def test_batches_are_split_at_batch_size(ollama):
+    client = OllamaBatchEmbeddings("fake", ollama.url, batch_size=4, max_concurrency=2)
+
+    vectors = client.embed_documents(texts(10))
+
+    assert sorted(ollama.batches) == [2, 4, 4]
+    assert vectors == [fake_vector(text) for text in texts(10)]
+    assert client.embed_query("query") == fake_vector("query")
+
+
+def test_in_flight_requests_stay_within_the_limit(ollama):
+    ollama.delay = 0.05
+    client = OllamaBatchEmbeddings("fake", ollama.url, batch_size=1, max_concurrency=3)
+
+    client.embed_documents(texts(24))
+
+    assert 1 < ollama.max_in_flight <= 3
+    assert client.limiter.in_flight == 0
+
+
+def test_limiter_shrinks_when_latency_rises(ollama):
+    ollama.delay = 0.02
+    client = OllamaBatchEmbeddings("fake", ollama.url, batch_size=1, max_concurrency=4)
+    for text in texts(3):
+        client.embed_query(text)
+    assert client.limiter.limit == 4
+
+    ollama.delay = 0.3
+    client.embed_query("slow")
+    assert client.limiter.limit == 2
+    client.embed_query("slower still")
+    assert client.limiter.limit == 1
+
+    # Fast batches grow the window again, one at a time
+    ollama.delay = 0.0
+    client.embed_query("fast")
+    assert client.limiter.limit == 2
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_transient_errors_are_retried(ollama, status):
+    ollama.failures.append((status, {"error": "server busy"}))
+    client = OllamaBatchEmbeddings("fake", ollama.url, batch_size=4, max_concurrency=1)
+
+    vectors = client.embed_documents(texts(4))
+
+    assert vectors == [fake_vector(text) for text in texts(4)]
+    assert ollama.batches == [4, 4]
+    stats = client.stats()
+    assert stats["embeddings"] == 4
+    assert stats["requests"] == 1
+    assert stats["retries"] == 1
+    assert stats["embeddings_per_sec"] > 0
+
+
+@pytest.mark.parametrize(
+    "status, error",
+    [
+        (404, 'model "fake" not found, try pulling it first'),
+        (400, "input length exceeds the context length"),
+    ],
+)
+def test_client_errors_fail_without_retrying(ollama, status, error):
+    ollama.failures.append((status, {"error": error}))
+    client = OllamaBatchEmbeddings("fake", ollama.url, max_retries=4)
+
+    start = time.perf_counter()
+    with pytest.raises(EmbeddingError, match=error):
+        client.embed_documents(texts(2))
+
+    assert time.perf_counter() - start < 0.5
+    assert ollama.batches == [2]
+    assert client.stats()["retries"] == 0
@@ -0,0 +1,183 @@
+import os
+import sys
+import uuid
+
+import chromadb
+import numpy as np
+import pytest
+from chromadb.config import Settings
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tool.flat_index import FlatIndex, FlatVectorStore
+from tool.rag_tool import ChromaVectorStore
+
+DIMENSION = 8
+
+
+def chunks(count: int = 40, seed: int = 7):
+    """Chunks of three files; vectors are unit length, as FlatIndex stores them."""
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(count, DIMENSION)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    paths = ["a.py", "pkg/b.py", "pkg/sub/c.py"]
+    ids, documents, metadatas = [], [], []
+    for i in range(count):
+        path = paths[i % 3]
+        start = (i // 3) * 10 + 1
+        ids.append(f"o/r/{path}#{i // 3}")
+        documents.append(f"def function_{i}():\n    return {i}\n")
+        metadatas.append(
+            {"path": path, "start_line": start, "end_line": start + 9, "symbol": f"f{i}"}
+        )
+    return ids, vectors, documents, metadatas
+
+
+@pytest.fixture
+def indexes(tmp_path):
+    """The same chunks in a FlatIndex and in a cosine-space Chroma collection."""
+    ids, vectors, documents, metadatas = chunks()
+    flat = FlatIndex(str(tmp_path / "flat"))
+    flat.upsert(ids, vectors, documents, metadatas)
+    client = chromadb.EphemeralClient(Settings(anonymized_telemetry=False))
+    collection = client.create_collection(
+        f"test_{uuid.uuid4().hex[:8]}", metadata={"hnsw:space": "cosine"}
+    )
+    collection.upsert(
+        ids=ids, embeddings=vectors.tolist(), documents=documents, metadatas=metadatas
+    )
+    yield flat, collection
+    flat.close()
+
+
+WHERE = [
+    {"path": "a.py"},
+    {"path": {"$eq": "pkg/b.py"}},
+    {"path": {"$ne": "a.py"}},
+    {"start_line": {"$gt": 50}},
+    {"start_line": {"$lt": 31}},
+    {"path": {"$in": ["a.py", "pkg/sub/c.py"]}},
+    {"path": {"$nin": ["a.py"]}},
+    {"$or": [{"path": "a.py"}, {"start_line": {"$gte": 100}}]},
+    # A traceback frame: the chunk of any path suffix covering line 35
+    {
+        "$and": [
+            {"path": {"$in": ["src/pkg/b.py", "pkg/b.py", "b.py"]}},
+            {"start_line": {"$lte": 35}},
+            {"end_line": {"$gte": 35}},
+        ]
+    },
+]
+
+
+@pytest.mark.parametrize("where", WHERE)
+def test_get_matches_chroma(indexes, where):
+    flat, collection = indexes
+
+    expected = collection.get(where=where, include=["documents", "metadatas"])
+    found = flat.get(where=where, include=["documents", "metadatas"])
+
+    assert expected["ids"]
+    by_id = lambda result: {
+        id_: (document, metadata)
+        for id_, document, metadata in zip(
+            result["ids"], result["documents"], result["metadatas"]
+        )
+    }
+    assert by_id(found) == by_id(expected)
+
+
+@pytest.mark.parametrize("where", [None] + WHERE)
+def test_query_matches_chroma(indexes, where):
+    flat, collection = indexes
+    queries = chunks(count=3, seed=11)[1].tolist()
+
+    expected = collection.query(query_embeddings=queries, n_results=5, where=where)
+    found = flat.query(query_embeddings=queries, n_results=5, where=where)
+
+    assert found["ids"] == expected["ids"]
+    assert found["documents"] == expected["documents"]
+    assert found["metadatas"] == expected["metadatas"]
+    np.testing.assert_allclose(found["distances"], expected["distances"], atol=1e-5)
+
+
+@pytest.mark.parametrize(
+    "include",
+    [[], ["documents"], ["metadatas"], ["embeddings"], ["documents", "metadatas"]],
+)
+def test_get_returns_only_included_fields(indexes, include):
+    flat, collection = indexes
+    ids = ["o/r/a.py#0", "o/r/pkg/b.py#3"]
+
+    expected = collection.get(ids=ids, include=include)
+    found = flat.get(ids=ids, include=include)
+
+    assert found["ids"] == expected["ids"]
+    for field in ("documents", "metadatas", "embeddings"):
+        if field == "embeddings" and field in include:
+            np.testing.assert_allclose(found[field], expected[field], atol=1e-6)
+        elif field in include:
+            assert found[field] == expected[field]
+        else:
+            assert expected[field] is None
+            assert found.get(field) is None
+
+
+def test_query_returns_only_included_fields(indexes):
+    flat, collection = indexes
+    query = chunks(count=1, seed=3)[1].tolist()
+
+    expected = collection.query(query_embeddings=query, n_results=3, include=["metadatas"])
+    found = flat.query(query_embeddings=query, n_results=3, include=["metadatas"])
+
+    assert found["ids"] == expected["ids"]
+    assert found["metadatas"] == expected["metadatas"]
+    assert expected["documents"] is None and found.get("documents") is None
+
+
+def test_upsert_replaces_and_delete_masks(tmp_path):
+    ids, vectors, documents, metadatas = chunks(count=6)
+    flat = FlatIndex(str(tmp_path / "flat"))
+    flat.upsert(ids, vectors, documents, metadatas)
+
+    # Re-indexing a chunk replaces it: same id, new text and vector
+    flat.upsert([ids[0]], vectors[5:6], ["replaced"], [metadatas[0]])
+    flat.delete([ids[5]])
+
+    assert flat.count() == 5
+    top = flat.query(query_embeddings=vectors[5:6], n_results=1)
+    assert top["ids"] == [[ids[0]]]
+    assert top["documents"] == [["replaced"]]
+    assert flat.get(ids=[ids[5]])["ids"] == []
+
+    # Flushed and reopened read-only, the index answers the same
+    flat.flush()
+    flat.close()
+    reopened = FlatIndex(str(tmp_path / "flat"), read_only=True)
+    assert reopened.count() == 5
+    assert reopened.query(query_embeddings=vectors[5:6], n_results=1)["ids"] == [[ids[0]]]
+    with pytest.raises(ValueError):
+        reopened.upsert([ids[5]], vectors[5:6])
+    reopened.close()
+
+
+def test_vectorstores_return_the_same_documents(indexes):
+    flat, collection = indexes
+    embeddings = DeterministicFakeEmbedding(size=DIMENSION)
+    chroma_store = ChromaVectorStore(
+        client=chromadb.EphemeralClient(Settings(anonymized_telemetry=False)),
+        collection_name=collection.name,
+        embedding_function=embeddings,
+    )
+    flat_store = FlatVectorStore(flat, embeddings)
+    query = chunks(count=1, seed=5)[1][0].tolist()
+
+    expected = chroma_store.similarity_search_by_vector_with_score(query, k=4)
+    found = flat_store.similarity_search_by_vector_with_score(query, k=4)
+    assert [doc.id for doc, _ in found] == [doc.id for doc, _ in expected]
+    assert [doc.metadata for doc, _ in found] == [doc.metadata for doc, _ in expected]
+
+    ids = [doc.id for doc, _ in expected][:2]
+    by_id = lambda docs: {doc.id: (doc.page_content, doc.metadata) for doc in docs}
+    assert by_id(flat_store.get_by_ids(ids)) == by_id(chroma_store.get_by_ids(ids))
@@ -0,0 +1,282 @@
+import base64
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tool import github_api, github_tool
+from tool.github_api import GitHubAPIClient
+from tool.github_tool import get_issue_by_issue_id, get_repo_content
+
+FILES = {
+    f"src/pkg{i % 3}/module_{i}.py": (
+        f"def handler_{i}(request):\n    return request.get('value_{i}')\n"
+    ).encode()
+    for i in range(12)
+}
+FILES["README.md"] = b"# Demo\n\nA repository served by a stand-in GitHub API.\n"
+FILES["docs/notes.txt"] = b"Not indexed: the extension is not included.\n"
+INDEXED = sorted(path for path in FILES if not path.endswith(".txt"))
+
+
+def blob_sha(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()
+
+
+class StandInGitHub:
+    """Serves one repository ``o/r`` through the Git Data API endpoints the client uses."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = []
+        self.not_modified = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.blob_delay = 0.05
+        # Blob SHA -> status to reject its first request with
+        self.reject_once = {}
+        self.truncate = False
+        self.blobs = {blob_sha(data): data for data in FILES.values()}
+        # Directory path ("" for the root) -> list of (name, type, sha)
+        self.dirs = {"": []}
+        for path in sorted(FILES):
+            parts = path.split("/")
+            for depth in range(1, len(parts)):
+                parent, child = "/".join(parts[: depth - 1]), "/".join(parts[:depth])
+                if child not in self.dirs:
+                    self.dirs[child] = []
+                    self.dirs[parent].append((parts[depth - 1], "tree", f"tree-{child}"))
+            self.dirs["/".join(parts[:-1])].append(
+                (parts[-1], "blob", blob_sha(FILES[path]))
+            )
+
+    def listing(self, directory: str, recursive: bool) -> list:
+        entries = []
+        for name, kind, sha in self.dirs[directory]:
+            path = f"{directory}/{name}" if directory else name
+            entry = {"path": name, "type": kind, "sha": sha}
+            if kind == "blob":
+                entry["size"] = len(self.blobs[sha])
+            entries.append(entry)
+            if kind == "tree" and recursive:
+                entries.extend(
+                    {**child, "path": f"{name}/{child['path']}"}
+                    for child in self.listing(path, True)
+                )
+        return entries
+
+    def tree(self, sha: str, recursive: bool) -> dict:
+        directory = "" if sha in ("main", "root") else sha[len("tree-") :]
+        tree = self.listing(directory, recursive)
+        truncated = self.truncate and recursive and directory == ""
+        if truncated:
+            tree = tree[:3]
+        return {"sha": "root", "tree": tree, "truncated": truncated}
+
+    def handler(self):
+        state = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def send_json(self, status, body=None, headers=None):
+                payload = json.dumps(body).encode() if body is not None else b""
+                self.send_response(status)
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def send_cacheable(self, body):
+                etag = '"' + hashlib.sha1(json.dumps(body).encode()).hexdigest() + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    with state.lock:
+                        state.not_modified += 1
+                    self.send_json(304, headers={"ETag": etag})
+                else:
+                    self.send_json(200, body, {"ETag": etag})
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                with state.lock:
+                    state.requests.append((url.path, query.get("recursive") == ["1"]))
+                if url.path == "/repos/o/r":
+                    return self.send_cacheable({"default_branch": "main"})
+                if url.path.startswith("/repos/o/r/issues/"):
+                    number = int(url.path.rsplit("/", 1)[-1])
+                    return self.send_cacheable(
+                        {"number": number, "title": f"Issue {number}", "body": ""}
+                    )
+                prefix = "/repos/o/r/git/trees/"
+                if url.path.startswith(prefix):
+                    sha = url.path[len(prefix) :]
+                    return self.send_cacheable(
+                        state.tree(sha, query.get("recursive") == ["1"])
+                    )
+                prefix = "/repos/o/r/git/blobs/"
+                if url.path.startswith(prefix):
+                    return self.send_blob(url.path[len(prefix) :])
+                self.send_json(404, {"message": "Not Found"})
+
+            def send_blob(self, sha):
+                with state.lock:
+                    status = state.reject_once.pop(sha, None)
+                if status is not None:
+                    return self.send_json(
+                        status, {"message": "rate limited"}, {"Retry-After": "1"}
+                    )
+                with state.lock:
+                    state.in_flight += 1
+                    state.max_in_flight = max(state.max_in_flight, state.in_flight)
+                try:
+                    time.sleep(state.blob_delay)
+                    content = base64.b64encode(state.blobs[sha]).decode()
+                    self.send_json(
+                        200, {"sha": sha, "encoding": "base64", "content": content}
+                    )
+                finally:
+                    with state.lock:
+                        state.in_flight -= 1
+
+        return Handler
+
+    def count(self, predicate) -> int:
+        with self.lock:
+            return sum(1 for request in self.requests if predicate(*request))
+
+
+@pytest.fixture
+def stand_in(monkeypatch):
+    state = StandInGitHub()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), state.handler())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(
+        github_api, "GITHUB_API_URL", f"http://127.0.0.1:{server.server_port}"
+    )
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(stand_in, tmp_path, monkeypatch):
+    client = GitHubAPIClient(token=None, cache_dir=str(tmp_path), max_workers=4)
+    monkeypatch.setattr(github_api, "_github_api", client)
+    yield client
+    client.close()
+
+
+def paths(docs) -> list:
+    return sorted(doc.metadata["path"] for doc in docs)
+
+
+def is_tree(path, recursive) -> bool:
+    return "/git/trees/" in path
+
+
+def is_blob(path, recursive) -> bool:
+    return "/git/blobs/" in path
+
+
+def test_lists_the_tree_with_one_recursive_request(stand_in, client):
+    docs = get_repo_content("o", "r")
+
+    assert paths(docs) == INDEXED
+    assert {doc.metadata["path"]: doc.page_content.encode() for doc in docs} == {
+        path: FILES[path] for path in INDEXED
+    }
+    assert stand_in.count(is_tree) == 1
+    assert stand_in.count(lambda path, recursive: is_tree(path, True) and recursive) == 1
+    assert stand_in.count(is_blob) == len(INDEXED)
+
+
+def test_blob_fetches_stay_within_the_concurrency_bound(stand_in, client):
+    get_repo_content("o", "r")
+
+    assert 1 < stand_in.max_in_flight <= client.max_workers
+
+
+def test_reload_revalidates_from_the_disk_cache(stand_in, client, tmp_path, monkeypatch):
+    first = get_repo_content("o", "r")
+    requests_before = stand_in.count(lambda *_: True)
+
+    # A fresh client, as after a restart, only has the on-disk caches
+    restarted = GitHubAPIClient(token=None, cache_dir=str(tmp_path), max_workers=4)
+    monkeypatch.setattr(github_api, "_github_api", restarted)
+    second = get_repo_content("o", "r")
+    restarted.close()
+
+    assert paths(second) == paths(first)
+    # Repository info and tree are revalidated (304), blobs are not requested
+    assert stand_in.count(lambda *_: True) - requests_before == 2
+    assert stand_in.not_modified == 2
+
+
+@pytest.mark.parametrize("status", [403, 429])
+def test_rate_limited_blob_is_retried_after_the_delay(stand_in, client, status):
+    rejected = blob_sha(FILES[INDEXED[0]])
+    stand_in.reject_once[rejected] = status
+
+    start = time.perf_counter()
+    docs = get_repo_content("o", "r")
+    elapsed = time.perf_counter() - start
+
+    assert paths(docs) == INDEXED
+    assert stand_in.count(lambda path, _: path.endswith(rejected)) == 2
+    assert elapsed >= 1.0
+
+
+def test_truncated_tree_is_listed_by_subtree(stand_in, client):
+    stand_in.truncate = True
+
+    docs = get_repo_content("o", "r")
+
+    assert paths(docs) == INDEXED
+    # The root level is listed once more without recursion
+    assert (
+        stand_in.count(lambda path, recursive: is_tree(path, True) and not recursive)
+        == 1
+    )
+
+
+def test_truncated_tree_skips_excluded_directories(stand_in, client):
+    stand_in.truncate = True
+
+    tree = client.get_tree("o", "r", include_dir=lambda path: path != "docs")
+
+    assert not any(entry["path"].startswith("docs") for entry in tree["tree"])
+    # Only the included subtrees are listed
+    assert stand_in.count(lambda path, recursive: path.endswith("/tree-docs")) == 0
+    assert stand_in.count(lambda path, recursive: path.endswith("/tree-src")) == 1
+
+
+def test_issue_cache_evicts_the_least_recently_used_issue(stand_in, client, monkeypatch):
+    monkeypatch.setattr(github_tool, "_issue_cache", type(github_tool._issue_cache)())
+    monkeypatch.setattr(github_tool, "ISSUE_CACHE_SIZE", 2)
+
+    def requests_for(number):
+        return stand_in.count(lambda path, recursive: path == f"/repos/o/r/issues/{number}")
+
+    get_issue_by_issue_id("o/r", 1)
+    get_issue_by_issue_id("o/r", 2)
+    # A hit makes issue 1 the most recently used, so issue 2 is evicted
+    assert get_issue_by_issue_id("o/r", 1).title == "Issue 1"
+    get_issue_by_issue_id("o/r", 3)
+
+    get_issue_by_issue_id("o/r", 1)
+    assert requests_for(1) == 1
+    get_issue_by_issue_id("o/r", 2)
+    assert requests_for(2) == 2
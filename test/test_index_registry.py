@@ -0,0 +1,143 @@
+import os
+import sys
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tool import index_registry
+from tool.index_registry import IndexRegistry
+
+
+class FakeCollection:
+    def __init__(self, name: str, count: int = 10):
+        self.name = name
+        self._count = count
+
+    def count(self) -> int:
+        return self._count
+
+
+def store(name: str) -> SimpleNamespace:
+    """Stand-in vectorstore: the registry only reads its collection's name and count."""
+    return SimpleNamespace(_collection=FakeCollection(name))
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(
+        index_registry, "get_embeddings", lambda: SimpleNamespace(dimension=4)
+    )
+    dropped = []
+    registry = IndexRegistry(
+        open_store=lambda owner, repo: pytest.fail("indexes are only put"),
+        drop_store=dropped.append,
+    )
+    registry.dropped = dropped
+    return registry
+
+
+def test_put_drops_an_unused_previous_version(registry):
+    registry.put("o", "r", store("v1"))
+    registry.put("o", "r", store("v2"))
+
+    assert registry.dropped == ["v1"]
+    assert registry.get("o", "r").collection == "v2"
+
+
+def test_retired_version_is_dropped_after_its_last_lease(registry):
+    registry.put("o", "r", store("v1"))
+    first, second = registry.lease("o", "r"), registry.lease("o", "r")
+    assert first.__enter__().collection == "v1"
+    assert second.__enter__().collection == "v1"
+
+    registry.put("o", "r", store("v2"))
+    assert registry.dropped == []
+    assert registry.stats()["retired"] == ["v1"]
+    # New requests see the new version at once
+    with registry.lease("o", "r") as handle:
+        assert handle.collection == "v2"
+
+    first.__exit__(None, None, None)
+    assert registry.dropped == []
+    second.__exit__(None, None, None)
+    assert registry.dropped == ["v1"]
+    assert registry.stats()["retired"] == []
+
+
+def test_previous_collection_is_retired_when_its_handle_was_evicted(registry):
+    registry.put("o", "r", store("v1"))
+    registry.close("o", "r")
+
+    registry.put("o", "r", store("v2"), previous_collection="v1")
+
+    assert registry.dropped == ["v1"]
+
+
+def test_put_over_a_mounted_snapshot_never_drops_it(registry):
+    registry.mount("o", "r", store("snapshot_1"), {"collection": "snapshot_1"})
+    with registry.lease("o", "r") as handle:
+        assert handle.collection == "snapshot_1"
+        registry.put("o", "r", store("v1"))
+
+    assert registry.dropped == []
+    assert registry.get("o", "r").collection == "v1"
+
+
+def test_swaps_never_drop_a_leased_version(registry):
+    registry.put("o", "r", store("v0"))
+    versions = 50
+    errors = []
+    stop = threading.Event()
+
+    def request():
+        while not stop.is_set():
+            with registry.lease("o", "r") as handle:
+                # Dropping is recorded synchronously, so a leased version
+                # must not have been dropped while the lease is held
+                if handle.collection in registry.dropped:
+                    errors.append(handle.collection)
+
+    threads = [threading.Thread(target=request) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for version in range(1, versions + 1):
+        registry.put("o", "r", store(f"v{version}"))
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    # Every replaced version is dropped exactly once, the live one never
+    assert sorted(registry.dropped) == sorted(f"v{v}" for v in range(versions))
+    assert registry.stats()["retired"] == []
+    assert registry.stats()["open"][0]["leases"] == 0
+
+
+def test_index_built_with_other_chunker_settings_is_still_served(monkeypatch):
+    monkeypatch.setattr(
+        index_registry, "get_embeddings", lambda: SimpleNamespace(dimension=4)
+    )
+    monkeypatch.setattr(
+        index_registry,
+        "read_index_state",
+        lambda owner, repo: {"collection": "v1", "chunker": "syntax-1:other:256"},
+    )
+    registry = IndexRegistry(
+        open_store=lambda owner, repo: store("v1"), drop_store=lambda name: None
+    )
+
+    assert registry.get("o", "r").collection == "v1"
+
+
+def test_unindexed_repository_is_not_found(monkeypatch):
+    monkeypatch.setattr(index_registry, "read_index_state", lambda owner, repo: None)
+    registry = IndexRegistry(
+        open_store=lambda owner, repo: pytest.fail("nothing to open"),
+        drop_store=lambda name: None,
+    )
+
+    with pytest.raises(index_registry.IndexNotFoundError):
+        registry.get("o", "r")
@@ -0,0 +1,114 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.documents import Document
+
+from tool import code_chunker, token_counter
+from tool.code_chunker import CodeChunker, split_with_ids
+from tool.parallel_split import ParallelSplitter, balance_batches
+
+APPROX = ("approx", None)
+
+
+def document(path: str, text: str) -> Document:
+    return Document(
+        page_content=text,
+        metadata={
+            "source": f"o/r/{path}",
+            "path": path,
+            "file_type": path.rsplit(".", 1)[-1],
+        },
+    )
+
+
+def function(name: str, body_lines: int) -> str:
+    body = "".join(f"    value = value + {i}  # step {i}\n" for i in range(body_lines))
+    return f"def {name}(value):\n{body}    return value\n"
+
+
+def documents() -> list:
+    """Files of very different sizes, so batches reorder them."""
+    docs = []
+    for i in range(12):
+        functions = 1 + (i * 7) % 11
+        text = "\n\n".join(function(f"f{i}_{j}", 10 + 5 * j) for j in range(functions))
+        docs.append(document(f"pkg/mod_{i}.py", text))
+    docs.append(document("web/app.js", "function main() {\n  return 1;\n}\n" * 40))
+    return docs
+
+
+def counter_name(doc: Document):
+    """Split function reporting the tokenizer of the process it runs in."""
+    return [], [token_counter.get_token_counter().name]
+
+
+@pytest.fixture
+def splitter(monkeypatch):
+    # The parent and the workers count with the same, offline tokenizer
+    monkeypatch.setattr(token_counter, "_tokenizer", APPROX)
+    monkeypatch.setattr(token_counter, "_token_counter", None)
+    monkeypatch.setattr(code_chunker, "_default_chunker", CodeChunker())
+    splitter = ParallelSplitter(
+        split_with_ids,
+        workers=2,
+        min_parallel_chars=0,
+        initializer=token_counter.use_tokenizer,
+        initargs=APPROX,
+    )
+    yield splitter
+    splitter.close()
+
+
+def test_balance_batches_is_deterministic_and_covers_every_item():
+    sizes = [5, 100, 5, 60, 40, 1, 1, 30]
+
+    batches = balance_batches(sizes, 3)
+
+    assert batches == balance_batches(sizes, 3)
+    assert sorted(i for batch in batches for i in batch) == list(range(len(sizes)))
+    assert all(batch == sorted(batch) for batch in batches)
+    totals = sorted(sum(sizes[i] for i in batch) for batch in batches)
+    assert totals[-1] == 100
+
+
+def test_balance_batches_never_makes_empty_batches():
+    assert balance_batches([3, 2], 8) == [[0], [1]]
+    assert balance_batches([], 4) == []
+
+
+def test_parallel_split_matches_an_inline_split_in_input_order(splitter):
+    docs = documents()
+
+    parallel = splitter.split(docs)
+    inline = [split_with_ids(doc) for doc in docs]
+
+    assert len(parallel) == len(docs)
+    for doc, (chunks, ids), (inline_chunks, inline_ids) in zip(docs, parallel, inline):
+        assert ids == inline_ids
+        assert all(id_.startswith(doc.metadata["source"] + "#") for id_ in ids)
+        assert [chunk.page_content for chunk in chunks] == [
+            chunk.page_content for chunk in inline_chunks
+        ]
+        assert [chunk.metadata for chunk in chunks] == [
+            chunk.metadata for chunk in inline_chunks
+        ]
+
+
+def test_workers_count_with_the_tokenizer_they_are_given():
+    splitter = ParallelSplitter(
+        counter_name,
+        workers=2,
+        min_parallel_chars=0,
+        initializer=token_counter.use_tokenizer,
+        initargs=("hf:given", None),
+    )
+    try:
+        results = splitter.split(documents())
+    finally:
+        splitter.close()
+
+    assert {ids[0] for _, ids in results} == {"hf:given"}
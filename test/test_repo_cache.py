@@ -0,0 +1,133 @@
+import os
+import shutil
+import sys
+
+import pytest
+from git import GitCommandError, Repo
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tool import repo_cache
+from tool.repo_cache import RepoMirrorCache
+
+
+def commit(repo: Repo, path: str, text: str) -> str:
+    with open(os.path.join(repo.working_tree_dir, path), "w") as f:
+        f.write(text)
+    repo.index.add([path])
+    return repo.index.commit(f"Update {path}").hexsha
+
+
+@pytest.fixture
+def origin(tmp_path):
+    """A local repository standing in for github.com/o/r."""
+    repo = Repo.init(tmp_path / "remotes" / "o" / "r")
+    with repo.config_writer() as config:
+        config.set_value("user", "name", "Test")
+        config.set_value("user", "email", "test@example.com")
+        config.set_value("uploadpack", "allowFilter", "true")
+    commit(repo, "app.py", "print(1)\n")
+    return repo
+
+
+@pytest.fixture
+def cache(tmp_path, origin):
+    return RepoMirrorCache(
+        cache_dir=str(tmp_path / "cache"),
+        remote_url_template="file://" + str(tmp_path / "remotes") + "/{owner}/{name}",
+    )
+
+
+def test_checkout_follows_the_remote_head(cache, origin):
+    with cache.checkout("o", "r") as repo:
+        assert repo.head.commit.hexsha == origin.head.commit.hexsha
+
+    head = commit(origin, "app.py", "print(2)\n")
+    with cache.checkout("o", "r") as repo:
+        assert repo.head.commit.hexsha == head
+        with open(os.path.join(repo.working_tree_dir, "app.py")) as f:
+            assert f.read() == "print(2)\n"
+
+
+def test_failed_fetch_keeps_the_cached_checkout(cache, origin):
+    with cache.checkout("o", "r") as repo:
+        head = repo.head.commit.hexsha
+    shutil.rmtree(origin.git_dir)
+
+    with pytest.raises(GitCommandError):
+        with cache.checkout("o", "r"):
+            pass
+
+    assert Repo(cache.entry_path("o", "r")).head.commit.hexsha == head
+
+
+def test_corrupt_checkout_is_recloned(cache, origin):
+    with cache.checkout("o", "r"):
+        pass
+    os.remove(os.path.join(cache.entry_path("o", "r"), ".git", "HEAD"))
+
+    with cache.checkout("o", "r") as repo:
+        assert repo.head.commit.hexsha == origin.head.commit.hexsha
+
+
+def test_size_is_only_measured_when_head_moves(cache, origin, monkeypatch):
+    measured = []
+    dir_size = repo_cache._dir_size
+    monkeypatch.setattr(
+        repo_cache, "_dir_size", lambda path: measured.append(path) or dir_size(path)
+    )
+
+    with cache.checkout("o", "r"):
+        pass
+    with cache.checkout("o", "r"):
+        pass
+    assert len(measured) == 1
+
+    commit(origin, "app.py", "print(2)\n")
+    with cache.checkout("o", "r"):
+        pass
+    assert len(measured) == 2
+    assert cache.entries()[0]["size"] > 0
+
+
+def test_cached_checkout_never_waits_or_clones(cache):
+    with cache.cached_checkout("o", "r") as repo:
+        assert repo is None
+    assert not os.path.exists(cache.entry_path("o", "r"))
+
+    with cache.checkout("o", "r"):
+        # Busy, e.g. a build is reading it
+        with cache.cached_checkout("o", "r") as repo:
+            assert repo is None
+
+    with cache.cached_checkout("o", "r") as repo:
+        assert repo.working_tree_dir == cache.entry_path("o", "r")
+
+
+@pytest.mark.parametrize(
+    "owner, name",
+    [("o", "x/../../../victim"), ("o/..", "victim"), ("..", "..")],
+)
+def test_entry_paths_stay_inside_the_cache(cache, tmp_path, owner, name):
+    victim = tmp_path / "victim"
+    victim.mkdir()
+    (victim / "keep.txt").write_text("keep")
+    os.makedirs(cache.entry_path("o", "r"))
+
+    entry_path = cache.entry_path(owner, name)
+
+    assert os.path.dirname(entry_path) == cache.cache_dir
+    assert entry_path != cache.entry_path("o", "r")
+    with pytest.raises(GitCommandError):
+        # No such remote: the clone fails without touching anything else
+        with cache.checkout(owner, name):
+            pass
+    assert (victim / "keep.txt").read_text() == "keep"
+    assert os.path.isdir(cache.entry_path("o", "r"))
+
+
+def test_nothing_outside_the_cache_is_removed(cache, tmp_path):
+    with pytest.raises(ValueError):
+        cache._check_inside(str(tmp_path / "remotes"))
+    with pytest.raises(ValueError):
+        cache._check_inside(os.path.join(cache.cache_dir, "a", ".."))
@@ -0,0 +1,224 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+from langchain_core.embeddings import Embeddings
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tool import retrieval
+from tool.flat_index import FlatIndex, FlatVectorStore
+from tool.lexical_index import LexicalIndex
+from tool.query_builder import extract_identifiers
+from tool.retrieval import RetrievalContext, reciprocal_rank_fusion
+
+DIMENSION = 8
+# (id, path, start line, end line, symbol, text)
+CHUNKS = [
+    ("o/r/requests/sessions.py#0", "requests/sessions.py", 1, 40, "Session",
+     "class Session:\n    def __init__(self):\n        self.adapters = {}\n"),
+    ("o/r/requests/sessions.py#1", "requests/sessions.py", 41, 90,
+     "Session.resolve_redirects",
+     "    def resolve_redirects(self, resp, req):\n        while resp.is_redirect:\n"),
+    ("o/r/requests/adapters.py#0", "requests/adapters.py", 1, 50, "HTTPAdapter",
+     "class HTTPAdapter(BaseAdapter):\n    def send(self, request):\n"),
+    ("o/r/sessions.py#0", "sessions.py", 1, 100, "legacy_session",
+     "def legacy_session():\n    return None\n"),
+    ("o/r/utils.py#0", "utils.py", 1, 60, "join",
+     "def join(*parts):\n    return '/'.join(parts)\n"),
+] + [
+    (f"o/r/api/{name}.py#0", f"api/{name}.py", 1, 20, "get",
+     f"def get(url):\n    return fetch_{name}(url)\n")
+    for name in ("users", "teams", "repos", "issues")
+]
+# Chunks the vector search ranks first for any query
+NOISE = [f"o/r/noise.py#{i}" for i in range(6)]
+# Retrieved documents carry no id, only their location
+IDS = {(path, start): id_ for id_, path, start, *_ in CHUNKS}
+IDS.update({("noise.py", i * 5 + 1): id_ for i, id_ in enumerate(NOISE)})
+
+
+class FixedQueryEmbeddings(Embeddings):
+    """Embeds every query to the first axis, which the noise chunks are closest to."""
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        return [1.0] + [0.0] * (DIMENSION - 1)
+
+
+@pytest.fixture
+def indexes(tmp_path):
+    rng = np.random.default_rng(5)
+    ids, vectors, documents, metadatas = [], [], [], []
+    for id_, path, start, end, symbol, text in CHUNKS:
+        vector = rng.normal(size=DIMENSION)
+        vector[0] = -abs(vector[0]) - 1  # Away from the query
+        ids.append(id_)
+        vectors.append(vector)
+        documents.append(text)
+        metadatas.append(
+            {"path": path, "start_line": start, "end_line": end, "symbol": symbol}
+        )
+    for i, id_ in enumerate(NOISE):
+        vector = np.zeros(DIMENSION)
+        vector[0], vector[1 + i % (DIMENSION - 1)] = 1.0, 0.1 * (i + 1)
+        ids.append(id_)
+        vectors.append(vector)
+        documents.append(f"def noise_{i}():\n    pass\n")
+        metadatas.append(
+            {"path": "noise.py", "start_line": i * 5 + 1, "end_line": i * 5 + 5,
+             "symbol": f"noise_{i}"}
+        )
+    vectors = np.array(vectors, dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    flat = FlatIndex(str(tmp_path / "flat"))
+    flat.upsert(ids, vectors, documents, metadatas)
+    lexical = LexicalIndex(str(tmp_path / "lexical.sqlite3"))
+    lexical.add(ids, documents, metadatas)
+    yield FlatVectorStore(flat, FixedQueryEmbeddings()), lexical
+    lexical.close()
+    flat.close()
+
+
+def ids(documents) -> list:
+    return [IDS[doc.metadata["path"], doc.metadata["start_line"]] for doc in documents]
+
+
+def test_dense_ranking_alone_returns_the_noise(indexes):
+    vectorstore, _ = indexes
+
+    context = RetrievalContext(vectorstore, "redirects loop forever", k=3)
+
+    assert ids(context.documents()) == NOISE[:3]
+
+
+def test_traceback_frame_resolves_to_the_chunk_covering_its_line(indexes):
+    vectorstore, _ = indexes
+    frames = [("/usr/lib/python3/site-packages/requests/sessions.py", 60)]
+
+    context = RetrievalContext(vectorstore, "redirects loop", k=3, frames=frames)
+
+    # The longest matching path suffix wins over the root sessions.py
+    assert ids(context.documents()) == ["o/r/requests/sessions.py#1"] + NOISE[:2]
+
+
+def test_frames_without_an_indexed_chunk_are_skipped(indexes):
+    vectorstore, _ = indexes
+    frames = [("requests/sessions.py", 500), ("lib/unknown.py", 3)]
+
+    context = RetrievalContext(vectorstore, "redirects loop", k=2, frames=frames)
+
+    assert ids(context.documents()) == NOISE[:2]
+
+
+def test_frames_do_not_match_on_a_bare_file_name(indexes):
+    vectorstore, _ = indexes
+    frames = [("/usr/lib/python3.11/site-packages/otherlib/utils.py", 40)]
+
+    context = RetrievalContext(vectorstore, "join fails", k=2, frames=frames)
+    assert ids(context.documents()) == NOISE[:2]
+
+    # A frame naming just the file is still resolved
+    context = RetrievalContext(vectorstore, "join fails", k=2, frames=[("utils.py", 40)])
+    assert ids(context.documents()) == ["o/r/utils.py#0", NOISE[0]]
+
+
+def test_mentioned_symbol_leads_the_dense_hits(indexes):
+    vectorstore, lexical = indexes
+
+    context = RetrievalContext(
+        vectorstore, "`Session.resolve_redirects` loops forever", k=4, lexical=lexical
+    )
+    documents = ids(context.documents())
+
+    assert documents[0] == "o/r/requests/sessions.py#1"
+    assert set(NOISE[:3]) & set(documents[1:])
+
+
+def test_frames_come_before_direct_lookups_which_are_capped(indexes, monkeypatch):
+    vectorstore, lexical = indexes
+    monkeypatch.setattr(retrieval, "DIRECT_LOOKUP_MAX", 1)
+    limits = []
+    lookup = lexical.lookup
+    monkeypatch.setattr(
+        lexical,
+        "lookup",
+        lambda names, query, limit: limits.append(limit) or lookup(names, query, limit),
+    )
+    query = "Mounting an `HTTPAdapter` breaks `Session.resolve_redirects`"
+    frames = [("requests/sessions.py", 10)]
+
+    context = RetrievalContext(vectorstore, query, k=5, lexical=lexical, frames=frames)
+    documents = ids(context.documents())
+
+    assert documents[:2] == ["o/r/requests/sessions.py#0", "o/r/requests/adapters.py#0"]
+    assert len(documents) == 5
+    assert limits == [1]
+
+
+def test_direct_lookups_only_fill_the_slots_left_by_frames(indexes, monkeypatch):
+    vectorstore, lexical = indexes
+    monkeypatch.setattr(retrieval, "TRACEBACK_CHUNKS_MAX", 1)
+    frames = [("requests/sessions.py", 10), ("requests/sessions.py", 60)]
+    query = "`HTTPAdapter` and `Session.resolve_redirects`"
+
+    context = RetrievalContext(vectorstore, query, k=2, lexical=lexical, frames=frames)
+
+    # One frame chunk (capped), then one direct lookup; no room for dense hits
+    assert ids(context.documents()) == [
+        "o/r/requests/sessions.py#0",
+        "o/r/requests/adapters.py#0",
+    ]
+
+
+def test_ambiguous_name_is_not_looked_up_directly(indexes):
+    _, lexical = indexes
+
+    # Defined in four files, more than MAX_NAME_MATCHES
+    assert lexical.lookup(["get"], "every get call is slow", 3) == []
+    assert lexical.lookup(["get", "HTTPAdapter"], "get HTTPAdapter", 3) == [
+        "o/r/requests/adapters.py#0"
+    ]
+
+
+def test_lookup_matches_path_and_name_suffixes(indexes):
+    _, lexical = indexes
+
+    assert lexical.lookup(["adapters.py"], "send", 3) == ["o/r/requests/adapters.py#0"]
+    # Not indexed as a whole; resolved from its longest indexed suffix
+    assert lexical.lookup(["vendor.requests.HTTPAdapter"], "", 3) == [
+        "o/r/requests/adapters.py#0"
+    ]
+    # Of each mentioned file, the chunk matching the query best
+    assert lexical.lookup(["requests/sessions.py"], "resolve redirects", 3) == [
+        "o/r/requests/sessions.py#1"
+    ]
+
+
+def test_qualified_names_do_not_fall_back_to_unrelated_bare_names(indexes):
+    _, lexical = indexes
+
+    for query in ("`os.path.join` fails", "`json.join` fails", "see other/pkg/utils.py"):
+        names = extract_identifiers(query)
+        assert lexical.lookup(names, query, 3) == [], query
+    # Mentioned on its own, the name is still looked up
+    assert lexical.lookup(["join"], "join", 3) == ["o/r/utils.py#0"]
+    assert lexical.lookup(["utils.py"], "join", 3) == ["o/r/utils.py#0"]
+
+
+def test_lookup_returns_at_most_limit_chunks(indexes):
+    _, lexical = indexes
+
+    # sessions.py is the suffix of two files
+    assert len(lexical.lookup(["sessions.py"], "session", 3)) == 2
+    assert lexical.lookup(["sessions.py", "HTTPAdapter"], "session", 1) == [
+        lexical.lookup(["sessions.py"], "session", 1)[0]
+    ]
+
+
+def test_reciprocal_rank_fusion_favours_ids_ranked_by_both():
+    assert reciprocal_rank_fusion([["a", "b"], ["b", "c"]]) == ["b", "a", "c"]
@@ -0,0 +1,183 @@
+import json
+import os
+import sys
+
+import chromadb
+import numpy as np
+import pytest
+from chromadb.config import Settings
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tool import code_chunker, rag_tool
+from tool.flat_index import CHUNKS_FILE, VECTORS_FILE, FlatIndex
+from tool.index_registry import IndexRegistry
+from tool.lexical_index import LexicalIndex
+from tool.snapshot import (
+    LEXICAL_FILE,
+    MANIFEST_FILE,
+    SnapshotError,
+    export_snapshot,
+    import_snapshot,
+    open_snapshot,
+    verify_snapshot,
+)
+
+DIMENSION = 8
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """A local store under ``tmp_path`` with fake embeddings and an in-memory Chroma."""
+    root = tmp_path / "store"
+    monkeypatch.setattr(rag_tool, "INDEX_STATE_DIR", str(root / "gias_index_state"))
+    monkeypatch.setattr(rag_tool, "LEXICAL_INDEX_DIR", str(root / "gias_lexical"))
+    monkeypatch.setattr(rag_tool, "FLAT_INDEX_DIR", str(root / "gias_flat"))
+    monkeypatch.setattr(
+        rag_tool, "_embeddings", DeterministicFakeEmbedding(size=DIMENSION)
+    )
+    client = chromadb.EphemeralClient(Settings(anonymized_telemetry=False))
+    monkeypatch.setattr(rag_tool, "_chroma_client", client)
+    # The chunker signature is recorded with every index; keep it offline
+    monkeypatch.setattr(
+        code_chunker, "_default_chunker", code_chunker.CodeChunker(length_function=len)
+    )
+    return root
+
+
+def chunks(count: int = 12):
+    rng = np.random.default_rng(3)
+    vectors = rng.normal(size=(count, DIMENSION)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids, documents, metadatas = [], [], []
+    for i in range(count):
+        path = ["app.py", "pkg/util.py"][i % 2]
+        ids.append(f"o/r/{path}#{i // 2}")
+        documents.append(f"def handler_{i}(request):\n    return request\n")
+        metadatas.append(
+            {
+                "path": path,
+                "start_line": i * 5 + 1,
+                "end_line": i * 5 + 5,
+                "symbol": f"handler_{i}",
+            }
+        )
+    return ids, vectors, documents, metadatas
+
+
+def build_live_index(backend: str) -> str:
+    """Write a live index version of o/r as a build would, and return its collection."""
+    ids, vectors, documents, metadatas = chunks()
+    collection = rag_tool.collection_name("o", "r", 1)
+    vectorstore = rag_tool.open_vectorstore("o", "r", collection, backend=backend)
+    if backend == "flat":
+        vectorstore._collection.upsert(ids, vectors, documents, metadatas)
+        vectorstore.flush()
+    else:
+        vectorstore._collection.upsert(
+            ids=ids, embeddings=vectors.tolist(), documents=documents, metadatas=metadatas
+        )
+    lexical = LexicalIndex(rag_tool.lexical_index_path(collection))
+    lexical.add(ids, documents, metadatas)
+    lexical.close()
+    rag_tool.save_index_state(
+        "o", "r", "c0ffee", {"app.py": 6, "pkg/util.py": 6}, collection, 1
+    )
+    return collection
+
+
+@pytest.mark.parametrize("backend", ["flat", "chroma"])
+def test_exported_snapshot_verifies_and_mounts(store, tmp_path, backend):
+    live = rag_tool.open_vectorstore("o", "r", build_live_index(backend))
+    path = str(tmp_path / "snapshot")
+
+    manifest = export_snapshot("o", "r", path)
+
+    assert sorted(os.listdir(path)) == sorted(
+        [MANIFEST_FILE, VECTORS_FILE, CHUNKS_FILE, LEXICAL_FILE]
+    )
+    assert manifest["commit"] == "c0ffee"
+    assert (manifest["chunks"], manifest["dimension"]) == (12, DIMENSION)
+    assert verify_snapshot(path) == manifest
+
+    snapshot = open_snapshot(path)
+    registry = IndexRegistry(
+        open_store=lambda owner, repo: pytest.fail("the snapshot is mounted"),
+        drop_store=lambda collection: pytest.fail("snapshots are never dropped"),
+    )
+    registry.mount("o", "r", snapshot.vectorstore, snapshot.info())
+    query = chunks()[1][4].tolist()
+    with registry.lease("o", "r") as handle:
+        assert handle.collection == snapshot.collection
+        found = handle.vectorstore.similarity_search_by_vector_with_score(query, k=3)
+    expected = live.similarity_search_by_vector_with_score(query, k=3)
+    assert [doc.id for doc, _ in found] == [doc.id for doc, _ in expected]
+    assert found[0][0].id == "o/r/app.py#2"
+    assert snapshot.lexical.search("handler_4", 1)[0][0] == "o/r/app.py#2"
+
+
+def test_export_leaves_nothing_behind_on_failure(store, tmp_path, monkeypatch):
+    build_live_index("flat")
+    path = str(tmp_path / "snapshot")
+
+    def compact(path):
+        raise OSError("disk full")
+
+    monkeypatch.setattr("tool.snapshot._compact", compact)
+
+    with pytest.raises(OSError):
+        export_snapshot("o", "r", path)
+
+    assert not os.path.exists(path)
+    assert not os.path.exists(f"{path}.tmp")
+
+
+def test_corrupt_snapshot_fails_verification(store, tmp_path):
+    build_live_index("flat")
+    path = str(tmp_path / "snapshot")
+    export_snapshot("o", "r", path)
+
+    with open(os.path.join(path, CHUNKS_FILE), "ab") as f:
+        f.write(b"\0")
+
+    with pytest.raises(SnapshotError, match="checksum"):
+        verify_snapshot(path)
+    with pytest.raises(SnapshotError, match="checksum"):
+        import_snapshot(path)
+
+
+def test_snapshot_of_another_model_is_not_mounted(store, tmp_path):
+    build_live_index("flat")
+    path = str(tmp_path / "snapshot")
+    export_snapshot("o", "r", path)
+    manifest_path = os.path.join(path, MANIFEST_FILE)
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    manifest["embedding_model"] = "another-model"
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+
+    with pytest.raises(SnapshotError, match="another-model"):
+        open_snapshot(path)
+
+
+def test_imported_snapshot_becomes_the_next_live_version(store, tmp_path):
+    previous = build_live_index("flat")
+    path = str(tmp_path / "snapshot")
+    export_snapshot("o", "r", path)
+
+    imported = import_snapshot(path)
+
+    state = rag_tool.load_index_state("o", "r")
+    assert state["collection"] == imported["collection"] != previous
+    assert state["version"] == 2
+    assert state["commit"] == "c0ffee"
+    assert state["files"] == {"app.py": 6, "pkg/util.py": 6}
+    # A writable copy, not the snapshot itself
+    index = FlatIndex(rag_tool.flat_index_path(imported["collection"]))
+    assert index.count() == 12
+    index.close()
+    lexical = rag_tool.open_lexical_index(imported["collection"])
+    assert lexical.count() == 12
+    lexical.close()
@@ -0,0 +1,120 @@
+import os
+import sys
+
+import pytest
+from tokenizers import Tokenizer
+from tokenizers.models import WordLevel
+from tokenizers.pre_tokenizers import Whitespace
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tool import token_counter
+from tool.token_counter import TokenCounter
+
+
+def save_tokenizer(path: str) -> None:
+    """A word-level stand-in for the embedding model's ``tokenizer.json``."""
+    tokenizer = Tokenizer(WordLevel({"[UNK]": 0, "def": 1}, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = Whitespace()
+    tokenizer.save(path)
+
+
+@pytest.fixture(autouse=True)
+def offline(tmp_path, monkeypatch):
+    """Resolve the tokenizer afresh, from an empty cache and without downloading."""
+    monkeypatch.setattr(token_counter, "_tokenizer", None)
+    monkeypatch.setattr(token_counter, "_token_counter", None)
+    monkeypatch.setattr(token_counter, "TOKENIZER_PATH", None)
+    monkeypatch.setattr(token_counter, "TOKENIZER_CACHE_DIR", str(tmp_path / "hub"))
+    monkeypatch.setattr(token_counter, "TOKENIZER_DOWNLOAD", False)
+    monkeypatch.setattr(
+        token_counter,
+        "download_tokenizer",
+        lambda: pytest.fail("downloaded without GIAS_TOKENIZER_DOWNLOAD"),
+    )
+
+
+def cache_hub_tokenizer(cache_dir) -> None:
+    """Lay out a downloaded copy of GIAS_TOKENIZER_REPO as huggingface_hub does."""
+    repo = cache_dir / ("models--" + token_counter.TOKENIZER_REPO.replace("/", "--"))
+    commit = "0" * 40
+    (repo / "refs").mkdir(parents=True)
+    (repo / "refs" / "main").write_text(commit)
+    (repo / "snapshots" / commit).mkdir(parents=True)
+    save_tokenizer(str(repo / "snapshots" / commit / "tokenizer.json"))
+
+
+def test_loads_the_tokenizer_at_the_configured_path(tmp_path, monkeypatch):
+    model_dir = tmp_path / "embeddinggemma-300m"
+    model_dir.mkdir()
+    save_tokenizer(str(model_dir / "tokenizer.json"))
+    monkeypatch.setattr(token_counter, "TOKENIZER_PATH", str(model_dir / "tokenizer.json"))
+
+    counter = TokenCounter()
+
+    assert counter.name == "hf:embeddinggemma-300m"
+    assert counter("def f ( x ) :") == 6
+
+
+def test_unavailable_tokenizer_falls_back_with_a_warning(tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr(token_counter, "TOKENIZER_PATH", str(tmp_path / "missing.json"))
+
+    counter = TokenCounter()
+
+    assert counter.name == "approx"
+    assert counter("def f(x):") == 6
+    assert "rebuilt in full" in caplog.text
+
+
+def test_uses_the_downloaded_hub_tokenizer_offline(tmp_path):
+    cache_hub_tokenizer(tmp_path / "hub")
+
+    counter = TokenCounter()
+
+    assert counter.name == "hf:embeddinggemma-300m"
+    assert counter("def f ( x ) :") == 6
+
+
+def test_downloads_only_when_enabled(tmp_path, monkeypatch):
+    model_dir = tmp_path / "download"
+    model_dir.mkdir()
+    save_tokenizer(str(model_dir / "tokenizer.json"))
+    monkeypatch.setattr(token_counter, "TOKENIZER_DOWNLOAD", True)
+    monkeypatch.setattr(
+        token_counter, "download_tokenizer", lambda: str(model_dir / "tokenizer.json")
+    )
+
+    assert TokenCounter().name == "hf:embeddinggemma-300m"
+
+
+def test_workers_use_the_tokenizer_they_are_given(tmp_path):
+    model_dir = tmp_path / "embeddinggemma-300m"
+    model_dir.mkdir()
+    save_tokenizer(str(model_dir / "tokenizer.json"))
+    # Resolving would fall back to the approximation here
+    token_counter.use_tokenizer("hf:embeddinggemma-300m", str(model_dir / "tokenizer.json"))
+
+    counter = token_counter.get_token_counter()
+
+    assert counter.name == "hf:embeddinggemma-300m"
+    assert counter("def f ( x ) :") == 6
+
+
+def test_counts_are_cached_by_digest():
+    calls = []
+
+    def count(text):
+        calls.append(text)
+        return len(text)
+
+    counter = TokenCounter(count=count, name="len", cache_size=2)
+    text = "x = 1\n" * 1000
+    assert counter(text) == counter(text) == len(text)
+
+    assert calls == [text]
+    assert all(len(key) == 16 for key in counter._cache)
+    counter("a")
+    counter("b")
+    # The least recently used count is evicted
+    assert counter(text) == len(text)
+    assert len(calls) == 4
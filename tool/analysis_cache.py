@@ -0,0 +1,217 @@
+"""
+Reuse of analyses of near-duplicate issues.
+
+Many issues are reported more than once in slightly different words. Every
+completed analysis is stored in a dedicated Chroma collection together with
+the embedding of its issue (the compact retrieval query), the index version
+it was made against, the model and a reference to its patch. A new issue
+whose embedding is at least ``ANALYSIS_CACHE_THRESHOLD`` cosine-similar to a
+stored one, against the same index version and model, is answered with the
+stored analysis and patch without calling the LLM.
+
+Analyses are only valid for the index version they were made with: a build
+that swaps in a new version makes them unreachable, and ``prune`` deletes
+them. The cache is off unless GIAS_ANALYSIS_CACHE is set to a true value.
+"""
+
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Dict, Iterable, List, Optional
+
+from dotenv import load_dotenv
+
+from tool.rag_tool import get_chroma_client, get_embeddings
+
+load_dotenv()
+ANALYSIS_CACHE_ENABLED = os.getenv("GIAS_ANALYSIS_CACHE", "").lower() in (
+    "1",
+    "true",
+    "yes",
+    "on",
+)
+# Minimum cosine similarity of two issues for an analysis to be reused
+ANALYSIS_CACHE_THRESHOLD = float(os.getenv("GIAS_ANALYSIS_CACHE_THRESHOLD", 0.95))
+# Not prefixed with "gias_": those are index versions, and collections no
+# index state points at are dropped as orphans
+ANALYSIS_COLLECTION = "issue_analyses"
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+
+class AnalysisCache:
+    """Completed analyses, searchable by issue embedding per index version."""
+
+    def __init__(
+        self,
+        threshold: float = ANALYSIS_CACHE_THRESHOLD,
+        collection: str = ANALYSIS_COLLECTION,
+        embeddings=None,
+    ):
+        """
+        Args:
+            threshold: Minimum cosine similarity for a stored analysis to match
+            collection: Chroma collection holding the analyses
+            embeddings: Embeddings of the issue queries (default: the
+                process-wide, cached embedding client)
+        """
+        self.threshold = threshold
+        self.embeddings = embeddings or get_embeddings()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._collection = get_chroma_client().get_or_create_collection(
+            collection, metadata={"hnsw:space": "cosine"}
+        )
+
+    def lookup(self, query: str, index_collection: str, model: str) -> Optional[Dict]:
+        """
+        Find the stored analysis of the most similar issue.
+
+        Args:
+            query: Retrieval query of the new issue
+            index_collection: Index version the analysis would be made against
+            model: Model that would make the analysis
+
+        Returns:
+            The stored entry (``analysis``, ``issue_id``, ``issue_url``,
+            ``issue_title``, ``patch`` and ``similarity``) if one is similar
+            enough, else None
+        """
+        vector = self.embeddings.embed_query(query)
+        result = self._collection.query(
+            query_embeddings=[vector],
+            n_results=1,
+            where={"$and": [{"collection": index_collection}, {"model": model}]},
+            include=["documents", "metadatas", "distances"],
+        )
+        entry = None
+        if result["ids"] and result["ids"][0]:
+            # Cosine distance is 1 - cosine similarity
+            similarity = 1.0 - result["distances"][0][0]
+            if similarity >= self.threshold:
+                entry = self._entry(
+                    result["documents"][0][0], result["metadatas"][0][0], similarity
+                )
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def store(
+        self,
+        query: str,
+        index_collection: str,
+        model: str,
+        issue_id: int,
+        issue_url: str,
+        issue_title: str,
+        analysis: str,
+        patch: Optional[Dict] = None,
+    ):
+        """
+        Store a completed analysis.
+
+        Args:
+            query: Retrieval query of the issue, embedded to find duplicates
+            index_collection: Index version the analysis was made against
+            model: Model that made the analysis
+            issue_id: GitHub issue ID
+            issue_url: Issue URL
+            issue_title: Issue title
+            analysis: Analysis text
+            patch: Generated patch (``patch_file``, ``metadata_file``,
+                ``commit_message``, ``files_changed``, ``status``), if any
+        """
+        patch = patch or {}
+        metadata = {
+            "collection": index_collection,
+            "model": model,
+            "issue_id": issue_id,
+            "issue_url": issue_url,
+            "issue_title": issue_title,
+            "patch_status": patch.get("status") or "not_generated",
+            "patch_file": patch.get("patch_file") or "",
+            "metadata_file": patch.get("metadata_file") or "",
+            "commit_message": patch.get("commit_message") or "",
+            # Chroma metadata values are scalars
+            "files_changed": "\n".join(patch.get("files_changed") or []),
+            "created_at": time.time(),
+        }
+        self._collection.add(
+            ids=[uuid.uuid4().hex],
+            embeddings=[self.embeddings.embed_query(query)],
+            documents=[analysis],
+            metadatas=[metadata],
+        )
+        logger.info(
+            f"Stored analysis of issue #{issue_id} for {index_collection}"
+        )
+
+    def prune(self, live_collections: Iterable[str]) -> int:
+        """Delete analyses made against index versions that are no longer live."""
+        live = list(live_collections)
+        where = {"collection": {"$nin": live}} if live else None
+        stale = self._collection.get(where=where, include=[])["ids"]
+        if stale:
+            self._collection.delete(ids=stale)
+            logger.info(f"Pruned {len(stale)} analyses of retired index versions")
+        return len(stale)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": self._collection.count(),
+                "threshold": self.threshold,
+            }
+
+    @staticmethod
+    def _entry(analysis: str, metadata: Dict, similarity: float) -> Dict:
+        files_changed: List[str] = [
+            path for path in metadata.get("files_changed", "").split("\n") if path
+        ]
+        return {
+            "analysis": analysis,
+            "similarity": similarity,
+            "issue_id": metadata["issue_id"],
+            "issue_url": metadata["issue_url"],
+            "issue_title": metadata["issue_title"],
+            "patch": {
+                "status": metadata["patch_status"],
+                "patch_file": metadata["patch_file"] or None,
+                "metadata_file": metadata["metadata_file"] or None,
+                "commit_message": metadata["commit_message"] or None,
+                "files_changed": files_changed,
+            },
+        }
+
+
+_analysis_cache = None
+_analysis_cache_guard = threading.Lock()
+
+
+def get_analysis_cache() -> Optional[AnalysisCache]:
+    """Return the process-wide analysis cache, or None if it is disabled."""
+    global _analysis_cache
+    if not ANALYSIS_CACHE_ENABLED:
+        return None
+    with _analysis_cache_guard:
+        if _analysis_cache is None:
+            _analysis_cache = AnalysisCache()
+            logger.info(
+                f"Analysis cache enabled (similarity >= {ANALYSIS_CACHE_THRESHOLD})"
+            )
+        return _analysis_cache
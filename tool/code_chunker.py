@@ -0,0 +1,332 @@
+"""
+Syntax-aware code chunking.
+
+Python files are split at top-level function and class boundaries using
+``ast``: a definition stays in one chunk together with its decorators and
+leading comments, large classes are split per method, and small adjacent
+definitions are packed together up to ``chunk_size``. Other languages use
+LangChain's language-specific separators. Sizes are measured in tokens of
+the embedding model (see ``tool.token_counter``). Every chunk records the
+file path, the symbols it defines, its line range and its token count in
+its metadata.
+"""
+
+import ast
+import bisect
+import logging
+import re
+from typing import Callable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+from langchain_text_splitters import Language, RecursiveCharacterTextSplitter
+
+from tool.token_counter import CHUNK_TOKENS, get_token_counter
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+# Bump when chunk boundaries change, so incremental builds re-chunk everything
+CHUNKER_VERSION = "syntax-2"
+
+LANGUAGE_BY_EXTENSION = {
+    "py": Language.PYTHON,
+    "js": Language.JS,
+    "ts": Language.TS,
+    "go": Language.GO,
+    "java": Language.JAVA,
+    "c": Language.C,
+    "h": Language.C,
+    "cpp": Language.CPP,
+    "md": Language.MARKDOWN,
+}
+
+# First definition in a non-Python chunk, used as its symbol name
+_SYMBOL_PATTERN = re.compile(
+    r"^\s*(?:export\s+)?(?:default\s+)?(?:public\s+|private\s+|protected\s+|static\s+|async\s+)*"
+    r"(?:function\*?|class|interface|struct|enum|type|func(?:\s+\([^)]*\))?)\s+(\w+)",
+    re.MULTILINE,
+)
+
+# A segment of a file: (symbol name, first line, last line), 1-based inclusive
+Segment = Tuple[str, int, int]
+
+
+class CodeChunker:
+    """Splits source files into chunks along syntactic boundaries."""
+
+    def __init__(
+        self,
+        chunk_size: int = CHUNK_TOKENS,
+        fallback_overlap: int = 50,
+        length_function: Optional[Callable[[str], int]] = None,
+    ):
+        """
+        Args:
+            chunk_size: Maximum chunk length, in units of ``length_function``
+            fallback_overlap: Overlap used by the separator-based fallback
+            length_function: Measures a piece of text. Defaults to the
+                process-wide token counter, loaded on first use.
+        """
+        self.chunk_size = chunk_size
+        self.fallback_overlap = fallback_overlap
+        self._length_function = length_function
+        self._fallback_splitters = {}
+
+    @property
+    def length_function(self) -> Callable[[str], int]:
+        if self._length_function is None:
+            self._length_function = get_token_counter()
+        return self._length_function
+
+    @property
+    def signature(self) -> str:
+        """Identifies the chunking configuration, recorded with the index."""
+        name = getattr(self.length_function, "name", "custom")
+        return f"{CHUNKER_VERSION}:{name}:{self.chunk_size}"
+
+    def split_document(self, doc: Document) -> List[Document]:
+        """Split one file into chunks carrying path/symbol/line metadata."""
+        text = doc.page_content
+        file_type = doc.metadata.get("file_type", "")
+
+        if file_type != "py":
+            return self._fallback_split(doc)
+        try:
+            tree = ast.parse(text)
+        except (SyntaxError, ValueError):
+            return self._fallback_split(doc)
+
+        lines = text.splitlines(keepends=True)
+        # Line sizes are measured once; prefix[n] is the size of lines 1..n
+        prefix = [0]
+        for line in lines:
+            prefix.append(prefix[-1] + self.length_function(line))
+
+        segments = self._python_segments(tree, prefix)
+        chunks = []
+        for symbols, start, end in self._pack(segments, prefix):
+            content = "".join(lines[start - 1 : end])
+            if content.strip():
+                chunks.append(
+                    self._make_chunk(
+                        doc,
+                        content,
+                        symbols,
+                        start,
+                        end,
+                        prefix[end] - prefix[start - 1],
+                    )
+                )
+        return chunks
+
+    def split_documents(self, docs: List[Document]) -> List[Document]:
+        chunks = []
+        for doc in docs:
+            chunks.extend(self.split_document(doc))
+        return chunks
+
+    # ------------------------------------------------------------------
+    # Python
+    # ------------------------------------------------------------------
+
+    def _python_segments(self, tree: ast.Module, prefix: List[int]) -> List[Segment]:
+        total_lines = len(prefix) - 1
+        segments: List[Segment] = []
+        prev_end = 0
+
+        for node in tree.body:
+            # Leading comments, decorators and blank lines belong to the
+            # next statement
+            start = prev_end + 1
+            end = node.end_lineno
+            name = getattr(node, "name", "")
+            is_definition = isinstance(
+                node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+            )
+
+            if not is_definition and segments and not segments[-1][0]:
+                # Merge runs of module-level statements (imports, constants)
+                segments[-1] = ("", segments[-1][1], end)
+            elif (
+                isinstance(node, ast.ClassDef)
+                and prefix[end] - prefix[start - 1] > self.chunk_size
+            ):
+                segments.extend(self._class_segments(node, start))
+            else:
+                segments.append((name, start, end))
+            prev_end = end
+
+        if segments and prev_end < total_lines:
+            name, start, _ = segments[-1]
+            segments[-1] = (name, start, total_lines)
+        return segments
+
+    def _class_segments(self, node: ast.ClassDef, start: int) -> List[Segment]:
+        """Split a large class into its header and one segment per member."""
+        segments: List[Segment] = []
+        # Keep the docstring and class attributes with the header; member
+        # decorators and comments go with the member
+        header_end = node.lineno
+        for i, child in enumerate(node.body):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                first_member = i
+                break
+            header_end = child.end_lineno
+        else:
+            return [(node.name, start, node.end_lineno)]
+
+        segments.append((node.name, start, header_end))
+        prev_end = header_end
+        for child in node.body[first_member:]:
+            name = getattr(child, "name", "")
+            symbol = f"{node.name}.{name}" if name else node.name
+            segments.append((symbol, prev_end + 1, child.end_lineno))
+            prev_end = child.end_lineno
+        if prev_end < node.end_lineno:
+            symbol, seg_start, _ = segments[-1]
+            segments[-1] = (symbol, seg_start, node.end_lineno)
+        return segments
+
+    def _pack(
+        self, segments: List[Segment], prefix: List[int]
+    ) -> List[Tuple[List[str], int, int]]:
+        """Greedily merge adjacent segments up to ``chunk_size``."""
+        packed: List[Tuple[List[str], int, int]] = []
+        current: Optional[Tuple[List[str], int, int]] = None
+        current_len = 0
+
+        for symbol, start, end in segments:
+            length = prefix[end] - prefix[start - 1]
+            if length > self.chunk_size:
+                if current:
+                    packed.append(current)
+                    current, current_len = None, 0
+                packed.extend(self._split_lines(symbol, start, end, prefix))
+                continue
+            if current and current_len + length <= self.chunk_size:
+                symbols = current[0] + ([symbol] if symbol else [])
+                current = (symbols, current[1], end)
+                current_len += length
+            else:
+                if current:
+                    packed.append(current)
+                current = ([symbol] if symbol else [], start, end)
+                current_len = length
+        if current:
+            packed.append(current)
+        return packed
+
+    def _split_lines(
+        self, symbol: str, start: int, end: int, prefix: List[int]
+    ) -> List[Tuple[List[str], int, int]]:
+        """Split an oversized segment into line windows of <= chunk_size."""
+        windows = []
+        window_start = start
+        window_len = 0
+        for line_no in range(start, end + 1):
+            line_len = prefix[line_no] - prefix[line_no - 1]
+            if window_len and window_len + line_len > self.chunk_size:
+                windows.append(([symbol] if symbol else [], window_start, line_no - 1))
+                window_start, window_len = line_no, 0
+            window_len += line_len
+        windows.append(([symbol] if symbol else [], window_start, end))
+        return windows
+
+    # ------------------------------------------------------------------
+    # Other languages
+    # ------------------------------------------------------------------
+
+    def _fallback_splitter(self, file_type: str) -> RecursiveCharacterTextSplitter:
+        if file_type not in self._fallback_splitters:
+            language = LANGUAGE_BY_EXTENSION.get(file_type)
+            if language is not None:
+                splitter = RecursiveCharacterTextSplitter.from_language(
+                    language,
+                    chunk_size=self.chunk_size,
+                    chunk_overlap=self.fallback_overlap,
+                    length_function=self.length_function,
+                    add_start_index=True,
+                )
+            else:
+                splitter = RecursiveCharacterTextSplitter(
+                    chunk_size=self.chunk_size,
+                    chunk_overlap=self.fallback_overlap,
+                    length_function=self.length_function,
+                    separators=["\n\n", "\n", " ", ""],
+                    add_start_index=True,
+                )
+            self._fallback_splitters[file_type] = splitter
+        return self._fallback_splitters[file_type]
+
+    def _fallback_split(self, doc: Document) -> List[Document]:
+        text = doc.page_content
+        line_offsets = [0]
+        for match in re.finditer("\n", text):
+            line_offsets.append(match.end())
+
+        splitter = self._fallback_splitter(doc.metadata.get("file_type", ""))
+        chunks = []
+        for piece in splitter.split_documents([doc]):
+            offset = piece.metadata.get("start_index", 0)
+            start = bisect.bisect_right(line_offsets, offset)
+            end = start + piece.page_content.count("\n")
+            symbols = _SYMBOL_PATTERN.findall(piece.page_content)[:5]
+            chunks.append(
+                self._make_chunk(
+                    doc,
+                    piece.page_content,
+                    symbols,
+                    start,
+                    end,
+                    self.length_function(piece.page_content),
+                )
+            )
+        return chunks
+
+    @staticmethod
+    def _make_chunk(
+        doc: Document,
+        content: str,
+        symbols: List[str],
+        start: int,
+        end: int,
+        tokens: int,
+    ) -> Document:
+        metadata = {
+            key: value
+            for key, value in doc.metadata.items()
+            if key != "start_index"
+        }
+        metadata.update(
+            {
+                "symbol": ", ".join(symbols),
+                "start_line": start,
+                "end_line": end,
+                "tokens": tokens,
+            }
+        )
+        return Document(page_content=content, metadata=metadata)
+
+
+_default_chunker = CodeChunker()
+
+
+def chunker_signature() -> str:
+    """Signature of the default chunker, see ``CodeChunker.signature``."""
+    return _default_chunker.signature
+
+
+def split_with_ids(doc: Document) -> Tuple[List[Document], List[str]]:
+    """
+    Split one document with the default chunker.
+
+    Chunk ids are ``{source}#{index}``, so re-indexing a file upserts its
+    chunks in place and deterministic splitting keeps them stable across runs.
+    """
+    chunks = _default_chunker.split_document(doc)
+    source = doc.metadata.get("source", "unknown")
+    return chunks, [f"{source}#{i}" for i in range(len(chunks))]
@@ -0,0 +1,292 @@
+"""
+Content-addressed, persistent embedding cache.
+
+Vectors are stored in SQLite keyed by ``sha256(model, dimension, text)``, so
+an identical chunk is embedded only once - across rebuilds, repositories
+and forks. The cache is capped in size and evicts least recently used
+vectors first. ``CachedEmbeddings`` wraps any LangChain ``Embeddings`` and
+only forwards cache misses to it.
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+
+load_dotenv()
+EMBEDDING_CACHE_PATH = os.getenv(
+    "GIAS_EMBEDDING_CACHE_PATH", "./embedding_cache.sqlite3"
+)
+EMBEDDING_CACHE_MAX_BYTES = int(
+    os.getenv("GIAS_EMBEDDING_CACHE_MAX_BYTES", 2 * 1024**3)
+)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+
+def _pack(vector: List[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def _unpack(blob: bytes) -> List[float]:
+    vector = array("f")
+    vector.frombytes(blob)
+    return vector.tolist()
+
+
+class EmbeddingCache:
+    """SQLite-backed LRU store of embedding vectors."""
+
+    def __init__(
+        self,
+        path: str = EMBEDDING_CACHE_PATH,
+        max_bytes: int = EMBEDDING_CACHE_MAX_BYTES,
+    ):
+        """
+        Open (or create) the cache.
+
+        Args:
+            path: SQLite database file
+            max_bytes: Total vector bytes above which LRU entries are evicted
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                key BLOB PRIMARY KEY,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_lru ON embeddings (last_access)"
+        )
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS models (
+                model TEXT PRIMARY KEY,
+                dimension INTEGER NOT NULL
+            )"""
+        )
+        self._conn.commit()
+        self._total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()[0]
+
+    @staticmethod
+    def make_key(model: str, dimension: int, text: str) -> bytes:
+        return hashlib.sha256(
+            f"{model}\0{dimension}\0{text}".encode("utf-8")
+        ).digest()
+
+    def get_dimension(self, model: str) -> Optional[int]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT dimension FROM models WHERE model = ?", (model,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set_dimension(self, model: str, dimension: int):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO models (model, dimension) VALUES (?, ?)",
+                (model, dimension),
+            )
+            self._conn.commit()
+
+    def get_many(
+        self, keys: List[bytes], touch: bool = True
+    ) -> Dict[bytes, List[float]]:
+        """
+        Look up vectors.
+
+        Args:
+            keys: Cache keys, see ``make_key``
+            touch: Refresh the LRU timestamp of every hit. This is a write,
+                so latency-sensitive lookups can skip it.
+        """
+        found = {}
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                batch = keys[i : i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    batch,
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = _unpack(blob)
+            if found and touch:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items: Dict[bytes, List[float]]):
+        """Store vectors, evicting LRU entries if the size cap is exceeded."""
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            added_bytes = 0
+            for key, vector in items.items():
+                blob = _pack(vector)
+                # Keys are content hashes, so an existing row already holds
+                # the same vector
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO embeddings (key, vector, last_access) "
+                    "VALUES (?, ?, ?)",
+                    (key, blob, now),
+                )
+                if cursor.rowcount:
+                    added_bytes += len(blob)
+            self._total_bytes += added_bytes
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def count_misses(self, count: int):
+        """Record lookups that could not be attempted (unknown dimension)."""
+        with self._lock:
+            self.misses += count
+
+    def _evict(self):
+        """Drop least recently used vectors until 90% of the cap is free."""
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        while self._total_bytes > target:
+            rows = self._conn.execute(
+                "SELECT key, LENGTH(vector) FROM embeddings "
+                "ORDER BY last_access LIMIT 1000"
+            ).fetchall()
+            if not rows:
+                self._total_bytes = 0
+                break
+            self._conn.executemany(
+                "DELETE FROM embeddings WHERE key = ?", [(row[0],) for row in rows]
+            )
+            self._total_bytes -= sum(row[1] for row in rows)
+            evicted += len(rows)
+        logger.info(f"Evicted {evicted} vectors from the embedding cache")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only embeds texts missing from the cache."""
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        cache: EmbeddingCache,
+        model_name: str,
+        dimension: Optional[int] = None,
+    ):
+        """
+        Args:
+            embeddings: Underlying embedding model
+            cache: Persistent vector cache
+            model_name: Model name, part of the cache key
+            dimension: Embedding dimension, part of the cache key. Learned
+                from the first embedding (and remembered in the cache) if None.
+        """
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model_name = model_name
+        self.dimension = dimension or cache.get_dimension(model_name)
+        # Let the ingest pipeline size its batches after the wrapped client
+        self.batch_size = getattr(embeddings, "batch_size", 64)
+        self.max_concurrency = getattr(embeddings, "max_concurrency", 1)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts, touch=True)
+
+    def embed_query(self, text: str) -> List[float]:
+        # Queries are on the request path: a hit is read without refreshing
+        # its LRU timestamp, so it never commits under the cache lock that
+        # concurrent builds write with
+        return self._embed([text], touch=False)[0]
+
+    def _embed(self, texts: List[str], touch: bool) -> List[List[float]]:
+        if not texts:
+            return []
+
+        if self.dimension is None:
+            vectors = self.embeddings.embed_documents(texts)
+            self._learn_dimension(vectors)
+            self.cache.count_misses(len(texts))
+            self.cache.put_many(
+                {self._key(t): v for t, v in zip(texts, vectors)}
+            )
+            return vectors
+
+        keys = [self._key(text) for text in texts]
+        found = self.cache.get_many(list(set(keys)), touch=touch)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+
+        if missing:
+            missing_keys = list(missing)
+            vectors = self.embeddings.embed_documents(
+                [missing[key] for key in missing_keys]
+            )
+            new_items = dict(zip(missing_keys, vectors))
+            self.cache.put_many(new_items)
+            found.update(new_items)
+
+        return [found[key] for key in keys]
+
+    def stats(self) -> Dict:
+        return {
+            "cache": self.cache.stats(),
+            "client": self.embeddings.stats()
+            if hasattr(self.embeddings, "stats")
+            else {},
+        }
+
+    def _key(self, text: str) -> bytes:
+        return EmbeddingCache.make_key(self.model_name, self.dimension, text)
+
+    def _learn_dimension(self, vectors: List[List[float]]):
+        if vectors:
+            self.dimension = len(vectors[0])
+            self.cache.set_dimension(self.model_name, self.dimension)
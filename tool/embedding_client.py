@@ -0,0 +1,257 @@
+"""
+Batched, concurrent embedding client for Ollama.
+
+``OllamaEmbeddings`` sends one request per call with no control over batch
+size, concurrency, retries or timeouts. ``OllamaBatchEmbeddings`` is a
+drop-in LangChain ``Embeddings`` implementation that:
+
+- Splits input into batches for Ollama's ``/api/embed`` endpoint
+- Keeps up to ``max_concurrency`` requests in flight
+- Backs off adaptively: the in-flight limit is halved when batch latency
+  rises well above the observed baseline and grows again by one per fast
+  batch (AIMD)
+- Retries batches that failed transiently (connection errors, timeouts,
+  429, 5xx) with exponential backoff and jitter; other errors, such as a
+  404 for a model that was never pulled, fail at once
+- Reports throughput (embeddings/sec)
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import requests
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+from requests.adapters import HTTPAdapter
+
+load_dotenv()
+EMBED_BATCH_SIZE = int(os.getenv("GIAS_EMBED_BATCH_SIZE", 32))
+EMBED_CONCURRENCY = int(os.getenv("GIAS_EMBED_CONCURRENCY", 4))
+EMBED_TIMEOUT = float(os.getenv("GIAS_EMBED_TIMEOUT", 120))
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingError(Exception):
+    """Raised when a batch cannot be embedded (after all retries, if transient)."""
+
+
+def _is_transient(error: Exception) -> bool:
+    """Whether a failed batch is worth retrying."""
+    if isinstance(error, requests.HTTPError):
+        status = error.response.status_code if error.response is not None else 0
+        return status == 429 or status >= 500
+    # Malformed responses (bad JSON, missing or too few embeddings) are
+    # retried like an overloaded server's
+    if isinstance(error, requests.RequestException) and not isinstance(
+        error, ValueError
+    ):
+        return isinstance(error, (requests.ConnectionError, requests.Timeout))
+    return True
+
+
+def _error_message(error: requests.RequestException) -> str:
+    """Ollama's ``error`` field for an HTTP error, else the exception text."""
+    if error.response is None:
+        return str(error)
+    try:
+        message = error.response.json()["error"]
+    except (ValueError, KeyError, TypeError):
+        message = error.response.text[:200]
+    return f"HTTP {error.response.status_code}: {message}"
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit that shrinks when latency rises (AIMD).
+
+    The baseline is an exponentially weighted moving average of batch
+    latency. A batch slower than ``tolerance`` x baseline halves the limit;
+    any other batch raises it by one, up to ``max_limit``.
+    """
+
+    def __init__(self, max_limit: int, tolerance: float = 2.0, alpha: float = 0.2):
+        self.max_limit = max(1, max_limit)
+        self.limit = self.max_limit
+        self.tolerance = tolerance
+        self.alpha = alpha
+        self.baseline: Optional[float] = None
+        self.in_flight = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= self.limit:
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self, latency: Optional[float] = None):
+        with self._cond:
+            self.in_flight -= 1
+            if latency is not None:
+                self._observe(latency)
+            self._cond.notify_all()
+
+    def _observe(self, latency: float):
+        if self.baseline is None:
+            self.baseline = latency
+            return
+        if latency > self.baseline * self.tolerance:
+            new_limit = max(1, self.limit // 2)
+            if new_limit < self.limit:
+                logger.info(
+                    f"Embedding latency {latency:.2f}s above baseline "
+                    f"{self.baseline:.2f}s, concurrency {self.limit} -> {new_limit}"
+                )
+            self.limit = new_limit
+        else:
+            self.limit = min(self.max_limit, self.limit + 1)
+        self.baseline = (1 - self.alpha) * self.baseline + self.alpha * latency
+
+
+class OllamaBatchEmbeddings(Embeddings):
+    """LangChain Embeddings backed by batched, concurrent Ollama requests."""
+
+    def __init__(
+        self,
+        model: str,
+        base_url: str = "http://localhost:11434",
+        batch_size: int = EMBED_BATCH_SIZE,
+        max_concurrency: int = EMBED_CONCURRENCY,
+        timeout: float = EMBED_TIMEOUT,
+        max_retries: int = 4,
+        latency_tolerance: float = 2.0,
+    ):
+        """
+        Initialize the client.
+
+        Args:
+            model: Ollama embedding model name
+            base_url: Ollama server URL
+            batch_size: Texts per request
+            max_concurrency: Maximum requests in flight
+            timeout: Per-request timeout in seconds
+            max_retries: Retries per batch before giving up
+            latency_tolerance: Latency multiple over baseline that triggers
+                backoff
+        """
+        self.model = model
+        self.base_url = base_url.rstrip("/")
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.limiter = AdaptiveLimiter(max_concurrency, tolerance=latency_tolerance)
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="embed"
+        )
+
+        self._stats_lock = threading.Lock()
+        self._embedded = 0
+        self._requests = 0
+        self._retries = 0
+        self._busy_time = 0.0
+
+    # ------------------------------------------------------------------
+    # LangChain Embeddings interface
+    # ------------------------------------------------------------------
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        start = time.time()
+        batches = [
+            texts[i : i + self.batch_size]
+            for i in range(0, len(texts), self.batch_size)
+        ]
+        futures = [self._executor.submit(self._embed_batch, b) for b in batches]
+
+        vectors = []
+        for future in futures:
+            vectors.extend(future.result())
+
+        with self._stats_lock:
+            self._busy_time += time.time() - start
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed_batch([text])[0]
+
+    # ------------------------------------------------------------------
+    # Requests
+    # ------------------------------------------------------------------
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            start = time.time()
+            latency = None
+            try:
+                response = self._session.post(
+                    f"{self.base_url}/api/embed",
+                    json={"model": self.model, "input": texts},
+                    timeout=self.timeout,
+                )
+                response.raise_for_status()
+                embeddings = response.json()["embeddings"]
+                if len(embeddings) != len(texts):
+                    raise EmbeddingError(
+                        f"Expected {len(texts)} embeddings, got {len(embeddings)}"
+                    )
+                latency = time.time() - start
+                with self._stats_lock:
+                    self._requests += 1
+                    self._embedded += len(texts)
+                return embeddings
+            except (requests.RequestException, KeyError, ValueError, EmbeddingError) as e:
+                if not _is_transient(e):
+                    raise EmbeddingError(
+                        f"Embedding batch of {len(texts)} failed: {_error_message(e)}"
+                    ) from e
+                if attempt == self.max_retries:
+                    raise EmbeddingError(
+                        f"Embedding batch of {len(texts)} failed after "
+                        f"{attempt + 1} attempts: {e}"
+                    ) from e
+                with self._stats_lock:
+                    self._retries += 1
+                delay = min(2**attempt, 30) * (0.5 + random.random())
+                logger.warning(f"Embedding request failed ({e}); retrying in {delay:.1f}s")
+                # Count the failure as a slow batch so the limiter backs off
+                latency = time.time() - start + delay
+            finally:
+                self.limiter.release(latency)
+            time.sleep(delay)
+
+    # ------------------------------------------------------------------
+    # Reporting
+    # ------------------------------------------------------------------
+
+    def stats(self) -> Dict:
+        """Throughput statistics since the client was created."""
+        with self._stats_lock:
+            return {
+                "embeddings": self._embedded,
+                "requests": self._requests,
+                "retries": self._retries,
+                "busy_seconds": self._busy_time,
+                "embeddings_per_sec": (
+                    self._embedded / self._busy_time if self._busy_time else 0.0
+                ),
+                "concurrency_limit": self.limiter.limit,
+            }
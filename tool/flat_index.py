@@ -0,0 +1,576 @@
+"""
+Exact (brute-force) vector index on NumPy.
+
+For the repositories usually served (tens of thousands of chunks), scanning
+a float32 matrix is faster than an HNSW graph: a top-k query is one
+matrix-vector product and an ``argpartition``. There are no graph round
+trips to SQLite, recall is exact, and there is no build cost beyond writing
+the vectors. A version of an index is a directory holding:
+
+- ``vectors.npy``: the L2-normalised embeddings, one row per chunk,
+  memory-mapped read-only so open indexes share the page cache
+- ``chunks.sqlite3``: a side table mapping each matrix row to its chunk id,
+  text and JSON metadata
+
+``FlatIndex`` implements the subset of the Chroma collection API the rest of
+the code uses (``upsert``, ``get``, ``query``, ``count``, ``delete`` and
+``where`` filters), which the build pipeline writes to directly.
+``FlatVectorStore`` wraps it as a LangChain vectorstore with the same reads
+as ``rag_tool.ChromaVectorStore``, so agents and ``RetrievalContext`` work
+unchanged on either backend.
+
+While a version is being built, vectors are appended to a raw staging file;
+``flush`` writes the final ``.npy``.
+"""
+
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+VECTORS_FILE = "vectors.npy"
+STAGING_FILE = "vectors.f32"
+CHUNKS_FILE = "chunks.sqlite3"
+# Queries scored per matrix product in a batched search; bounds the score
+# matrix to QUERY_BLOCK x rows floats
+QUERY_BLOCK = 256
+
+_COMPARISONS = {
+    "$eq": "=",
+    "$ne": "!=",
+    "$lt": "<",
+    "$lte": "<=",
+    "$gt": ">",
+    "$gte": ">=",
+}
+
+
+def _field(key: str) -> str:
+    return "json_extract(metadata, '$.\"" + key.replace('"', '""') + "\"')"
+
+
+def _where_sql(where: Dict) -> Tuple[str, List[Any]]:
+    """
+    Translate a Chroma ``where`` filter into an SQL condition on the side table.
+
+    Supports ``$and``, ``$or``, ``$eq``, ``$ne``, ``$lt``, ``$lte``, ``$gt``,
+    ``$gte``, ``$in``, ``$nin`` and the ``{"key": value}`` shorthand.
+    """
+    clauses: List[str] = []
+    params: List[Any] = []
+    for key, condition in where.items():
+        if key in ("$and", "$or"):
+            parts = [_where_sql(item) for item in condition]
+            joiner = " AND " if key == "$and" else " OR "
+            clauses.append("(" + joiner.join(sql for sql, _ in parts) + ")")
+            for _, part_params in parts:
+                params.extend(part_params)
+            continue
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for op, value in condition.items():
+            if op in ("$in", "$nin"):
+                values = list(value)
+                if not values:
+                    clauses.append("0" if op == "$in" else "1")
+                    continue
+                negate = "NOT " if op == "$nin" else ""
+                placeholders = ",".join("?" * len(values))
+                clauses.append(f"{_field(key)} {negate}IN ({placeholders})")
+                params.extend(values)
+            elif op in _COMPARISONS:
+                clauses.append(f"{_field(key)} {_COMPARISONS[op]} ?")
+                params.append(value)
+            else:
+                raise ValueError(f"Unsupported where operator: {op}")
+    return " AND ".join(clauses) or "1", params
+
+
+def _normalise(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class FlatIndex:
+    """Exact cosine search over a memory-mapped float32 matrix of chunk embeddings."""
+
+    def __init__(self, path: str, name: Optional[str] = None, read_only: bool = False):
+        """
+        Open (or create) the index.
+
+        Args:
+            path: Directory of the index
+            name: Collection name reported by ``name`` (default: the
+                directory name)
+            read_only: Open a flushed index without ever writing to its
+                directory (e.g. a mounted snapshot on read-only storage)
+        """
+        self.path = path
+        self.name = name or os.path.basename(os.path.normpath(path))
+        self.read_only = read_only
+        self._lock = threading.Lock()
+        if read_only:
+            if not os.path.exists(os.path.join(path, VECTORS_FILE)):
+                raise FileNotFoundError(f"No flushed index in {path}")
+            # immutable: no locks, journal or WAL files next to the database
+            uri = Path(path, CHUNKS_FILE).resolve().as_uri() + "?mode=ro&immutable=1"
+            self._conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        else:
+            os.makedirs(path, exist_ok=True)
+            self._conn = sqlite3.connect(
+                os.path.join(path, CHUNKS_FILE), check_same_thread=False
+            )
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            # row is the chunk's row in the vector matrix
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks (row INTEGER PRIMARY KEY, "
+                "id TEXT NOT NULL UNIQUE, document TEXT, metadata TEXT NOT NULL)"
+            )
+            # Traceback frames are resolved by path and line range
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS chunks_path ON chunks "
+                f"({_field('path')})"
+            )
+            self._conn.commit()
+        self._staging = None
+        self._matrix: Optional[np.ndarray] = None
+        self._valid: Optional[np.ndarray] = None
+        self._dimension: Optional[int] = None
+        self._rows = 0
+        self._sealed = False
+
+        vectors_path = os.path.join(path, VECTORS_FILE)
+        staging_path = os.path.join(path, STAGING_FILE)
+        if os.path.exists(vectors_path):
+            self._matrix = np.load(vectors_path, mmap_mode="r")
+            self._rows, self._dimension = self._matrix.shape
+            self._sealed = True
+        elif os.path.exists(staging_path):
+            raise ValueError(f"{path} was not flushed after it was built")
+
+    # Writes
+
+    def upsert(
+        self,
+        ids: List[str],
+        embeddings: Sequence[Sequence[float]],
+        documents: Optional[List[str]] = None,
+        metadatas: Optional[List[Optional[Dict]]] = None,
+    ):
+        """Add chunks, replacing those whose id is already indexed."""
+        if not ids:
+            return
+        vectors = _normalise(np.asarray(embeddings, dtype=np.float32))
+        documents = documents or [None] * len(ids)
+        metadatas = metadatas or [None] * len(ids)
+        with self._lock:
+            if self._dimension is None:
+                self._dimension = vectors.shape[1]
+            elif vectors.shape[1] != self._dimension:
+                raise ValueError(
+                    f"Embedding dimension {vectors.shape[1]} does not match "
+                    f"the index ({self._dimension})"
+                )
+            if self._staging is None:
+                if self._sealed or self.read_only:
+                    raise ValueError(f"{self.path} is flushed and read-only")
+                self._staging = open(os.path.join(self.path, STAGING_FILE), "ab")
+            self._delete(ids)
+            self._conn.executemany(
+                "INSERT INTO chunks (row, id, document, metadata) VALUES (?, ?, ?, ?)",
+                [
+                    (self._rows + i, id_, document, json.dumps(metadata or {}))
+                    for i, (id_, document, metadata) in enumerate(
+                        zip(ids, documents, metadatas)
+                    )
+                ],
+            )
+            self._conn.commit()
+            self._staging.write(vectors.tobytes())
+            self._rows += len(ids)
+            self._matrix = None
+
+    def delete(self, ids: Iterable[str]):
+        """Remove chunks; unknown ids are ignored. Their rows stay in the matrix, masked."""
+        if self.read_only:
+            raise ValueError(f"{self.path} is opened read-only")
+        with self._lock:
+            self._delete(list(ids))
+            self._conn.commit()
+            self._valid = None
+
+    def _delete(self, ids: List[str]):
+        for start in range(0, len(ids), 500):
+            batch = ids[start : start + 500]
+            placeholders = ",".join("?" * len(batch))
+            self._conn.execute(f"DELETE FROM chunks WHERE id IN ({placeholders})", batch)
+        self._valid = None
+
+    def flush(self):
+        """Write the staged vectors as the memory-mapped ``vectors.npy``."""
+        with self._lock:
+            vectors_path = os.path.join(self.path, VECTORS_FILE)
+            staging_path = os.path.join(self.path, STAGING_FILE)
+            if self._staging is not None:
+                self._staging.close()
+                self._staging = None
+            shape = (self._rows, self._dimension or 0)
+            tmp_path = vectors_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                np.lib.format.write_array_header_1_0(
+                    f, {"descr": "<f4", "fortran_order": False, "shape": shape}
+                )
+                if os.path.exists(staging_path):
+                    with open(staging_path, "rb") as staging:
+                        shutil.copyfileobj(staging, f, 16 * 1024**2)
+            os.replace(tmp_path, vectors_path)
+            if os.path.exists(staging_path):
+                os.remove(staging_path)
+            self._matrix = np.load(vectors_path, mmap_mode="r")
+            self._sealed = True
+            logger.info(f"Flushed {shape[0]} vectors of [{self.name}]")
+
+    # Reads
+
+    def _vectors(self) -> np.ndarray:
+        """Vector matrix, including rows still in the staging file."""
+        if self._matrix is None:
+            if self._staging is not None:
+                self._staging.flush()
+            if self._rows:
+                self._matrix = np.memmap(
+                    os.path.join(self.path, STAGING_FILE),
+                    dtype=np.float32,
+                    mode="r",
+                    shape=(self._rows, self._dimension),
+                )
+            else:
+                self._matrix = np.empty((0, self._dimension or 0), dtype=np.float32)
+        return self._matrix
+
+    def _valid_rows(self) -> Optional[np.ndarray]:
+        """Mask of rows not replaced or deleted, None if every row is live."""
+        if self._valid is None:
+            live = np.zeros(self._rows, dtype=bool)
+            rows = [row for (row,) in self._conn.execute("SELECT row FROM chunks")]
+            live[rows] = True
+            self._valid = live
+        return None if self._valid.all() else self._valid
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def search(
+        self, vectors: np.ndarray, k: int, rows: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Exact top-k rows of several queries at once.
+
+        Args:
+            vectors: Query embeddings, one per row
+            k: Number of results per query
+            rows: Restrict the search to these matrix rows (default: all
+                live rows)
+
+        Returns:
+            ``(rows, scores)`` arrays of shape ``(queries, min(k, candidates))``,
+            best first; scores are cosine similarities
+        """
+        queries = _normalise(np.atleast_2d(np.asarray(vectors, dtype=np.float32)))
+        with self._lock:
+            matrix = self._vectors()
+            if rows is None:
+                valid = self._valid_rows()
+                rows = None if valid is None else np.flatnonzero(valid)
+        if rows is not None:
+            matrix = matrix[rows]
+        candidates = matrix.shape[0]
+        k = min(k, candidates)
+        if k <= 0:
+            empty = np.empty((len(queries), 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+
+        top_rows = np.empty((len(queries), k), dtype=np.int64)
+        top_scores = np.empty((len(queries), k), dtype=np.float32)
+        for start in range(0, len(queries), QUERY_BLOCK):
+            block = queries[start : start + QUERY_BLOCK]
+            scores = block @ matrix.T
+            if k < candidates:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            else:
+                top = np.broadcast_to(np.arange(candidates), scores.shape)
+            top_block = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_block, axis=1, kind="stable")
+            top = np.take_along_axis(top, order, axis=1)
+            top_rows[start : start + len(block)] = top
+            top_scores[start : start + len(block)] = np.take_along_axis(
+                top_block, order, axis=1
+            )
+        if rows is not None:
+            top_rows = rows[top_rows]
+        return top_rows, top_scores
+
+    def query(
+        self,
+        query_embeddings: Sequence[Sequence[float]],
+        n_results: int = 10,
+        where: Optional[Dict] = None,
+        include: Sequence[str] = ("documents", "metadatas", "distances"),
+    ) -> Dict[str, Any]:
+        """
+        Chroma-style nearest neighbour query; all query embeddings are
+        searched in one batch. ``distances`` are cosine distances.
+        """
+        rows = None
+        if where:
+            rows = np.array([row for (row,) in self._select(where)], dtype=np.int64)
+        top_rows, top_scores = self.search(np.asarray(query_embeddings), n_results, rows)
+        by_row = self._rows_by_id(top_rows.ravel().tolist(), include)
+        result: Dict[str, Any] = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for query_rows, scores in zip(top_rows.tolist(), top_scores.tolist()):
+            found = [(by_row[row], score) for row, score in zip(query_rows, scores)]
+            result["ids"].append([chunk[0] for chunk, _ in found])
+            result["documents"].append([chunk[1] for chunk, _ in found])
+            result["metadatas"].append([chunk[2] for chunk, _ in found])
+            result["distances"].append([1.0 - score for _, score in found])
+        return {key: value for key, value in result.items() if key == "ids" or key in include}
+
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[Dict] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        include: Sequence[str] = ("documents", "metadatas"),
+    ) -> Dict[str, Any]:
+        """Chroma-style fetch of chunks by id and/or ``where`` filter, in row order."""
+        selected = self._select(
+            where or {},
+            ids=ids,
+            limit=limit,
+            offset=offset,
+            columns="row, id, document, metadata",
+        )
+        result: Dict[str, Any] = {"ids": [row[1] for row in selected]}
+        if "documents" in include:
+            result["documents"] = [row[2] for row in selected]
+        if "metadatas" in include:
+            result["metadatas"] = [json.loads(row[3]) for row in selected]
+        if "embeddings" in include:
+            with self._lock:
+                matrix = self._vectors()
+            result["embeddings"] = np.asarray(
+                matrix[np.array([row[0] for row in selected], dtype=np.int64)]
+            )
+        return result
+
+    def _select(
+        self,
+        where: Dict,
+        ids: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        columns: str = "row",
+    ) -> List[tuple]:
+        sql, params = _where_sql(where)
+        if ids is not None:
+            if not ids:
+                return []
+            sql += f" AND id IN ({','.join('?' * len(ids))})"
+            params = params + list(ids)
+        query = f"SELECT {columns} FROM chunks WHERE {sql} ORDER BY row"
+        if limit is not None or offset:
+            query += " LIMIT ? OFFSET ?"
+            params = params + [-1 if limit is None else limit, offset or 0]
+        with self._lock:
+            return self._conn.execute(query, params).fetchall()
+
+    def _rows_by_id(self, rows: List[int], include: Sequence[str]) -> Dict[int, tuple]:
+        found: Dict[int, tuple] = {}
+        unique = list(dict.fromkeys(rows))
+        with self._lock:
+            for start in range(0, len(unique), 500):
+                batch = unique[start : start + 500]
+                for row, id_, document, metadata in self._conn.execute(
+                    "SELECT row, id, document, metadata FROM chunks "
+                    f"WHERE row IN ({','.join('?' * len(batch))})",
+                    batch,
+                ):
+                    found[row] = (id_, document, json.loads(metadata))
+        return found
+
+    def size_bytes(self) -> int:
+        """Bytes of the vector matrix (mapped, so resident only as pages are read)."""
+        return self._rows * (self._dimension or 0) * 4
+
+    def close(self):
+        with self._lock:
+            if self._staging is not None:
+                self._staging.close()
+                self._staging = None
+            self._matrix = None
+            self._conn.close()
+
+
+def remove_flat_index(path: str):
+    """Delete an index directory, ignoring a missing one."""
+    shutil.rmtree(path, ignore_errors=True)
+
+
+class FlatVectorStore(VectorStore):
+    """LangChain vectorstore over a ``FlatIndex``."""
+
+    def __init__(self, index: FlatIndex, embedding_function: Embeddings):
+        """
+        Args:
+            index: Index holding the chunks
+            embedding_function: Embeddings of the queries (the model the
+                chunks were embedded with)
+        """
+        # Same attribute as LangChain's Chroma: the build pipeline upserts
+        # pre-computed embeddings and the registry reads the collection's
+        # name and count through it, none of which the VectorStore API covers
+        self._collection = index
+        self._embedding_function = embedding_function
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding_function
+
+    def flush(self):
+        self._collection.flush()
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[Dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        if ids is None:
+            start = self._collection.count()
+            ids = [str(start + i) for i in range(len(texts))]
+        self._collection.upsert(
+            ids=ids,
+            embeddings=self._embedding_function.embed_documents(texts),
+            documents=texts,
+            metadatas=metadatas,
+        )
+        return ids
+
+    def similarity_search_by_vector_with_score(
+        self, embedding: List[float], k: int = 4, filter: Optional[Dict] = None
+    ) -> List[Tuple[Document, float]]:
+        """Top ``k`` chunks with their cosine distance to ``embedding``."""
+        result = self._collection.query(
+            query_embeddings=[embedding], n_results=k, where=filter
+        )
+        return [
+            (Document(id=id_, page_content=text, metadata=metadata), distance)
+            for id_, text, metadata, distance in zip(
+                result["ids"][0],
+                result["documents"][0],
+                result["metadatas"][0],
+                result["distances"][0],
+            )
+        ]
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, filter: Optional[Dict] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(
+            self._embedding_function.embed_query(query), k, filter
+        )
+
+    def similarity_search_by_vector(
+        self, embedding: List[float], k: int = 4, filter: Optional[Dict] = None, **kwargs: Any
+    ) -> List[Document]:
+        return [
+            doc
+            for doc, _ in self.similarity_search_by_vector_with_score(embedding, k, filter)
+        ]
+
+    def similarity_search(
+        self, query: str, k: int = 4, filter: Optional[Dict] = None, **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def batch_similarity_search(
+        self, queries: List[str], k: int = 4
+    ) -> List[List[Document]]:
+        """Top ``k`` chunks of each query, all scored in one matrix product."""
+        result = self._collection.query(
+            query_embeddings=self._embedding_function.embed_documents(queries),
+            n_results=k,
+        )
+        return [
+            [
+                Document(id=id_, page_content=text, metadata=metadata)
+                for id_, text, metadata in zip(ids, texts, metadatas)
+            ]
+            for ids, texts, metadatas in zip(
+                result["ids"], result["documents"], result["metadatas"]
+            )
+        ]
+
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[Dict] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        include: Sequence[str] = ("documents", "metadatas"),
+    ) -> Dict[str, Any]:
+        """Chunks by id and/or ``where`` filter, as returned by ``Chroma.get``."""
+        return self._collection.get(
+            ids=ids, where=where, limit=limit, offset=offset, include=include
+        )
+
+    def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
+        result = self._collection.get(ids=list(ids))
+        return [
+            Document(id=id_, page_content=text, metadata=metadata)
+            for id_, text, metadata in zip(
+                result["ids"], result["documents"], result["metadatas"]
+            )
+        ]
+
+    def _select_relevance_score_fn(self):
+        return self._cosine_relevance_score_fn
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[Dict]] = None,
+        ids: Optional[List[str]] = None,
+        path: Optional[str] = None,
+        **kwargs: Any,
+    ) -> "FlatVectorStore":
+        if path is None:
+            raise ValueError("FlatVectorStore.from_texts needs the index path")
+        store = cls(FlatIndex(path), embedding)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        store.flush()
+        return store
@@ -0,0 +1,454 @@
+"""
+Thin GitHub REST client for bulk repository reads.
+
+PyGithub issues one blocking request per object, which is fine for single
+issues but far too chatty for loading a whole repository. This client adds
+what bulk reads need:
+
+- A pooled ``requests.Session`` shared by all threads
+- Conditional requests: responses are cached on disk with their ETag /
+  Last-Modified and revalidated, and 304 responses do not count against the
+  rate limit
+- A content-addressed blob cache: a git blob SHA never changes content, so
+  blobs are fetched at most once
+- Backoff that honours ``Retry-After`` and the ``X-RateLimit-*`` headers,
+  plus exponential backoff with jitter on transient errors
+
+The base URL is configurable (``GITHUB_API_URL``) so GitHub Enterprise or a
+local stand-in server can be used.
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+load_dotenv()
+GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
+HTTP_CACHE_DIR = os.getenv("GIAS_HTTP_CACHE_DIR", "./http_cache")
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+
+class GitHubAPIError(Exception):
+    """Raised when a GitHub API request fails after all retries."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"GitHub API error {status}: {message}")
+        self.status = status
+
+
+class RateLimitScheduler:
+    """
+    Tracks the rate-limit headers of every response and delays requests
+    when the remaining quota is exhausted.
+    """
+
+    def __init__(self, reserve: int = 0, max_wait: float = 900.0):
+        """
+        Args:
+            reserve: Requests to keep in reserve; callers wait for the reset
+                once ``remaining`` drops to this value
+            max_wait: Upper bound in seconds for a single wait
+        """
+        self.reserve = reserve
+        self.max_wait = max_wait
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def update(self, headers) -> None:
+        """Record the rate-limit headers of a response."""
+        with self._lock:
+            if "X-RateLimit-Limit" in headers:
+                self.limit = int(headers["X-RateLimit-Limit"])
+            if "X-RateLimit-Remaining" in headers:
+                self.remaining = int(headers["X-RateLimit-Remaining"])
+            if "X-RateLimit-Reset" in headers:
+                self.reset_at = float(headers["X-RateLimit-Reset"])
+
+    def delay(self) -> float:
+        """Seconds to wait before the next request may be sent."""
+        with self._lock:
+            if self.remaining is None or self.reset_at is None:
+                return 0.0
+            if self.remaining > self.reserve:
+                return 0.0
+            return min(max(self.reset_at - time.time(), 0.0), self.max_wait)
+
+    def wait(self) -> None:
+        """Block until the quota allows another request."""
+        delay = self.delay()
+        if delay > 0:
+            logger.warning(f"GitHub rate limit reached, waiting {delay:.0f}s for reset")
+            time.sleep(delay)
+            with self._lock:
+                # The reset has passed; the next response reports the new quota
+                self.remaining = None
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "remaining": self.remaining,
+                "reset_at": self.reset_at,
+            }
+
+
+class GitHubAPIClient:
+    """Pooled, cached and rate-limit-aware GitHub REST client."""
+
+    def __init__(
+        self,
+        token: Optional[str] = GITHUB_TOKEN,
+        base_url: Optional[str] = None,
+        cache_dir: Optional[str] = HTTP_CACHE_DIR,
+        max_workers: int = 8,
+        max_retries: int = 5,
+        timeout: float = 30.0,
+        scheduler: Optional[RateLimitScheduler] = None,
+    ):
+        """
+        Initialize the client.
+
+        Args:
+            token: GitHub token (anonymous requests if None)
+            base_url: REST API root URL (default: GITHUB_API_URL)
+            cache_dir: Directory for the response and blob caches (None disables)
+            max_workers: Concurrent requests for bulk reads; also the pool size
+            max_retries: Retries for rate-limited and transient failures
+            timeout: Per-request timeout in seconds
+            scheduler: Rate-limit scheduler (shared across clients if given)
+        """
+        self.base_url = (base_url or GITHUB_API_URL).rstrip("/")
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.scheduler = scheduler or RateLimitScheduler()
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_workers)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._session.headers.update(
+            {
+                "Accept": "application/vnd.github+json",
+                "X-GitHub-Api-Version": "2022-11-28",
+                "User-Agent": "GIAS",
+            }
+        )
+        if token:
+            self._session.headers["Authorization"] = f"Bearer {token}"
+
+        if cache_dir:
+            os.makedirs(os.path.join(cache_dir, "responses"), exist_ok=True)
+            os.makedirs(os.path.join(cache_dir, "blobs"), exist_ok=True)
+
+    def close(self):
+        self._session.close()
+
+    # ------------------------------------------------------------------
+    # Requests
+    # ------------------------------------------------------------------
+
+    def _url(self, path: str) -> str:
+        if path.startswith(("http://", "https://")):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def request(
+        self, method: str, path: str, headers: Optional[Dict] = None, **kwargs
+    ) -> requests.Response:
+        """
+        Send a request, retrying on rate limiting and transient failures.
+
+        Returns:
+            The response (2xx or 304)
+
+        Raises:
+            GitHubAPIError: On a non-retryable error or when retries run out
+        """
+        url = self._url(path)
+        for attempt in range(self.max_retries + 1):
+            self.scheduler.wait()
+            try:
+                response = self._session.request(
+                    method, url, headers=headers, timeout=self.timeout, **kwargs
+                )
+            except requests.RequestException as e:
+                if attempt == self.max_retries:
+                    raise GitHubAPIError(0, str(e)) from e
+                self._backoff(attempt, f"{method} {url} failed: {e}")
+                continue
+
+            self.scheduler.update(response.headers)
+
+            if response.status_code < 400:
+                return response
+
+            retry_after = self._retry_after(response)
+            if retry_after is not None and attempt < self.max_retries:
+                logger.warning(
+                    f"Rate limited on {url}, retrying in {retry_after:.0f}s"
+                )
+                time.sleep(retry_after)
+                continue
+            if response.status_code >= 500 and attempt < self.max_retries:
+                self._backoff(attempt, f"{method} {url} -> {response.status_code}")
+                continue
+
+            raise GitHubAPIError(response.status_code, response.text[:500])
+
+        raise GitHubAPIError(0, f"Retries exhausted for {method} {url}")
+
+    def _retry_after(self, response: requests.Response) -> Optional[float]:
+        """Seconds to wait if the response is a rate-limit rejection."""
+        if response.status_code not in (403, 429):
+            return None
+        if "Retry-After" in response.headers:
+            return float(response.headers["Retry-After"])
+        if response.headers.get("X-RateLimit-Remaining") == "0":
+            reset_at = float(response.headers.get("X-RateLimit-Reset", time.time()))
+            return min(max(reset_at - time.time(), 1.0), self.scheduler.max_wait)
+        if response.status_code == 429:
+            return 60.0
+        return None
+
+    def _backoff(self, attempt: int, reason: str):
+        delay = min(2**attempt, 30) * (0.5 + random.random())
+        logger.warning(f"{reason}; retrying in {delay:.1f}s")
+        time.sleep(delay)
+
+    # ------------------------------------------------------------------
+    # Conditional GET with an on-disk response cache
+    # ------------------------------------------------------------------
+
+    def _response_cache_path(self, url: str, params: Optional[Dict]) -> str:
+        key = url + "?" + json.dumps(params or {}, sort_keys=True)
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, "responses", f"{digest}.json")
+
+    def get_json(
+        self, path: str, params: Optional[Dict] = None
+    ) -> Tuple[object, Dict]:
+        """
+        GET a JSON resource, revalidating a cached copy if there is one.
+
+        Returns:
+            Tuple of (decoded JSON body, response headers). Headers of a
+            revalidated response include ``X-GIAS-Cache: hit``.
+        """
+        url = self._url(path)
+        cached = None
+        cache_path = None
+        headers = {}
+
+        if self.cache_dir:
+            cache_path = self._response_cache_path(url, params)
+            if os.path.exists(cache_path):
+                try:
+                    with open(cache_path, "r", encoding="utf-8") as f:
+                        cached = json.load(f)
+                except Exception:
+                    cached = None
+            if cached:
+                if cached.get("etag"):
+                    headers["If-None-Match"] = cached["etag"]
+                if cached.get("last_modified"):
+                    headers["If-Modified-Since"] = cached["last_modified"]
+
+        response = self.request("GET", url, headers=headers, params=params)
+
+        if response.status_code == 304 and cached:
+            logger.debug(f"Not modified: {url}")
+            return cached["body"], {**cached["headers"], "X-GIAS-Cache": "hit"}
+
+        body = response.json()
+        response_headers = dict(response.headers)
+        if cache_path and (
+            response.headers.get("ETag") or response.headers.get("Last-Modified")
+        ):
+            tmp_path = f"{cache_path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "etag": response.headers.get("ETag"),
+                        "last_modified": response.headers.get("Last-Modified"),
+                        "headers": response_headers,
+                        "body": body,
+                    },
+                    f,
+                )
+            os.replace(tmp_path, cache_path)
+        return body, response_headers
+
+    # ------------------------------------------------------------------
+    # Git data
+    # ------------------------------------------------------------------
+
+    def _blob_cache_path(self, sha: str) -> str:
+        return os.path.join(self.cache_dir, "blobs", sha[:2], sha)
+
+    def get_blob(self, owner: str, name: str, sha: str) -> bytes:
+        """Fetch a git blob, from the content-addressed cache when possible."""
+        cache_path = self._blob_cache_path(sha) if self.cache_dir else None
+        if cache_path and os.path.exists(cache_path):
+            with open(cache_path, "rb") as f:
+                return f.read()
+
+        response = self.request("GET", f"/repos/{owner}/{name}/git/blobs/{sha}")
+        blob = response.json()
+        if blob.get("encoding") == "base64":
+            data = base64.b64decode(blob["content"])
+        else:
+            data = blob["content"].encode("utf-8")
+
+        if cache_path:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            tmp_path = f"{cache_path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, cache_path)
+        return data
+
+    def iter_blobs(
+        self, owner: str, name: str, entries: Iterable[Dict]
+    ) -> Iterator[Tuple[Dict, Optional[bytes]]]:
+        """
+        Fetch many blobs concurrently with at most ``max_workers`` in flight.
+
+        Args:
+            entries: Tree entries with at least ``sha`` and ``path``
+
+        Yields:
+            Tuples of (entry, blob bytes or None on failure), in input order
+        """
+
+        def fetch(entry: Dict) -> Tuple[Dict, Optional[bytes]]:
+            try:
+                return entry, self.get_blob(owner, name, entry["sha"])
+            except GitHubAPIError as e:
+                logger.warning(f"Could not fetch {entry['path']}: {e}")
+                return entry, None
+
+        window = self.max_workers * 2
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = deque()
+            for entry in entries:
+                pending.append(executor.submit(fetch, entry))
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+            for future in pending:
+                yield future.result()
+
+    def get_tree(
+        self,
+        owner: str,
+        name: str,
+        ref: Optional[str] = None,
+        include_dir: Optional[Callable[[str], bool]] = None,
+    ) -> Dict:
+        """
+        List the whole repository tree with a single recursive request.
+
+        GitHub truncates recursive listings of very large trees; the tree is
+        then listed again one level at a time, each subtree recursively, so
+        the result is always complete.
+
+        Args:
+            ref: Branch, tag or commit SHA (default branch if None)
+            include_dir: Called with the path of each directory when the tree
+                has to be listed by subtree; directories it rejects (e.g.
+                vendored dependencies, which often cause the truncation) are
+                left out instead of being listed
+        """
+        if ref is None:
+            repo_info, _ = self.get_json(f"/repos/{owner}/{name}")
+            ref = repo_info["default_branch"]
+        tree, _ = self.get_json(
+            f"/repos/{owner}/{name}/git/trees/{ref}", params={"recursive": "1"}
+        )
+        if tree.get("truncated"):
+            logger.warning(
+                f"Tree listing of {owner}/{name} was truncated by GitHub; "
+                "listing its subtrees separately"
+            )
+            tree = {
+                **tree,
+                "tree": self._list_subtrees(
+                    owner, name, tree["sha"], "", include_dir or (lambda path: True)
+                ),
+                "truncated": False,
+            }
+        return tree
+
+    def _list_subtrees(
+        self,
+        owner: str,
+        name: str,
+        sha: str,
+        prefix: str,
+        include_dir: Callable[[str], bool],
+    ) -> List[Dict]:
+        """Entries below tree ``sha``: its own level, then each included subtree recursively."""
+        level, _ = self.get_json(f"/repos/{owner}/{name}/git/trees/{sha}")
+        if level.get("truncated"):
+            raise GitHubAPIError(
+                0, f"Tree {prefix or '/'} of {owner}/{name} is too large to list"
+            )
+        entries = []
+        for entry in level.get("tree", []):
+            entry = {**entry, "path": prefix + entry["path"]}
+            if entry.get("type") == "tree" and not include_dir(entry["path"]):
+                continue
+            entries.append(entry)
+            if entry.get("type") != "tree":
+                continue
+            subtree, _ = self.get_json(
+                f"/repos/{owner}/{name}/git/trees/{entry['sha']}",
+                params={"recursive": "1"},
+            )
+            if subtree.get("truncated"):
+                entries.extend(
+                    self._list_subtrees(
+                        owner, name, entry["sha"], entry["path"] + "/", include_dir
+                    )
+                )
+            else:
+                entries.extend(
+                    {**child, "path": f"{entry['path']}/{child['path']}"}
+                    for child in subtree.get("tree", [])
+                )
+        return entries
+
+
+_github_api: Optional[GitHubAPIClient] = None
+_github_api_guard = threading.Lock()
+
+
+def get_github_api() -> GitHubAPIClient:
+    """Return the process-wide GitHub REST client."""
+    global _github_api
+    with _github_api_guard:
+        if _github_api is None:
+            _github_api = GitHubAPIClient()
+        return _github_api
@@ -1,15 +1,33 @@
 import logging
 import os
-import shutil
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterator, Optional
 
 import github
 from dotenv import load_dotenv
-from git import Repo
-from langchain_community.document_loaders import DirectoryLoader, TextLoader
+from git import GitCommandError, Repo
 from langchain_core.documents import Document
 
+from tool.github_api import GITHUB_API_URL, GitHubAPIError, get_github_api
+from tool.repo_cache import get_repo_cache
+from tool.repo_walker import (
+    MAX_FILE_SIZE,
+    document_from_bytes,
+    is_indexable_dir,
+    is_indexable_path,
+    iter_repo_documents,
+    iter_repo_paths,
+    load_repo_file,
+)
+
 load_dotenv()
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
+GITHUB_POOL_SIZE = int(os.getenv("GIAS_GITHUB_POOL_SIZE", 16))
+ISSUE_CACHE_TTL = float(os.getenv("GIAS_ISSUE_CACHE_TTL", 60))
+ISSUE_CACHE_SIZE = 1024
 
 logging.basicConfig(
     level=logging.INFO,
@@ -18,210 +36,258 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+_github = None
+_github_guard = threading.Lock()
+# Least recently used first
+_issue_cache: "OrderedDict[tuple[str, int], tuple[float, github.Issue.Issue]]" = (
+    OrderedDict()
+)
+_issue_cache_guard = threading.Lock()
+
+
+def get_github() -> github.Github:
+    """
+    Return the process-wide PyGithub client.
+
+    The client is created once and never closed, so its connection pool (and
+    the TLS sessions in it) is reused across requests.
+    """
+    global _github
+    with _github_guard:
+        if _github is None:
+            _github = github.Github(
+                auth=github.Auth.Token(GITHUB_TOKEN) if GITHUB_TOKEN else None,
+                base_url=GITHUB_API_URL,
+                pool_size=GITHUB_POOL_SIZE,
+            )
+        return _github
+
 
 def get_issue_by_issue_id(repo: str, id: int) -> github.Issue.Issue:
+    """
+    Fetch an issue, serving repeated lookups from cache.
 
-    g = github.Github(GITHUB_TOKEN)
-    result = g.get_repo(repo).get_issue(id)
-    g.close()
+    Issues fetched within the last ``ISSUE_CACHE_TTL`` seconds are returned
+    from memory without any request. Older ones are revalidated with a
+    conditional request (ETag / If-Modified-Since) against the on-disk
+    response cache, which does not count against the rate limit when the
+    issue is unchanged.
+    """
+    key = (repo, id)
+    with _issue_cache_guard:
+        cached = _issue_cache.get(key)
+        if cached:
+            _issue_cache.move_to_end(key)
+    if cached and time.monotonic() - cached[0] < ISSUE_CACHE_TTL:
+        return cached[1]
+
+    data, headers = get_github_api().get_json(f"/repos/{repo}/issues/{id}")
+    result = get_github().create_from_raw_data(github.Issue.Issue, data, headers)
+
+    with _issue_cache_guard:
+        _issue_cache[key] = (time.monotonic(), result)
+        _issue_cache.move_to_end(key)
+        while len(_issue_cache) > ISSUE_CACHE_SIZE:
+            _issue_cache.popitem(last=False)
     return result
 
 
 def get_repo(repo: str) -> github.Repository.Repository:
 
-    g = github.Github(GITHUB_TOKEN)
-    result = g.get_repo(repo)
-    g.close()
-    return result
+    get_github_api().scheduler.wait()
+    return get_github().get_repo(repo)
 
 
-def get_repo_content_by_git(owner, name: str) -> list[Document]:
-    repo_url = f"https://github.com/{owner}/{name}.git"
-    if os.name == "nt":
-        local_path = "./temp_repo_for_rag"
-    else:
-        local_path = "/tmp/temp_repo_for_rag"
+def _load_repo_files(
+    local_path: str, owner: str, name: str, rel_paths: list[str]
+) -> list[Document]:
+    """Load a specific set of repository-relative files as Documents."""
+    docs = []
+    for rel_path in rel_paths:
+        if not is_indexable_path(rel_path):
+            continue
+        doc = load_repo_file(local_path, owner, name, rel_path)
+        if doc is not None:
+            docs.append(doc)
+    return docs
 
-    if os.path.exists(local_path):
-        if os.name == "nt":
-            os.system('rmdir /S /Q "{}"'.format(local_path))
-        else:
-            shutil.rmtree(local_path)
 
-    shutil.os.makedirs(local_path, exist_ok=False)
+def _diff_since_commit(repo: Repo, since_commit: str) -> Optional[dict]:
+    """
+    Compute the files that changed between an indexed commit and HEAD.
 
-    logger.info(f"Starting shallow cloning (depth=1) of {repo_url}...")
+    The clone is shallow, so the old commit is fetched on demand. Returns None
+    when it is no longer reachable (e.g. after a force-push), in which case the
+    caller should fall back to a full rebuild.
+    """
     try:
-        repo = Repo.clone_from(
-            repo_url, local_path, depth=1, multi_options=["--filter=blob:none"]
-        )
+        repo.git.cat_file("-e", f"{since_commit}^{{commit}}")
+    except GitCommandError:
+        try:
+            repo.git.fetch("--depth=1", "origin", since_commit)
+        except GitCommandError as e:
+            logger.warning(f"Indexed commit {since_commit} is not reachable: {e}")
+            return None
+
+    try:
+        output = repo.git.diff("--name-status", "-M", since_commit, "HEAD")
+    except GitCommandError as e:
+        logger.warning(f"Could not diff {since_commit}..HEAD: {e}")
+        return None
+
+    diff = {"added": [], "modified": [], "deleted": [], "renamed": []}
+    for line in output.splitlines():
+        fields = line.split("\t")
+        status = fields[0][:1]
+        if status == "A":
+            diff["added"].append(fields[1])
+        elif status in ("M", "T"):
+            diff["modified"].append(fields[1])
+        elif status == "D":
+            diff["deleted"].append(fields[1])
+        elif status == "R":
+            diff["renamed"].append((fields[1], fields[2]))
+        elif status == "C":
+            diff["added"].append(fields[2])
+    return diff
+
+
+def iter_repo_content_by_git(owner: str, name: str) -> Iterator[Document]:
+    """
+    Lazily yield a Document per indexable file of the repository.
+
+    The cached checkout stays locked while the generator is being consumed,
+    so exhaust or close it promptly.
+    """
+    with get_repo_cache().checkout(owner, name) as repo:
+        logger.info("Checkout ready. Starting local file loading and filtering...")
+        yield from iter_repo_documents(repo.working_tree_dir, owner, name)
+
+
+def get_repo_content_by_git(owner, name: str) -> list[Document]:
+    try:
+        all_docs = list(iter_repo_content_by_git(owner, name))
     except Exception as e:
         logger.error(f"Cloning failed: {e}")
         return []
 
-    INCLUDE_PATTERNS = [
-        "*.py",
-        "*.js",
-        "*.ts",
-        "*.go",
-        "*.java",
-        "*.c",
-        "*.cpp",
-        "*.h",
-        "**/*.py",
-        "**/*.js",
-        "**/*.ts",
-        "**/*.go",
-        "**/*.java",
-        "**/*.c",
-        "**/*.cpp",
-        "**/*.h",
-        "README.md",
-    ]
-
-    EXCLUDE_PATTERNS = [
-        "*.log",
-        "*.lock",
-        "*.min.js",
-        "*.min.css",
-        "*/venv/*",
-        "*/node_modules/*",
-        "*/docs/*",
-        "*/tests/*",
-        "*.png",
-        "*.jpg",
-        "*.svg",
-        "*.webp",
-        "*.gif",
-        "*.pdf",
-    ]
-
-    logger.info("Clone completed. Starting local file loading and filtering...")
+    logger.info(
+        f"Local file loading complete. Total filtered code files: {len(all_docs)}"
+    )
 
-    all_docs = []
+    return all_docs
 
-    code_globs = [
-        "**/*.py",
-        "**/*.js",
-        "**/*.ts",
-        "**/*.go",
-        "**/*.java",
-        "**/*.c",
-        "**/*.cpp",
-        "**/*.h",
-        "README.md",
-    ]
-
-    for code_glob in code_globs:
-        try:
-            loader = DirectoryLoader(
-                path=local_path,
-                glob=code_glob,
-                loader_cls=TextLoader,
-                loader_kwargs={"encoding": "utf-8"},
-                use_multithreading=True,
-            )
 
-            loaded_files = loader.load()
-
-            for doc in loaded_files:
-                if not any(
-                    excluded_dir in doc.metadata.get("path", "")
-                    for excluded_dir in (
-                        "venv",
-                        "node_modules",
-                        "dist",
-                        "docs",
-                        "tests",
-                    )
-                ):
-                    if len(doc.page_content.strip()) > 50:
-                        doc.metadata["source"] = doc.metadata.get("path", "Unknown")
-                        all_docs.append(doc)
-
-        except Exception as e:
-            logger.warning(f"Error loading files with glob {code_glob}: {e}")
+@contextmanager
+def checkout_repo_changes(
+    owner: str, name: str, since_commit: Optional[str] = None
+) -> Iterator[dict]:
+    """
+    Update the cached checkout and collect what needs (re-)indexing since a commit.
+
+    The checkout stays locked for the duration of the ``with`` block, during
+    which ``documents`` can be consumed lazily.
+
+    Args:
+        owner: Repository owner
+        name: Repository name
+        since_commit: Commit SHA the current index was built from, if any
+
+    Yields:
+        Dictionary with:
+        - head_commit: SHA of the checked out HEAD
+        - incremental: True if only the files changed since ``since_commit``
+          are loaded, False if the whole repository is loaded
+        - documents: Documents to (re-)embed (lazy for full rebuilds)
+        - file_count: Upper bound on the number of ``documents``, for
+          progress reporting
+        - stale_paths: Repository-relative paths whose chunks must be dropped
+          (modified, deleted and renamed-away files)
+
+    Raises:
+        Exception: If the repository could not be cloned or updated
+    """
+    with get_repo_cache().checkout(owner, name) as repo:
+        yield _collect_repo_changes(repo, owner, name, since_commit)
+
+
+def _collect_repo_changes(
+    repo: Repo, owner: str, name: str, since_commit: Optional[str]
+) -> dict:
+    local_path = repo.working_tree_dir
+    head_commit = repo.head.commit.hexsha
+    diff = _diff_since_commit(repo, since_commit) if since_commit else None
+
+    if diff is None:
+        logger.info("Loading all files for a full rebuild...")
+        return {
+            "head_commit": head_commit,
+            "incremental": False,
+            "documents": iter_repo_documents(local_path, owner, name),
+            "file_count": sum(1 for _ in iter_repo_paths(local_path)),
+            "stale_paths": [],
+        }
+
+    changed = diff["added"] + diff["modified"]
+    changed += [new_path for _, new_path in diff["renamed"]]
+    stale = diff["modified"] + diff["deleted"]
+    stale += [old_path for old_path, _ in diff["renamed"]]
 
     logger.info(
-        f"Local file loading complete. Total filtered code files: {len(all_docs)}"
+        f"{since_commit[:12]}..{head_commit[:12]}: {len(diff['added'])} added, "
+        f"{len(diff['modified'])} modified, {len(diff['renamed'])} renamed, "
+        f"{len(diff['deleted'])} deleted"
     )
 
-    if os.name == "nt":
-        os.system('rmdir /S /Q "{}"'.format(local_path))
-    else:
-        shutil.rmtree(local_path)
-
-    return all_docs
+    return {
+        "head_commit": head_commit,
+        "incremental": True,
+        "documents": _load_repo_files(local_path, owner, name, changed),
+        "file_count": len(changed),
+        "stale_paths": [path for path in stale if is_indexable_path(path)],
+    }
 
 
 def get_repo_content(owner: str, name: str) -> list[Document]:
     """
-    Uses PyGithub to recursively fetch code file contents from the repository.
+    Uses the GitHub REST API to fetch code file contents from the repository.
+
+    The whole tree is listed with a single recursive Git Trees request and
+    the matching blobs are then fetched concurrently. Responses and blobs are
+    cached on disk, so a repeated load only revalidates the tree listing.
+    Use this where cloning is not possible.
     """
     logger.info(f"Connecting to GitHub and loading repository: {owner}/{name}...")
 
-    g = github.Github(GITHUB_TOKEN)
-    logger.info("Connection established.")
+    client = get_github_api()
 
     try:
-        repo = g.get_user(owner).get_repo(name)
-        logger.info(f"Repository '{owner}/{name}' loaded successfully.")
-    except Exception as e:
+        tree = client.get_tree(owner, name, include_dir=is_indexable_dir)
+        logger.info(f"Repository '{owner}/{name}' tree listed successfully.")
+    except GitHubAPIError as e:
         logger.error(f"Failed to connect or repository not found: {e}")
         return []
 
-    all_docs = []
+    entries = []
+    for entry in tree.get("tree", []):
+        if entry.get("type") != "blob" or not is_indexable_path(entry["path"]):
+            continue
+        if entry.get("size", 0) > MAX_FILE_SIZE:
+            logger.debug(
+                f"Skipping large file: {entry['path']} (Size: {entry['size']} bytes)"
+            )
+            continue
+        entries.append(entry)
 
-    def get_dir_contents(path: str):
-        """Recursively traverses the repository contents."""
-        try:
-            contents = repo.get_contents(path)
-            logger.debug(f"Fetched contents of directory: {path or 'root'}")
-        except Exception:
-            return
-
-        for content in contents:
-            if content.type == "dir":
-                # Skip large or irrelevant folders
-                if content.path.startswith(
-                    (".git", "venv", "node_modules", "docs", "examples", "tests")
-                ):
-                    logger.debug(f"Skipping directory: {content.path}")
-                    continue
-                get_dir_contents(content.path)
-
-            elif content.type == "file":
-                # Process code files and check size limit
-                is_code_file = content.path.endswith(
-                    (".py", ".js", ".ts", ".go", ".java", ".c", ".cpp", ".h")
-                )
-
-                if not is_code_file or content.size > 1024 * 1024:
-                    logger.debug(
-                        f"Skipping non-code or large file: {content.path} (Size: {content.size} bytes)"
-                    )
-                    continue
-
-                try:
-                    # Fetch file content via API call
-                    file_content = content.decoded_content.decode("utf-8")
-
-                    # Create LangChain Document
-                    doc = Document(
-                        page_content=file_content,
-                        metadata={
-                            "source": f"{owner}/{name}/{content.path}",
-                            "file_type": content.path.split(".")[-1],
-                        },
-                    )
-                    all_docs.append(doc)
-                    logger.debug(f"Processed file: {content.path}")
-
-                except Exception as e:
-                    logger.warning(f"Could not process file {content.path}: {e}")
-
-    # Start traversal from the root
-    get_dir_contents("")
-
-    logger.info(f"PyGithub loading complete. Total code files fetched: {len(all_docs)}")
+    logger.info(f"Fetching {len(entries)} files with {client.max_workers} workers...")
+
+    all_docs = []
+    for entry, data in client.iter_blobs(owner, name, entries):
+        if data is None:
+            continue
+        doc = document_from_bytes(owner, name, entry["path"], data)
+        if doc is not None:
+            all_docs.append(doc)
+
+    logger.info(f"GitHub API loading complete. Total code files fetched: {len(all_docs)}")
     return all_docs
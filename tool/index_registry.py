@@ -0,0 +1,397 @@
+"""
+Registry of per-repository indexes.
+
+Every ``owner/repo`` is indexed into its own Chroma collection (see
+``rag_tool.collection_name``), so several repositories can be served side by
+side and switching between them needs no rebuild. The registry opens
+handles lazily on first use and keeps the most recently used ones open,
+closing the least recently used handles once their estimated size exceeds
+the memory budget. Objects built on top of an index (agents, retrievers)
+are cached on its handle and dropped with it.
+
+A read-only index snapshot (see ``tool.snapshot``) can be ``mount``-ed for
+a repository instead; it stays available when its handle is evicted and is
+never dropped.
+
+Builds write a new collection version and then ``put`` it (blue/green):
+the swap is a single assignment under the registry lock, so new requests
+see either the old or the new version. Requests hold a ``lease`` on the
+version they started with; a replaced version is dropped once its last
+lease is released.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+from dotenv import load_dotenv
+from langchain_community.vectorstores import Chroma
+from langchain_core.vectorstores import VectorStore
+
+from tool.lexical_index import remove_lexical_index
+from tool.rag_tool import (
+    FLAT_INDEX_DIR,
+    LEXICAL_INDEX_DIR,
+    drop_collection,
+    get_chroma_client,
+    get_embeddings,
+    list_indexed_repositories,
+    open_vectorstore,
+    read_index_state,
+)
+
+load_dotenv()
+INDEX_CACHE_MAX_BYTES = int(os.getenv("GIAS_INDEX_CACHE_MAX_BYTES", 2 * 1024**3))
+INDEX_CACHE_MAX_OPEN = int(os.getenv("GIAS_INDEX_CACHE_MAX_OPEN", 16))
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+# Per-vector overhead of the HNSW graph and metadata on top of the raw floats
+_VECTOR_OVERHEAD_BYTES = 256
+
+
+class IndexNotFoundError(KeyError):
+    """Raised when a repository has not been indexed yet."""
+
+
+class IndexHandle:
+    """An open repository index and the objects built on top of it."""
+
+    def __init__(self, owner: str, repo: str, vectorstore: Chroma, size_bytes: int):
+        self.owner = owner
+        self.repo = repo
+        self.vectorstore = vectorstore
+        self.collection = vectorstore._collection.name
+        self.size_bytes = size_bytes
+        self.last_used = time.time()
+        self._resources: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def get_or_create(self, name: str, factory: Callable[[], object]):
+        """Return the cached resource ``name``, building it on first use."""
+        with self._lock:
+            if name not in self._resources:
+                self._resources[name] = factory()
+            return self._resources[name]
+
+
+class IndexRegistry:
+    """LRU of open repository indexes, capped by estimated memory."""
+
+    def __init__(
+        self,
+        max_bytes: int = INDEX_CACHE_MAX_BYTES,
+        max_open: int = INDEX_CACHE_MAX_OPEN,
+        open_store: Callable[[str, str], Chroma] = open_vectorstore,
+        drop_store: Callable[[str], None] = drop_collection,
+    ):
+        """
+        Args:
+            max_bytes: Estimated memory of open indexes above which the least
+                recently used ones are closed
+            max_open: Maximum number of open indexes
+            open_store: Opens the live vectorstore of ``(owner, repo)``
+            drop_store: Deletes a collection by name
+        """
+        self.max_bytes = max_bytes
+        self.max_open = max_open
+        self.open_store = open_store
+        self.drop_store = drop_store
+        self._handles: "OrderedDict[str, IndexHandle]" = OrderedDict()
+        # collection name -> number of requests using it
+        self._leases: Dict[str, int] = {}
+        # Replaced collections waiting for their last lease to be released
+        self._retired: set = set()
+        # Mounted snapshots: repository key -> handle, and their listing
+        self._mounts: Dict[str, IndexHandle] = {}
+        self._mount_info: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(owner: str, repo: str) -> str:
+        return f"{owner}/{repo}"
+
+    def get(self, owner: str, repo: str) -> IndexHandle:
+        """
+        Return the handle of an indexed repository, opening it if needed.
+
+        Raises:
+            IndexNotFoundError: If the repository has not been indexed
+        """
+        key = self._key(owner, repo)
+        with self._lock:
+            handle = self._handles.get(key)
+            if handle is not None:
+                self._handles.move_to_end(key)
+                handle.last_used = time.time()
+                return handle
+            mounted = self._mounts.get(key)
+        if mounted is not None:
+            # Evicted: reopening a mapped snapshot costs nothing
+            return self._insert(key, mounted, replace=False)
+
+        # Servable whatever chunker settings built it; only a rebuild
+        # needs them to match
+        if read_index_state(owner, repo) is None:
+            raise IndexNotFoundError(key)
+
+        handle = IndexHandle(owner, repo, self.open_store(owner, repo), 0)
+        handle.size_bytes = self._estimate_size(handle.vectorstore)
+        return self._insert(key, handle, replace=False)
+
+    def peek(self, owner: str, repo: str) -> Optional[IndexHandle]:
+        """Return the handle if it is open, without opening or touching it."""
+        with self._lock:
+            return self._handles.get(self._key(owner, repo))
+
+    @contextmanager
+    def lease(self, owner: str, repo: str) -> Iterator[IndexHandle]:
+        """
+        Use the live index of a repository for the duration of a request.
+
+        The collection yielded stays readable until the lease is released,
+        even if a newer version is swapped in meanwhile.
+
+        Raises:
+            IndexNotFoundError: If the repository has not been indexed
+        """
+        key = self._key(owner, repo)
+        while True:
+            handle = self.get(owner, repo)
+            with self._lock:
+                # A swap between get() and here may already have retired or
+                # even dropped it; once leased while live, a swap retires it
+                if self._handles.get(key) is handle:
+                    self._leases[handle.collection] = (
+                        self._leases.get(handle.collection, 0) + 1
+                    )
+                    break
+        try:
+            yield handle
+        finally:
+            drop = False
+            with self._lock:
+                remaining = self._leases[handle.collection] - 1
+                if remaining:
+                    self._leases[handle.collection] = remaining
+                else:
+                    del self._leases[handle.collection]
+                    if handle.collection in self._retired:
+                        self._retired.discard(handle.collection)
+                        drop = True
+            if drop:
+                self.drop_store(handle.collection)
+
+    def mount(
+        self, owner: str, repo: str, vectorstore: VectorStore, info: Dict
+    ) -> IndexHandle:
+        """
+        Serve a repository from a read-only snapshot.
+
+        The snapshot stays mounted until a build of the repository is
+        ``put``, and it is never dropped.
+
+        Args:
+            owner: Repository owner
+            repo: Repository name
+            vectorstore: Vectorstore of the snapshot
+            info: ``collection``, ``commit``, ``updated_at`` and ``snapshot``
+                path, as listed by ``list``
+        """
+        handle = IndexHandle(owner, repo, vectorstore, self._estimate_size(vectorstore))
+        key = self._key(owner, repo)
+        with self._lock:
+            self._mounts[key] = handle
+            self._mount_info[key] = info
+        return self._insert(key, handle, replace=True)
+
+    def put(
+        self,
+        owner: str,
+        repo: str,
+        vectorstore: Chroma,
+        previous_collection: Optional[str] = None,
+    ) -> IndexHandle:
+        """
+        Swap in a (re)built vectorstore as the live version.
+
+        The previous version - the open handle's collection and/or
+        ``previous_collection`` - is retired: dropped now if no request is
+        using it, otherwise when its last lease is released. Resources
+        cached on the previous handle are dropped with it.
+        """
+        handle = IndexHandle(
+            owner, repo, vectorstore, self._estimate_size(vectorstore)
+        )
+        key = self._key(owner, repo)
+        with self._lock:
+            previous = self._handles.get(key)
+            retire = {previous_collection}
+            if previous is not None:
+                retire.add(previous.collection)
+            retire.discard(None)
+            # A build replaces a mounted snapshot, which is left in place
+            mounted = self._mounts.pop(key, None)
+            self._mount_info.pop(key, None)
+            if mounted is not None:
+                retire.discard(mounted.collection)
+            retire.discard(handle.collection)
+        self._insert(key, handle, replace=True)
+        for collection in retire:
+            self.retire(collection)
+        return handle
+
+    def retire(self, collection: str):
+        """Drop a replaced collection once no request is using it."""
+        with self._lock:
+            if self._leases.get(collection):
+                self._retired.add(collection)
+                logger.info(
+                    f"Retiring {collection} after {self._leases[collection]} "
+                    f"in-flight requests finish"
+                )
+                return
+        self.drop_store(collection)
+
+    def _insert(self, key: str, handle: IndexHandle, replace: bool) -> IndexHandle:
+        with self._lock:
+            existing = self._handles.get(key)
+            if existing is not None and not replace:
+                # Another request opened the index in the meantime
+                self._handles.move_to_end(key)
+                return existing
+            self._handles[key] = handle
+            self._handles.move_to_end(key)
+            self._evict(keep=key)
+            open_count = len(self._handles)
+        logger.info(
+            f"Opened index {key} [{handle.collection}] "
+            f"(~{handle.size_bytes / 1024**2:.1f} MiB, {open_count} open)"
+        )
+        return handle
+
+    def collect_orphans(self) -> List[str]:
+        """
+        Drop collections that no index state points at.
+
+        These are versions left behind by a crash between a swap and the
+        retirement of the old version, or by an interrupted build. Call it
+        when no build is running (e.g. at startup).
+        """
+        live = {index["collection"] for index in list_indexed_repositories()}
+        with self._lock:
+            in_use = set(self._leases) | {
+                handle.collection for handle in self._handles.values()
+            }
+        dropped = []
+        for collection in get_chroma_client().list_collections():
+            name = getattr(collection, "name", collection)
+            if name.startswith("gias_") and name not in live and name not in in_use:
+                self.drop_store(name)
+                dropped.append(name)
+        # Flat (NumPy) versions are directories, not Chroma collections
+        if os.path.isdir(FLAT_INDEX_DIR):
+            for name in os.listdir(FLAT_INDEX_DIR):
+                if name not in live and name not in in_use:
+                    self.drop_store(name)
+                    dropped.append(name)
+        # Lexical indexes whose collection is gone
+        if os.path.isdir(LEXICAL_INDEX_DIR):
+            for filename in os.listdir(LEXICAL_INDEX_DIR):
+                name = filename.split(".sqlite3")[0]
+                if name not in live and name not in in_use:
+                    remove_lexical_index(os.path.join(LEXICAL_INDEX_DIR, filename))
+        return dropped
+
+    def close(self, owner: str, repo: str):
+        with self._lock:
+            self._handles.pop(self._key(owner, repo), None)
+
+    def _evict(self, keep: str):
+        """Close LRU handles until the open set fits the budget."""
+        total = sum(handle.size_bytes for handle in self._handles.values())
+        for key in list(self._handles):
+            if total <= self.max_bytes and len(self._handles) <= self.max_open:
+                return
+            if key == keep:
+                continue
+            handle = self._handles.pop(key)
+            total -= handle.size_bytes
+            logger.info(f"Closed index {key} (least recently used)")
+
+    @staticmethod
+    def _estimate_size(vectorstore: Chroma) -> int:
+        try:
+            count = vectorstore._collection.count()
+        except Exception as e:
+            logger.warning(f"Could not count vectors: {e}")
+            return 0
+        dimension = getattr(get_embeddings(), "dimension", None) or 768
+        return count * (dimension * 4 + _VECTOR_OVERHEAD_BYTES)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            open_indexes = [
+                {
+                    "repo": key,
+                    "collection": handle.collection,
+                    "leases": self._leases.get(handle.collection, 0),
+                    "size_bytes": handle.size_bytes,
+                    "last_used": handle.last_used,
+                }
+                for key, handle in self._handles.items()
+            ]
+            retired = sorted(self._retired)
+        return {
+            "open": open_indexes,
+            "open_bytes": sum(index["size_bytes"] for index in open_indexes),
+            "max_bytes": self.max_bytes,
+            "retired": retired,
+        }
+
+    def list(self) -> List[Dict]:
+        """Every indexed repository, open or not, and every mounted snapshot."""
+        with self._lock:
+            open_keys = set(self._handles)
+            mounts = {
+                key: (self._mounts[key], info) for key, info in self._mount_info.items()
+            }
+        repositories = [
+            repository
+            for repository in list_indexed_repositories()
+            if self._key(repository["owner"], repository["repo"]) not in mounts
+        ]
+        for handle, info in mounts.values():
+            repositories.append({"owner": handle.owner, "repo": handle.repo, **info})
+        for repository in repositories:
+            repository["open"] = (
+                self._key(repository["owner"], repository["repo"]) in open_keys
+            )
+        return repositories
+
+
+_index_registry = None
+_index_registry_guard = threading.Lock()
+
+
+def get_index_registry() -> IndexRegistry:
+    """
+    Return the process-wide index registry.
+
+    The memory budget and handle limit are configured through
+    GIAS_INDEX_CACHE_MAX_BYTES and GIAS_INDEX_CACHE_MAX_OPEN.
+    """
+    global _index_registry
+    with _index_registry_guard:
+        if _index_registry is None:
+            _index_registry = IndexRegistry()
+        return _index_registry
@@ -0,0 +1,336 @@
+"""
+Lexical (BM25) index of repository chunks.
+
+Dense embeddings of whole chunks match exact identifiers, exception class
+names and config keys poorly. Every index version therefore gets a lexical
+index next to its Chroma collection, an SQLite FTS5 table ranked with BM25
+that holds the code tokens of each chunk:
+
+- Identifiers as written (``HTTPAdapter``, ``max_retries``), lowercased
+- Their parts (``http``, ``adapter``, ``max``, ``retries``), so a query
+  naming ``max_retries`` also matches ``maxRetries``
+- Tokens of the chunk's path and symbols
+
+The same database holds an inverted index of exact names: every chunk is
+listed under its file path (and each path suffix), its module name and the
+symbols it defines, bare and qualified (``resolve_redirects``,
+``Session.resolve_redirects``, ``requests.sessions.Session.resolve_redirects``).
+``lookup`` resolves names mentioned in an issue to their defining chunks
+without any ranking.
+
+Only the tokens, names and chunk ids are stored; the text is read back from
+the collection.
+Writes come from the single upsert stage of the ingest pipeline, and an
+incremental build copies the previous version's index and replaces the
+chunks of changed files.
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|[0-9]+")
+_CAMEL_PART = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+# Too common in code to tell chunks apart
+_STOP_WORDS = {
+    "self", "cls", "the", "and", "for", "def", "return", "import", "from",
+    "if", "else", "in", "is", "not", "none", "true", "false", "of", "to",
+    "a", "an", "or", "with", "as", "this", "that", "be", "it", "class",
+}
+# Cap on the query terms OR-ed together in one search
+MAX_QUERY_TERMS = 64
+# A name defined in (or a path suffix shared by) more places than this is
+# too ambiguous to resolve directly, e.g. ``__init__`` or ``utils.py``
+MAX_NAME_MATCHES = 3
+
+
+def code_tokens(text: str) -> List[str]:
+    """
+    Lowercased identifiers of ``text`` followed by their snake_case and
+    CamelCase parts, stop words and single characters removed.
+    """
+    tokens = []
+    for word in _WORD.findall(text):
+        lower = word.lower()
+        if len(lower) > 1 and lower not in _STOP_WORDS:
+            tokens.append(lower)
+        parts = [
+            part.lower()
+            for piece in word.split("_")
+            for part in _CAMEL_PART.findall(piece)
+        ]
+        if len(parts) > 1:
+            tokens.extend(
+                part for part in parts if len(part) > 1 and part not in _STOP_WORDS
+            )
+    return tokens
+
+
+def chunk_tokens(text: str, metadata: Optional[Dict] = None) -> str:
+    """Indexed tokens of a chunk: its text, path and symbols."""
+    metadata = metadata or {}
+    extra = " ".join(
+        str(metadata[key]) for key in ("path", "symbol") if metadata.get(key)
+    )
+    return " ".join(code_tokens(f"{extra}\n{text}"))
+
+
+def _match_expression(query: str) -> str:
+    """FTS5 query matching any code token of ``query`` ("" if it has none)."""
+    terms = list(dict.fromkeys(code_tokens(query)))[:MAX_QUERY_TERMS]
+    return " OR ".join(f'"{term}"' for term in terms)
+
+
+def _suffixes(name: str, separator: str) -> List[str]:
+    """``a.b.c`` -> ``a.b.c``, ``b.c``, ``c``"""
+    parts = name.split(separator)
+    return [separator.join(parts[i:]) for i in range(len(parts))]
+
+
+def chunk_names(metadata: Optional[Dict]) -> List[Tuple[str, str]]:
+    """
+    ``(kind, name)`` pairs a chunk is listed under in the inverted index.
+
+    ``path`` names are the file path, its suffixes and its module name;
+    ``symbol`` names are the defined symbols, bare, class-qualified and
+    module-qualified.
+    """
+    metadata = metadata or {}
+    names = set()
+    path = metadata.get("path") or ""
+    modules: List[str] = []
+    if path:
+        names.update(("path", suffix) for suffix in _suffixes(path, "/"))
+        module = os.path.splitext(path)[0].replace("/", ".")
+        if module.endswith(".__init__"):
+            module = module[: -len(".__init__")]
+        modules = _suffixes(module, ".")
+        names.update(("path", name) for name in modules)
+    for symbol in (metadata.get("symbol") or "").split(","):
+        symbol = symbol.strip()
+        if not symbol:
+            continue
+        names.update(("symbol", name) for name in _suffixes(symbol, "."))
+        names.update(("symbol", f"{module}.{symbol}") for module in modules)
+    return sorted(names)
+
+
+class LexicalIndex:
+    """BM25 search over the code tokens of one index version's chunks."""
+
+    def __init__(self, path: str, read_only: bool = False):
+        """
+        Open (or create) the index.
+
+        Args:
+            path: SQLite database file
+            read_only: Open an existing index without ever writing to it or
+                next to it (e.g. in a mounted snapshot)
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        if read_only:
+            if not os.path.exists(path):
+                raise FileNotFoundError(path)
+            uri = Path(path).resolve().as_uri() + "?mode=ro&immutable=1"
+            self._conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            return
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunk_ids "
+            "(rowid INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE)"
+        )
+        # Tokens are pre-split; "_" and digits stay part of a token
+        self._conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS chunks USING fts5("
+            "tokens, tokenize=\"unicode61 tokenchars '_'\")"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunk_names "
+            "(name TEXT NOT NULL, kind TEXT NOT NULL, chunk INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS chunk_names_name ON chunk_names (name)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS chunk_names_chunk ON chunk_names (chunk)"
+        )
+        self._conn.commit()
+
+    def add(self, ids: List[str], texts: List[str], metadatas: List[Dict]):
+        """Index chunks, replacing those whose id is already indexed."""
+        with self._lock:
+            self._delete(ids)
+            for id_, text, metadata in zip(ids, texts, metadatas):
+                rowid = self._conn.execute(
+                    "INSERT INTO chunk_ids (id) VALUES (?)", (id_,)
+                ).lastrowid
+                self._conn.execute(
+                    "INSERT INTO chunks (rowid, tokens) VALUES (?, ?)",
+                    (rowid, chunk_tokens(text, metadata)),
+                )
+                self._conn.executemany(
+                    "INSERT INTO chunk_names (name, kind, chunk) VALUES (?, ?, ?)",
+                    [(name, kind, rowid) for kind, name in chunk_names(metadata)],
+                )
+            self._conn.commit()
+
+    def delete(self, ids: Iterable[str]):
+        """Remove chunks from the index; unknown ids are ignored."""
+        with self._lock:
+            self._delete(list(ids))
+            self._conn.commit()
+
+    def _delete(self, ids: List[str]):
+        for start in range(0, len(ids), 500):
+            batch = ids[start : start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = self._conn.execute(
+                f"SELECT rowid, id FROM chunk_ids WHERE id IN ({placeholders})", batch
+            ).fetchall()
+            rowids = [(row[0],) for row in rows]
+            self._conn.executemany("DELETE FROM chunks WHERE rowid = ?", rowids)
+            self._conn.executemany("DELETE FROM chunk_names WHERE chunk = ?", rowids)
+            self._conn.executemany("DELETE FROM chunk_ids WHERE rowid = ?", rowids)
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """
+        Return up to ``k`` ``(chunk id, score)`` pairs, best first.
+
+        Any query token may match; BM25 ranks chunks matching more and
+        rarer tokens higher.
+        """
+        match = _match_expression(query)
+        if not match:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT chunk_ids.id, bm25(chunks) FROM chunks "
+                "JOIN chunk_ids ON chunk_ids.rowid = chunks.rowid "
+                "WHERE chunks MATCH ? ORDER BY bm25(chunks) LIMIT ?",
+                (match, k),
+            ).fetchall()
+        # FTS5 scores are negated BM25: lower is better
+        return [(id_, -score) for id_, score in rows]
+
+    def lookup(self, names: List[str], query: str, limit: int) -> List[str]:
+        """
+        Resolve names mentioned in an issue to the chunks defining them.
+
+        Args:
+            names: Mentioned identifiers and paths, most relevant first.
+                Dotted names and paths are tried from the longest suffix
+                that is indexed, down to two segments. The last segment
+                alone only resolves to chunks qualified by the segment
+                before it: ``requests.Session`` resolves ``Session`` in
+                ``requests/sessions.py``, but ``os.path.join`` does not
+                resolve a ``join`` defined outside any ``path``.
+            query: Query text; picks the best matching chunk (BM25) of a
+                mentioned file
+            limit: Maximum number of chunks to return
+
+        Returns:
+            Chunk ids, in the order of the names resolving to them
+        """
+        match = _match_expression(query)
+        found: List[str] = []
+        with self._lock:
+            for name in names:
+                if len(found) >= limit:
+                    break
+                separator = "/" if "/" in name else "."
+                parts = name.split(separator)
+                for candidate in _suffixes(name, separator):
+                    chunks = self._resolve(candidate, match)
+                    if chunks is None:
+                        continue
+                    if len(parts) > 1 and separator not in candidate:
+                        chunks = [
+                            id_ for id_ in chunks if self._qualified_by(id_, parts[-2])
+                        ]
+                    found.extend(id_ for id_ in chunks if id_ not in found)
+                    break
+        return found[:limit]
+
+    def _qualified_by(self, chunk_id: str, qualifier: str) -> bool:
+        """Whether ``qualifier`` is a segment of a path or name the chunk is listed under."""
+        rows = self._conn.execute(
+            "SELECT name FROM chunk_names "
+            "JOIN chunk_ids ON chunk_ids.rowid = chunk_names.chunk "
+            "WHERE chunk_ids.id = ?",
+            (chunk_id,),
+        )
+        return any(qualifier in re.split(r"[./]", name) for (name,) in rows)
+
+    def _resolve(self, name: str, match: str) -> Optional[List[str]]:
+        """Chunk ids of one indexed name, [] if ambiguous, None if not indexed."""
+        rows = self._conn.execute(
+            "SELECT kind, chunk_ids.id FROM chunk_names "
+            "JOIN chunk_ids ON chunk_ids.rowid = chunk_names.chunk "
+            "WHERE name = ? ORDER BY chunk_names.chunk",
+            (name,),
+        ).fetchall()
+        if not rows:
+            return None
+        symbols = list(dict.fromkeys(id_ for kind, id_ in rows if kind == "symbol"))
+        if symbols:
+            return symbols if len(symbols) <= MAX_NAME_MATCHES else []
+
+        # A path or module: of each file, the chunk matching the query best
+        files: Dict[str, List[str]] = {}
+        for _, id_ in rows:
+            files.setdefault(id_.rsplit("#", 1)[0], []).append(id_)
+        if len(files) > MAX_NAME_MATCHES:
+            return []
+        best: Dict[str, str] = {}
+        if match:
+            for (id_,) in self._conn.execute(
+                "SELECT chunk_ids.id FROM chunks "
+                "JOIN chunk_ids ON chunk_ids.rowid = chunks.rowid "
+                "WHERE chunks MATCH ? AND chunks.rowid IN "
+                "(SELECT chunk FROM chunk_names WHERE name = ?) "
+                "ORDER BY bm25(chunks)",
+                (match, name),
+            ):
+                best.setdefault(id_.rsplit("#", 1)[0], id_)
+        return [best.get(source, ids[0]) for source, ids in files.items()]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunk_ids").fetchone()[0]
+
+    def copy_to(self, path: str) -> "LexicalIndex":
+        """Copy the index to ``path`` (e.g. as the base of the next version)."""
+        target = LexicalIndex(path)
+        with self._lock:
+            self._conn.backup(target._conn)
+        return target
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def remove_lexical_index(path: str):
+    """Delete an index file and its WAL files, ignoring missing ones."""
+    for suffix in ("", "-wal", "-shm"):
+        try:
+            os.remove(path + suffix)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,265 @@
+"""
+Opt-in, persistent cache of LLM responses.
+
+Analysing the same issue against the same index with the same model renders
+exactly the same prompt, so the response can be reused: responses are
+stored in SQLite keyed by ``sha256(model, temperature, rendered prompt)``.
+The retrieved code is part of the prompt, so a rebuilt index that retrieves
+different chunks misses the cache by construction. Entries expire after a
+TTL and the least recently used ones are evicted above a size cap.
+
+The cache is off unless GIAS_LLM_CACHE is set to a true value, since with
+a non-zero temperature a repeated call is not expected to return the same
+answer.
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+from langchain_core.output_parsers import StrOutputParser
+
+from tool.upstream import get_upstream
+
+load_dotenv()
+LLM_CACHE_ENABLED = os.getenv("GIAS_LLM_CACHE", "").lower() in ("1", "true", "yes", "on")
+LLM_CACHE_PATH = os.getenv("GIAS_LLM_CACHE_PATH", "./llm_cache.sqlite3")
+LLM_CACHE_TTL = float(os.getenv("GIAS_LLM_CACHE_TTL", 7 * 24 * 3600))
+LLM_CACHE_MAX_BYTES = int(os.getenv("GIAS_LLM_CACHE_MAX_BYTES", 256 * 1024**2))
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+
+class LLMResponseCache:
+    """SQLite-backed store of LLM responses with TTL and LRU eviction."""
+
+    def __init__(
+        self,
+        path: str = LLM_CACHE_PATH,
+        ttl: float = LLM_CACHE_TTL,
+        max_bytes: int = LLM_CACHE_MAX_BYTES,
+    ):
+        """
+        Open (or create) the cache.
+
+        Args:
+            path: SQLite database file
+            ttl: Seconds after which a response is no longer served
+            max_bytes: Total response bytes above which LRU entries are evicted
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key BLOB PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_access)"
+        )
+        self._conn.commit()
+        self._total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(CAST(response AS BLOB))), 0) FROM responses"
+        ).fetchone()[0]
+
+    @staticmethod
+    def make_key(model: str, temperature: float, prompt: str) -> bytes:
+        return hashlib.sha256(
+            f"{model}\0{temperature!r}\0{prompt}".encode("utf-8")
+        ).digest()
+
+    def get(self, key: bytes) -> Optional[str]:
+        """Look up a response; expired entries are dropped and count as misses."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and now - row[1] > self.ttl:
+                self._delete(key, row[0])
+                row = None
+            if row is None:
+                self.misses += 1
+                self._conn.commit()
+                return None
+            self._conn.execute(
+                "UPDATE responses SET last_access = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: bytes, model: str, response: str):
+        """Store a response, evicting LRU entries if the size cap is exceeded."""
+        now = time.time()
+        with self._lock:
+            previous = self._conn.execute(
+                "SELECT response FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if previous is not None:
+                self._total_bytes -= len(previous[0].encode("utf-8"))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, model, response, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, model, response, now, now),
+            )
+            self._total_bytes += len(response.encode("utf-8"))
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _delete(self, key: bytes, response: str):
+        self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+        self._total_bytes -= len(response.encode("utf-8"))
+
+    def _evict(self):
+        """Drop expired, then least recently used responses until 90% of the cap is free."""
+        cursor = self._conn.execute(
+            "DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl,)
+        )
+        evicted = cursor.rowcount
+        self._total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(CAST(response AS BLOB))), 0) FROM responses"
+        ).fetchone()[0]
+        target = int(self.max_bytes * 0.9)
+        while self._total_bytes > target:
+            rows = self._conn.execute(
+                "SELECT key, LENGTH(CAST(response AS BLOB)) FROM responses "
+                "ORDER BY last_access LIMIT 100"
+            ).fetchall()
+            if not rows:
+                self._total_bytes = 0
+                break
+            self._conn.executemany(
+                "DELETE FROM responses WHERE key = ?", [(row[0],) for row in rows]
+            )
+            self._total_bytes -= sum(row[1] for row in rows)
+            evicted += len(rows)
+        logger.info(f"Evicted {evicted} responses from the LLM cache")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+            }
+
+
+_llm_cache = None
+_llm_cache_guard = threading.Lock()
+
+
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    """Return the process-wide LLM response cache, or None if it is disabled."""
+    global _llm_cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    with _llm_cache_guard:
+        if _llm_cache is None:
+            _llm_cache = LLMResponseCache()
+            logger.info(f"LLM response cache enabled at {LLM_CACHE_PATH}")
+        return _llm_cache
+
+
+class CachedChain:
+    """``prompt | llm | StrOutputParser()`` with the response cache in front of the LLM."""
+
+    def __init__(self, prompt, llm, model_name: str, temperature: float):
+        """
+        Args:
+            prompt: Prompt template
+            llm: Chat model
+            model_name: Model name, part of the cache key
+            temperature: Sampling temperature, part of the cache key
+        """
+        self.prompt = prompt
+        self.model_name = model_name
+        self.temperature = temperature
+        self._llm_chain = llm | StrOutputParser()
+
+    def _lookup(self, inputs: Dict):
+        prompt_value = self.prompt.invoke(inputs)
+        cache = get_llm_cache()
+        if cache is None:
+            return prompt_value, None, None
+        key = LLMResponseCache.make_key(
+            self.model_name, self.temperature, prompt_value.to_string()
+        )
+        return prompt_value, key, cache.get(key)
+
+    def _store(self, key: Optional[bytes], response: str):
+        if key is not None and response:
+            get_llm_cache().put(key, self.model_name, response)
+
+    def invoke(self, inputs: Dict) -> Tuple[str, bool]:
+        """
+        Render the prompt and return ``(response, cached)``.
+
+        ``cached`` is True if the response was served from the cache.
+        """
+        prompt_value, key, cached = self._lookup(inputs)
+        if cached is not None:
+            return cached, True
+        response = self._llm_chain.invoke(prompt_value)
+        self._store(key, response)
+        return response, False
+
+    async def ainvoke(self, inputs: Dict) -> Tuple[str, bool]:
+        """Async ``invoke``; only cache misses take an LLM concurrency slot."""
+        files = get_upstream("files")
+        prompt_value, key, cached = await files.run(self._lookup, inputs)
+        if cached is not None:
+            return cached, True
+        async with get_upstream("llm").limit():
+            response = await self._llm_chain.ainvoke(prompt_value)
+        await files.run(self._store, key, response)
+        return response, False
+
+    async def astream(self, inputs: Dict) -> AsyncIterator[Tuple[str, bool]]:
+        """
+        Stream ``(chunk, cached)`` pairs as the LLM produces them.
+
+        A cached response is yielded as a single chunk. The response is
+        stored only once the stream has been consumed to the end.
+        """
+        files = get_upstream("files")
+        prompt_value, key, cached = await files.run(self._lookup, inputs)
+        if cached is not None:
+            yield cached, True
+            return
+        chunks = []
+        async with get_upstream("llm").limit():
+            async for chunk in self._llm_chain.astream(prompt_value):
+                chunks.append(chunk)
+                yield chunk, False
+        await files.run(self._store, key, "".join(chunks))
@@ -0,0 +1,142 @@
+"""
+Process-pool document splitting.
+
+Once embeddings come from the cache, chunking is the main CPU cost of a
+rebuild and a single thread cannot go faster than one core. ``ParallelSplitter``
+spreads a window of documents over a process pool in size-balanced batches
+(longest documents first, each to the currently lightest batch) and returns
+the results in input order, so chunk ids and upsert order are the same as
+with sequential splitting.
+"""
+
+import heapq
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+
+load_dotenv()
+SPLIT_WORKERS = int(os.getenv("GIAS_SPLIT_WORKERS", os.cpu_count() or 1))
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+SplitResult = Tuple[List[Document], List[str]]
+
+
+def balance_batches(sizes: Sequence[int], batch_count: int) -> List[List[int]]:
+    """
+    Partition item indices into ``batch_count`` batches of similar total size.
+
+    Greedy longest-processing-time scheduling: items are placed largest first
+    into the batch with the smallest total so far. Indices within a batch are
+    sorted, and ties are broken by batch number, so the result is deterministic.
+    """
+    batch_count = max(1, min(batch_count, len(sizes)))
+    heap = [(0, i) for i in range(batch_count)]
+    batches: List[List[int]] = [[] for _ in range(batch_count)]
+    for index in sorted(range(len(sizes)), key=lambda i: (-sizes[i], i)):
+        total, batch = heapq.heappop(heap)
+        batches[batch].append(index)
+        heapq.heappush(heap, (total + sizes[index], batch))
+    return [sorted(batch) for batch in batches if batch]
+
+
+def _split_batch(
+    split_document: Callable[[Document], SplitResult], docs: List[Document]
+) -> List[SplitResult]:
+    return [split_document(doc) for doc in docs]
+
+
+def _pool_context():
+    # Forking a threaded server process is unsafe; a fork server starts
+    # workers from a clean, single-threaded process instead
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+class ParallelSplitter:
+    """Splits documents on a process pool, preserving input order."""
+
+    def __init__(
+        self,
+        split_document: Callable[[Document], SplitResult],
+        workers: int = SPLIT_WORKERS,
+        batches_per_worker: int = 2,
+        min_parallel_chars: int = 200_000,
+        initializer: Optional[Callable] = None,
+        initargs: tuple = (),
+    ):
+        """
+        Args:
+            split_document: Module-level (picklable) function splitting one
+                document into (chunks, chunk ids)
+            workers: Worker processes; 1 splits inline
+            batches_per_worker: Batches submitted per worker and window, so
+                a worker finishing early can pick up more work
+            min_parallel_chars: Windows smaller than this are split inline,
+                where pickling would cost more than it saves
+            initializer: Module-level function run with ``initargs`` in each
+                worker process before it splits anything
+        """
+        self.split_document = split_document
+        self.workers = max(1, workers)
+        self.batches_per_worker = batches_per_worker
+        self.min_parallel_chars = min_parallel_chars
+        self.initializer = initializer
+        self.initargs = initargs
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._guard = threading.Lock()
+
+    def split(self, docs: List[Document]) -> List[SplitResult]:
+        """Split ``docs``; result ``i`` belongs to ``docs[i]``."""
+        sizes = [len(doc.page_content) for doc in docs]
+        if (
+            self.workers == 1
+            or len(docs) < 2
+            or sum(sizes) < self.min_parallel_chars
+        ):
+            return _split_batch(self.split_document, docs)
+
+        batches = balance_batches(sizes, self.workers * self.batches_per_worker)
+        executor = self._get_executor()
+        futures = [
+            executor.submit(
+                _split_batch, self.split_document, [docs[i] for i in batch]
+            )
+            for batch in batches
+        ]
+
+        results: List[Optional[SplitResult]] = [None] * len(docs)
+        for batch, future in zip(batches, futures):
+            for index, result in zip(batch, future.result()):
+                results[index] = result
+        return results
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._guard:
+            if self._executor is None:
+                logger.info(f"Starting {self.workers} chunking worker processes")
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=_pool_context(),
+                    initializer=self.initializer,
+                    initargs=self.initargs,
+                )
+            return self._executor
+
+    def close(self):
+        with self._guard:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
@@ -10,6 +10,8 @@ import tempfile
 from typing import Optional, Dict, List
 from datetime import datetime
 
+from tool.repo_cache import get_repo_cache
+
 logger = logging.getLogger(__name__)
 
 
@@ -55,19 +57,26 @@ class PatchGenerator:
         """
         import difflib
 
-        original_lines = original_content.splitlines(keepends=True)
-        modified_lines = modified_content.splitlines(keepends=True)
+        # Lines keep their own endings; snippets stripped of their final
+        # newline would otherwise end the hunk without one
+        original_lines = [
+            line if line.endswith("\n") else line + "\n"
+            for line in original_content.splitlines(keepends=True)
+        ]
+        modified_lines = [
+            line if line.endswith("\n") else line + "\n"
+            for line in modified_content.splitlines(keepends=True)
+        ]
 
         diff = difflib.unified_diff(
             original_lines,
             modified_lines,
             fromfile=f"a/{file_path}",
             tofile=f"b/{file_path}",
-            lineterm="",
             n=context_lines,
         )
 
-        return "\n".join(diff)
+        return "".join(diff)
 
     def create_patch_file(
         self,
@@ -184,6 +193,38 @@ X-GIAS-Repository: {self.repo_full_name}
             logger.error(f"Error applying patch: {e}")
             return False
 
+    def check_patch_against_repo(self, patch_path: str) -> Optional[bool]:
+        """
+        Check whether a patch applies cleanly to the repository's cached checkout.
+
+        The checkout is at the commit of the last build, i.e. the code the
+        patch was generated from. It is never fetched or cloned here, and a
+        checkout in use by a build is not waited for.
+
+        Args:
+            patch_path: Path to the patch file
+
+        Returns:
+            True if the patch applies, False if it does not, None if the
+            repository is not cached or busy and the patch was not checked
+        """
+        try:
+            with get_repo_cache().cached_checkout(
+                self.repo_owner, self.repo_name
+            ) as repo:
+                if repo is None:
+                    logger.info(
+                        f"No idle checkout of {self.repo_full_name}, "
+                        f"patch not checked: {patch_path}"
+                    )
+                    return None
+                return self.apply_patch(
+                    patch_path, repo.working_tree_dir, check_only=True
+                )
+        except Exception as e:
+            logger.error(f"Could not check patch against {self.repo_full_name}: {e}")
+            return None
+
     def create_commit_message(
         self, issue_id: int, issue_title: str, description: str
     ) -> str:
@@ -0,0 +1,195 @@
+"""
+Compact retrieval queries from issue text.
+
+Issue bodies are long and mostly prose, templates, logs and links; embedded
+whole, they produce a vector that is close to nothing in particular. The
+query embedded for retrieval is instead assembled from what actually points
+at code, in order of priority and within a small token budget:
+
+1. The issue title
+2. Key error lines (exception type and message) and the files/functions of
+   traceback frames
+3. Identifiers: code spans, dotted names, snake_case, CamelCase, calls and
+   file paths, ranked by how often they are mentioned
+
+Prose is only used to fill the budget when the issue has no such signals.
+"""
+
+import os
+import re
+from collections import Counter
+from typing import List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from tool.token_counter import get_token_counter
+
+load_dotenv()
+QUERY_TOKENS = int(os.getenv("GIAS_QUERY_TOKENS", 96))
+MAX_ERROR_LINES = 3
+MAX_IDENTIFIERS = 12
+MAX_FRAMES = 8
+
+_NOISE_PATTERNS = (
+    re.compile(r"<!--.*?-->", re.DOTALL),  # issue template comments
+    re.compile(r"!\[[^\]]*\]\([^)]*\)"),  # images
+    re.compile(r"https?://\S+"),
+)
+_ERROR_LINE = re.compile(
+    r"^\s*((?:[A-Za-z_][\w.]*\.)?[A-Z]\w*(?:Error|Exception|Warning|Exit))"
+    r"(?::\s*(.*?))?\s*$"
+)
+_GENERIC_ERROR_LINE = re.compile(r"^\s*(?:error|fatal|panic)\b[:\s].*", re.IGNORECASE)
+_PYTHON_FRAME = re.compile(r'File "([^"]+)", line (\d+)(?:, in ([\w<>]+))?')
+_JS_FRAME = re.compile(r"\bat (?:([\w.$<>]+) )?\(?([\w./@-]+\.\w+):(\d+)(?::\d+)?\)?")
+_CODE_SPAN = re.compile(r"`([^`\n]{2,80})`")
+_IDENTIFIER = re.compile(
+    r"\b[A-Za-z_]\w*(?:\.[A-Za-z_]\w*)+\b"  # dotted.names
+    r"|\b[a-z][a-z0-9]*(?:_[a-z0-9]+)+\b"  # snake_case
+    r"|\b[A-Z]\w*?[a-z]\w*?[A-Z]\w*\b|\b[A-Z]{2,}[a-z]\w*\b"  # CamelCase, HTTPAdapter
+    r"|\b[A-Za-z_]\w*(?=\()"  # calls(
+)
+_PATH = re.compile(r"\b[\w.-]+(?:/[\w.-]+)*\.(?:py|js|ts|go|java|c|cpp|h)\b")
+# Dotted words that are prose or markup, not code
+_NOT_IDENTIFIERS = {"e.g", "i.e", "etc", "vs"}
+
+
+def _strip_noise(text: str) -> str:
+    for pattern in _NOISE_PATTERNS:
+        text = pattern.sub(" ", text)
+    return text
+
+
+def _short_path(path: str) -> str:
+    """Last two components of a path; the rest is environment specific."""
+    return "/".join(path.replace("\\", "/").split("/")[-2:])
+
+
+def extract_error_lines(text: str, limit: int = MAX_ERROR_LINES) -> List[str]:
+    """
+    Exception lines (``ValueError: message``) and generic ``error:`` lines,
+    last first, since the final line of a traceback is the one raised.
+    """
+    lines = []
+    for line in reversed(text.splitlines()):
+        if _ERROR_LINE.match(line) or _GENERIC_ERROR_LINE.match(line):
+            line = " ".join(line.split())[:200]
+            if line not in lines:
+                lines.append(line)
+                if len(lines) >= limit:
+                    break
+    return lines
+
+
+def extract_identifiers(text: str, limit: int = MAX_IDENTIFIERS) -> List[str]:
+    """
+    Code identifiers and paths mentioned in ``text``, most relevant first.
+
+    Names from code spans and traceback frames count double; ties keep the
+    order of first mention.
+    """
+    counts: Counter = Counter()
+    first_seen = {}
+
+    def add(name: str, weight: int = 1):
+        name = re.sub(r"^(?:self|cls)\.", "", name.strip("."))
+        if len(name) < 3 or name.lower() in _NOT_IDENTIFIERS:
+            return
+        counts[name] += weight
+        first_seen.setdefault(name, len(first_seen))
+
+    for match in _PYTHON_FRAME.finditer(text):
+        add(_short_path(match.group(1)), 2)
+        if match.group(3) and not match.group(3).startswith("<"):
+            add(match.group(3), 2)
+    for match in _JS_FRAME.finditer(text):
+        if match.group(1):
+            add(match.group(1), 2)
+        add(_short_path(match.group(2)), 2)
+    for match in _CODE_SPAN.finditer(text):
+        span = match.group(1).strip()
+        for path in _PATH.findall(span):
+            add(_short_path(path), 2)
+        # A path counts as a whole, not also as the dotted name of its file
+        names = _IDENTIFIER.findall(_PATH.sub(" ", span))
+        for name in names or ([span] if span.isidentifier() else []):
+            add(name, 2)
+    for match in _PATH.finditer(text):
+        add(_short_path(match.group(0)))
+    for name in _IDENTIFIER.findall(_PATH.sub(" ", text)):
+        add(name)
+
+    ranked = sorted(counts, key=lambda name: (-counts[name], first_seen[name]))
+    return ranked[:limit]
+
+
+def extract_traceback_frames(text: str, limit: int = MAX_FRAMES) -> List[Tuple[str, int]]:
+    """
+    ``(path, line)`` of the Python and JavaScript stack frames in ``text``,
+    innermost first (Python tracebacks print it last, JavaScript first).
+    """
+    frames: List[Tuple[str, int]] = []
+    python = [(m.start(), m.group(1), int(m.group(2))) for m in _PYTHON_FRAME.finditer(text)]
+    javascript = [(m.start(), m.group(2), int(m.group(3))) for m in _JS_FRAME.finditer(text)]
+    for _, path, line in list(reversed(python)) + javascript:
+        if (path, line) not in frames:
+            frames.append((path, line))
+    return frames[:limit]
+
+
+def build_retrieval_query(
+    text: str, title: Optional[str] = None, max_tokens: int = QUERY_TOKENS
+) -> str:
+    """
+    Build the query embedded to retrieve code for an issue or question.
+
+    Args:
+        text: Issue body or free-form question
+        title: Issue title, if any
+        max_tokens: Token budget of the query
+
+    Returns:
+        Title, error lines and identifiers, one group per line
+    """
+    count = get_token_counter()
+    text = _strip_noise(text or "")
+    parts: List[str] = []
+    used = 0
+
+    def fits(part: str) -> bool:
+        nonlocal used
+        tokens = count(part)
+        if used + tokens > max_tokens:
+            return False
+        used += tokens
+        return True
+
+    title = " ".join((title or "").split())
+    if title and fits(title):
+        parts.append(title)
+    for line in extract_error_lines(text):
+        if fits(line):
+            parts.append(line)
+
+    identifiers = [
+        name
+        for name in extract_identifiers(text)
+        if not any(name in part for part in parts) and fits(name)
+    ]
+    if identifiers:
+        parts.append(" ".join(identifiers))
+
+    if len(parts) <= 1:
+        # No code signals: fall back to the leading prose
+        for sentence in re.split(r"(?<=[.!?])\s+|\n+", text):
+            sentence = " ".join(sentence.split())
+            # Markdown headings are template section names
+            if (
+                sentence
+                and not sentence.startswith("#")
+                and sentence not in parts
+                and fits(sentence)
+            ):
+                parts.append(sentence)
+
+    return "\n".join(parts) or " ".join(text.split())[:500]
@@ -0,0 +1,272 @@
+"""
+Streaming ingest pipeline: load -> split -> embed -> upsert.
+
+Each stage runs in its own thread and hands work to the next one through a
+bounded queue, so the stages overlap (embedding starts as soon as the first
+file is split) and at most a few batches are held in memory at any time,
+regardless of the size of the repository.
+"""
+
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class PipelineCancelled(Exception):
+    """Raised when a running pipeline is cancelled."""
+
+
+def chroma_upsert(vectorstore) -> Callable:
+    """Upsert function writing pre-computed embeddings into a LangChain Chroma store."""
+
+    def upsert(ids, texts, metadatas, vectors):
+        vectorstore._collection.upsert(
+            ids=ids, documents=texts, metadatas=metadatas, embeddings=vectors
+        )
+
+    return upsert
+
+
+class IngestPipeline:
+    """Bounded-memory, concurrent ingestion of documents into a vector store."""
+
+    def __init__(
+        self,
+        split_document: Callable[[Document], Tuple[List[Document], List[str]]],
+        embeddings: Embeddings,
+        upsert: Callable,
+        batch_size: int = 64,
+        queue_size: int = 4,
+        on_document: Optional[Callable[[Document], None]] = None,
+        on_progress: Optional[Callable[[Dict], None]] = None,
+        cancel_event: Optional[threading.Event] = None,
+        splitter=None,
+        split_window: int = 256,
+    ):
+        """
+        Initialize the pipeline.
+
+        Args:
+            split_document: Splits one document into (chunks, chunk ids)
+            embeddings: Embedding model used for the chunk texts
+            upsert: Called with (ids, texts, metadatas, vectors) per batch
+            batch_size: Chunks per embedding / upsert batch
+            queue_size: Capacity of each queue between stages
+            on_document: Optional callback for every loaded document
+            on_progress: Optional callback with a copy of the statistics,
+                called after every upserted batch
+            cancel_event: Set it to stop the pipeline early
+            splitter: Optional ``ParallelSplitter`` that splits windows of
+                documents on a process pool instead of calling
+                ``split_document`` on the stage thread
+            split_window: Documents handed to ``splitter`` at a time
+        """
+        self.split_document = split_document
+        self.embeddings = embeddings
+        self.upsert = upsert
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.on_document = on_document
+        self.on_progress = on_progress
+        self.cancel_event = cancel_event or threading.Event()
+        self.splitter = splitter
+        self.split_window = split_window
+
+        self.stats = {
+            "files_loaded": 0,
+            "files_split": 0,
+            "chunks_split": 0,
+            "chunks_embedded": 0,
+            "chunks_upserted": 0,
+            "elapsed": 0.0,
+            "embeddings_per_sec": 0.0,
+        }
+        self.file_chunks: Dict[str, int] = {}
+        self._error: Optional[BaseException] = None
+        self._stop = threading.Event()
+
+    def run(self, documents: Iterable[Document]) -> Dict:
+        """
+        Stream documents through all stages and block until done.
+
+        Returns:
+            Statistics dictionary (files loaded, chunks split/embedded/upserted)
+
+        Raises:
+            PipelineCancelled: If ``cancel_event`` was set
+            Exception: The first error raised by any stage
+        """
+        start = time.time()
+        doc_queue = queue.Queue(maxsize=self.queue_size)
+        chunk_queue = queue.Queue(maxsize=self.queue_size)
+        vector_queue = queue.Queue(maxsize=self.queue_size)
+
+        stages = [
+            (self._load, documents, doc_queue),
+            (self._split, doc_queue, chunk_queue),
+            (self._embed, chunk_queue, vector_queue),
+        ]
+        threads = [
+            threading.Thread(target=self._stage, args=stage, daemon=True)
+            for stage in stages
+        ]
+        for thread in threads:
+            thread.start()
+
+        # The upsert stage runs on the calling thread
+        self._stage(self._upsert, vector_queue, None)
+        for thread in threads:
+            thread.join()
+
+        self.stats["elapsed"] = time.time() - start
+        self.stats["embeddings_per_sec"] = (
+            self.stats["chunks_embedded"] / self.stats["elapsed"]
+            if self.stats["elapsed"]
+            else 0.0
+        )
+        if self.cancel_event.is_set():
+            raise PipelineCancelled("Ingestion cancelled")
+        if self._error is not None:
+            raise self._error
+
+        logger.info(
+            f"Ingested {self.stats['files_loaded']} files / "
+            f"{self.stats['chunks_upserted']} chunks in {self.stats['elapsed']:.1f}s "
+            f"({self.stats['embeddings_per_sec']:.1f} embeddings/sec)"
+        )
+        return self.stats
+
+    # ------------------------------------------------------------------
+    # Stage plumbing
+    # ------------------------------------------------------------------
+
+    def _stopped(self) -> bool:
+        return self._stop.is_set() or self.cancel_event.is_set()
+
+    def _put(self, out_queue: queue.Queue, item) -> bool:
+        """Put with back-pressure; gives up if the pipeline is stopping."""
+        while not self._stopped():
+            try:
+                out_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, in_queue: queue.Queue):
+        while not self._stopped():
+            try:
+                return in_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _stage(self, body: Callable, source, out_queue: Optional[queue.Queue]):
+        try:
+            body(source, out_queue)
+        except BaseException as e:
+            if self._error is None:
+                self._error = e
+            logger.error(f"Ingest stage {body.__name__} failed: {e}")
+            self._stop.set()
+        finally:
+            if out_queue is not None:
+                # Unblock the consumer; if the pipeline is stopping it
+                # returns on its own
+                self._put(out_queue, _DONE)
+
+    def _iter_queue(self, in_queue: queue.Queue):
+        while True:
+            item = self._get(in_queue)
+            if item is _DONE:
+                return
+            yield item
+
+    # ------------------------------------------------------------------
+    # Stages
+    # ------------------------------------------------------------------
+
+    def _load(self, documents: Iterable[Document], out_queue: queue.Queue):
+        for doc in documents:
+            if self.on_document is not None:
+                self.on_document(doc)
+            self.stats["files_loaded"] += 1
+            if not self._put(out_queue, doc):
+                return
+
+    def _split(self, in_queue: queue.Queue, out_queue: queue.Queue):
+        ids, texts, metadatas = [], [], []
+        for doc, chunks, chunk_ids in self._iter_split(in_queue):
+            path = doc.metadata.get("path")
+            if path:
+                self.file_chunks[path] = len(chunks)
+            self.stats["files_split"] += 1
+            for chunk, chunk_id in zip(chunks, chunk_ids):
+                ids.append(chunk_id)
+                texts.append(chunk.page_content)
+                metadatas.append(chunk.metadata)
+            self.stats["chunks_split"] += len(chunks)
+
+            while len(ids) >= self.batch_size:
+                batch = (
+                    ids[: self.batch_size],
+                    texts[: self.batch_size],
+                    metadatas[: self.batch_size],
+                )
+                del ids[: self.batch_size], texts[: self.batch_size]
+                del metadatas[: self.batch_size]
+                if not self._put(out_queue, batch):
+                    return
+        if ids:
+            self._put(out_queue, (ids, texts, metadatas))
+
+    def _iter_split(self, in_queue: queue.Queue):
+        """Yield (document, chunks, chunk ids) in input order."""
+        if self.splitter is None:
+            for doc in self._iter_queue(in_queue):
+                chunks, chunk_ids = self.split_document(doc)
+                yield doc, chunks, chunk_ids
+            return
+
+        window = []
+        for doc in self._iter_queue(in_queue):
+            window.append(doc)
+            # Don't hold a window back while the queue has run dry, or
+            # embedding would wait for the slowest loader
+            if len(window) >= self.split_window or in_queue.empty():
+                yield from self._split_window(window)
+                window = []
+        if window:
+            yield from self._split_window(window)
+
+    def _split_window(self, window: List[Document]):
+        for doc, (chunks, chunk_ids) in zip(window, self.splitter.split(window)):
+            yield doc, chunks, chunk_ids
+
+    def _embed(self, in_queue: queue.Queue, out_queue: queue.Queue):
+        for ids, texts, metadatas in self._iter_queue(in_queue):
+            vectors = self.embeddings.embed_documents(texts)
+            self.stats["chunks_embedded"] += len(ids)
+            if not self._put(out_queue, (ids, texts, metadatas, vectors)):
+                return
+
+    def _upsert(self, in_queue: queue.Queue, _):
+        for ids, texts, metadatas, vectors in self._iter_queue(in_queue):
+            self.upsert(ids, texts, metadatas, vectors)
+            self.stats["chunks_upserted"] += len(ids)
+            if self.on_progress is not None:
+                self.on_progress(dict(self.stats))
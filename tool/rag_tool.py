@@ -1,21 +1,50 @@
+import itertools
+import json
 import logging
 import os
 import shutil
+import threading
 import time
 import gc
+import hashlib
+import re
 from datetime import datetime
+from typing import Callable, Iterable, Optional
 
 from dotenv import load_dotenv
-from tool.github_tool import get_repo_content, get_repo_content_by_git
-from langchain_community.embeddings import OllamaEmbeddings
+from tool.github_tool import (
+    get_repo_content,
+    iter_repo_content_by_git,
+)
+import chromadb
+from chromadb.config import Settings
 from langchain_community.vectorstores import Chroma
 from langchain_core.documents import Document
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from tool.code_chunker import chunker_signature, split_with_ids
+from tool.embedding_cache import CachedEmbeddings, EmbeddingCache
+from tool.embedding_client import OllamaBatchEmbeddings
+from tool.flat_index import FlatIndex, FlatVectorStore, remove_flat_index
+from tool.lexical_index import LexicalIndex, remove_lexical_index
+from tool.parallel_split import ParallelSplitter
+from tool.rag_pipeline import IngestPipeline, PipelineCancelled, chroma_upsert
+from tool.token_counter import tokenizer_spec, use_tokenizer
 
 load_dotenv()
 REPO_OWNER = os.getenv("TARGET_REPO_OWNER")
 REPO_NAME = os.getenv("TARGET_REPO_NAME")
-CHROMA_DB_PATH = "./chroma_db"
+CHROMA_DB_PATH = os.getenv("GIAS_CHROMA_DB_PATH", "./chroma_db")
+INDEX_STATE_DIR = os.path.join(CHROMA_DB_PATH, "gias_index_state")
+# BM25 index of each collection, see tool.lexical_index
+LEXICAL_INDEX_DIR = os.path.join(CHROMA_DB_PATH, "gias_lexical")
+# Vector index of new versions: "chroma" (HNSW) or "flat" (exact NumPy
+# scan, see tool.flat_index); existing versions keep the one they were built with
+VECTOR_BACKEND = os.getenv("GIAS_VECTOR_BACKEND", "chroma")
+FLAT_INDEX_DIR = os.path.join(CHROMA_DB_PATH, "gias_flat")
+# Chroma keeps loaded HNSW segments in an LRU cache capped at this size
+CHROMA_MEMORY_LIMIT = int(os.getenv("GIAS_CHROMA_MEMORY_LIMIT", 4 * 1024**3))
 
 OLLAMA_EMBEDDING_MODEL = "embeddinggemma"
 OLLAMA_BASE_URL = "http://localhost:11434"
@@ -27,38 +56,49 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+_embeddings = None
+_embeddings_guard = threading.Lock()
+_splitter = None
+_splitter_guard = threading.Lock()
+_chroma_client = None
+_chroma_client_guard = threading.Lock()
 
-def save_repository_code(
-    documents: list[Document],
-    repo_owner: str,
-    repo_name: str,
-    output_base_dir: str = "./saved_repos",
-) -> str:
-    """
-    Save repository code to disk for easy testing and reference.
-    
-    Args:
-        documents: List of LangChain Documents containing code
-        repo_owner: Repository owner
-        repo_name: Repository name
-        output_base_dir: Base directory to save repositories
-        
-    Returns:
-        Path to the saved repository directory
-    """
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    repo_dir = os.path.join(output_base_dir, f"{repo_owner}_{repo_name}_{timestamp}")
-    os.makedirs(repo_dir, exist_ok=True)
-    
-    logger.info(f"Saving repository code to {repo_dir}...")
-    
-    saved_files = 0
-    for doc in documents:
+
+class RepositoryCodeWriter:
+    """Writes repository files to disk one document at a time."""
+
+    def __init__(
+        self,
+        repo_owner: str,
+        repo_name: str,
+        output_base_dir: str = "./saved_repos",
+    ):
+        """
+        Args:
+            repo_owner: Repository owner
+            repo_name: Repository name
+            output_base_dir: Base directory to save repositories
+        """
+        self.repo_owner = repo_owner
+        self.repo_name = repo_name
+        self.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.repo_dir = os.path.join(
+            output_base_dir, f"{repo_owner}_{repo_name}_{self.timestamp}"
+        )
+        self.saved_files = 0
+        self.total_documents = 0
+        os.makedirs(self.repo_dir, exist_ok=True)
+
+        logger.info(f"Saving repository code to {self.repo_dir}...")
+
+    def write(self, doc: Document):
+        """Save one document under its repository-relative path."""
+        self.total_documents += 1
         if not doc.metadata:
-            continue
-            
+            return
+
         source = doc.metadata.get("source", "unknown")
-        
+
         # Construct file path
         if "/" in source:
             parts = source.split("/", 2)
@@ -68,136 +108,676 @@ def save_repository_code(
                 file_path = source
         else:
             file_path = source
-        
-        full_path = os.path.join(repo_dir, file_path)
-        
+
+        full_path = os.path.join(self.repo_dir, file_path)
+
         # Create directory structure
         os.makedirs(os.path.dirname(full_path), exist_ok=True)
-        
+
         # Save file
         try:
             with open(full_path, "w", encoding="utf-8") as f:
                 f.write(doc.page_content)
-            saved_files += 1
+            self.saved_files += 1
         except Exception as e:
             logger.warning(f"Failed to save {file_path}: {e}")
+
+    def close(self) -> str:
+        """
+        Write the metadata file.
+
+        Returns:
+            Path to the saved repository directory
+        """
+        logger.info(f"✓ Saved {self.saved_files} files to {self.repo_dir}")
+
+        metadata = {
+            "timestamp": self.timestamp,
+            "repository": f"{self.repo_owner}/{self.repo_name}",
+            "total_files": self.saved_files,
+            "total_documents": self.total_documents,
+        }
+        metadata_path = os.path.join(self.repo_dir, ".gias_metadata.json")
+        with open(metadata_path, "w", encoding="utf-8") as f:
+            json.dump(metadata, f, indent=2)
+
+        return self.repo_dir
+
+
+def save_repository_code(
+    documents: Iterable[Document],
+    repo_owner: str,
+    repo_name: str,
+    output_base_dir: str = "./saved_repos",
+) -> str:
+    """
+    Save repository code to disk for easy testing and reference.
     
-    logger.info(f"✓ Saved {saved_files} files to {repo_dir}")
-    
-    # Save metadata
-    import json
-    metadata = {
-        "timestamp": timestamp,
-        "repository": f"{repo_owner}/{repo_name}",
-        "total_files": saved_files,
-        "total_documents": len(documents),
+    Args:
+        documents: LangChain Documents containing code
+        repo_owner: Repository owner
+        repo_name: Repository name
+        output_base_dir: Base directory to save repositories
+        
+    Returns:
+        Path to the saved repository directory
+    """
+    writer = RepositoryCodeWriter(repo_owner, repo_name, output_base_dir)
+    for doc in documents:
+        writer.write(doc)
+    return writer.close()
+
+
+def collection_name(
+    repo_owner: str, repo_name: str, version: Optional[int] = None
+) -> str:
+    """
+    Chroma collection holding (one version of) the index of a repository.
+
+    Chroma only allows ``[a-zA-Z0-9._-]`` and at most 63 characters, so the
+    name is sanitized and suffixed with a hash of the exact ``owner/repo``.
+    Every build writes a new ``_v<version>`` collection; the index state
+    points at the live one.
+    """
+    key = f"{repo_owner}/{repo_name}"
+    readable = re.sub(r"[^a-zA-Z0-9_-]+", "-", f"{repo_owner}__{repo_name}")[:40]
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:8]
+    name = f"gias_{readable}_{digest}"
+    return f"{name}_v{version}" if version else name
+
+
+def get_chroma_client():
+    """Return the process-wide persistent Chroma client."""
+    global _chroma_client
+    with _chroma_client_guard:
+        if _chroma_client is None:
+            _chroma_client = chromadb.PersistentClient(
+                path=CHROMA_DB_PATH,
+                settings=Settings(
+                    anonymized_telemetry=False,
+                    chroma_segment_cache_policy="LRU",
+                    chroma_memory_limit_bytes=CHROMA_MEMORY_LIMIT,
+                ),
+            )
+        return _chroma_client
+
+
+class ChromaVectorStore(Chroma):
+    """
+    LangChain's Chroma with the reads ``RetrievalContext`` needs beyond it:
+    search results and fetches by id that carry the chunk ``id``, as
+    ``FlatVectorStore`` returns them.
+    """
+
+    def similarity_search_by_vector_with_score(
+        self, embedding: list[float], k: int = 4, filter: Optional[dict] = None
+    ) -> list[tuple[Document, float]]:
+        """Top ``k`` chunks with their distance to ``embedding``."""
+        result = self._collection.query(
+            query_embeddings=[embedding],
+            n_results=k,
+            where=filter,
+            include=["documents", "metadatas", "distances"],
+        )
+        return [
+            (Document(id=id_, page_content=text, metadata=metadata or {}), distance)
+            for id_, text, metadata, distance in zip(
+                result["ids"][0],
+                result["documents"][0],
+                result["metadatas"][0],
+                result["distances"][0],
+            )
+        ]
+
+    def get_by_ids(self, ids, /) -> list[Document]:
+        result = self.get(ids=list(ids), include=["documents", "metadatas"])
+        return [
+            Document(id=id_, page_content=text, metadata=metadata or {})
+            for id_, text, metadata in zip(
+                result["ids"], result["documents"], result["metadatas"]
+            )
+        ]
+
+
+def open_vectorstore(
+    repo_owner: str,
+    repo_name: str,
+    collection: Optional[str] = None,
+    backend: Optional[str] = None,
+) -> VectorStore:
+    """
+    Open the vectorstore of a repository.
+
+    Args:
+        repo_owner: Repository owner
+        repo_name: Repository name
+        collection: Collection to open. Defaults to the live version recorded
+            in the index state.
+        backend: "chroma" or "flat". Defaults to the backend the collection
+            was built with.
+    """
+    if collection is None:
+        state = read_index_state(repo_owner, repo_name)
+        collection = (
+            state["collection"] if state else collection_name(repo_owner, repo_name)
+        )
+    if backend is None:
+        backend = "flat" if os.path.isdir(flat_index_path(collection)) else "chroma"
+    if backend == "flat":
+        return FlatVectorStore(
+            FlatIndex(flat_index_path(collection), name=collection), get_embeddings()
+        )
+    if backend != "chroma":
+        raise ValueError(f"Unknown vector backend: {backend}")
+    return ChromaVectorStore(
+        client=get_chroma_client(),
+        collection_name=collection,
+        embedding_function=get_embeddings(),
+    )
+
+
+def drop_collection(name: str):
+    """Delete a collection and its lexical index, ignoring ones that no longer exist."""
+    remove_lexical_index(lexical_index_path(name))
+    if os.path.isdir(flat_index_path(name)):
+        remove_flat_index(flat_index_path(name))
+        logger.info(f"Dropped collection {name}")
+        return
+    try:
+        get_chroma_client().delete_collection(name)
+        logger.info(f"Dropped collection {name}")
+    except Exception as e:
+        logger.debug(f"Could not drop collection {name}: {e}")
+
+
+def flat_index_path(collection: str) -> str:
+    return os.path.join(FLAT_INDEX_DIR, collection)
+
+
+def lexical_index_path(collection: str) -> str:
+    return os.path.join(LEXICAL_INDEX_DIR, f"{collection}.sqlite3")
+
+
+def open_lexical_index(collection: str) -> Optional[LexicalIndex]:
+    """Open the lexical index of a collection, or None if it was built without one."""
+    path = lexical_index_path(collection)
+    if not os.path.exists(path):
+        return None
+    return LexicalIndex(path)
+
+
+def _index_state_path(repo_owner: str, repo_name: str) -> str:
+    return os.path.join(
+        INDEX_STATE_DIR, f"{collection_name(repo_owner, repo_name)}.json"
+    )
+
+
+def read_index_state(repo_owner: str, repo_name: str) -> Optional[dict]:
+    """Read the raw index state of a repository, whatever settings built it."""
+    path = _index_state_path(repo_owner, repo_name)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        logger.warning(f"Could not read index state {path}: {e}")
+        return None
+
+
+def load_index_state(repo_owner: str, repo_name: str) -> Optional[dict]:
+    """
+    Load the recorded index state for a repository.
+
+    Returns:
+        Dictionary with the indexed ``commit``, the live ``collection``, the
+        ``embedding_model`` and a ``files`` mapping of repository-relative
+        path -> chunk count, or None if the repository has not been indexed
+        (with the current settings).
+    """
+    state = read_index_state(repo_owner, repo_name)
+    if not state or state.get("embedding_model") != OLLAMA_EMBEDDING_MODEL:
+        return None
+    # Chunks from another chunker version cannot be reused incrementally
+    if state.get("chunker") != chunker_signature():
+        return None
+    return state
+
+
+def save_index_state(
+    repo_owner: str,
+    repo_name: str,
+    commit: Optional[str],
+    file_chunks: dict[str, int],
+    collection: str,
+    version: int,
+):
+    """
+    Record a completed build and make its collection the live version.
+
+    The state file is replaced atomically, so readers see either the old or
+    the new version, never a mix.
+
+    Args:
+        repo_owner: Repository owner
+        repo_name: Repository name
+        commit: Commit SHA the index now reflects (None if unknown)
+        file_chunks: Mapping of repository-relative path -> number of chunks
+        collection: Collection holding the new version
+        version: Version number of the new collection
+    """
+    state = {
+        "owner": repo_owner,
+        "repo": repo_name,
+        "collection": collection,
+        "version": version,
+        "commit": commit,
+        "embedding_model": OLLAMA_EMBEDDING_MODEL,
+        "chunker": chunker_signature(),
+        "updated_at": datetime.now().isoformat(),
+        "files": file_chunks,
     }
-    metadata_path = os.path.join(repo_dir, ".gias_metadata.json")
-    with open(metadata_path, "w", encoding="utf-8") as f:
-        json.dump(metadata, f, indent=2)
-    
-    return repo_dir
+
+    path = _index_state_path(repo_owner, repo_name)
+    os.makedirs(INDEX_STATE_DIR, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def list_indexed_repositories() -> list[dict]:
+    """Return ``owner``, ``repo``, live ``collection``, ``commit`` and ``updated_at`` of every indexed repository."""
+    if not os.path.isdir(INDEX_STATE_DIR):
+        return []
+    repositories = []
+    for filename in sorted(os.listdir(INDEX_STATE_DIR)):
+        if not filename.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(INDEX_STATE_DIR, filename), "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except Exception as e:
+            logger.warning(f"Could not read index state {filename}: {e}")
+            continue
+        repositories.append(
+            {
+                "owner": state["owner"],
+                "repo": state["repo"],
+                "collection": state["collection"],
+                "commit": state["commit"],
+                "updated_at": state["updated_at"],
+            }
+        )
+    return repositories
+
+
+def _new_version(repo_owner: str, repo_name: str) -> tuple[VectorStore, int]:
+    """Create an empty staging collection for the next index version (on ``VECTOR_BACKEND``)."""
+    state = read_index_state(repo_owner, repo_name)
+    version = (state.get("version", 0) if state else 0) + 1
+    name = collection_name(repo_owner, repo_name, version)
+    # Left over from a build that failed before it went live
+    drop_collection(name)
+    return (
+        open_vectorstore(repo_owner, repo_name, collection=name, backend=VECTOR_BACKEND),
+        version,
+    )
+
+
+def get_embeddings() -> CachedEmbeddings:
+    """
+    Return the process-wide embedding client.
+
+    Every text is looked up in the persistent embedding cache first; only
+    misses reach Ollama. Batch size, concurrency and timeout of the Ollama
+    client are configured through GIAS_EMBED_BATCH_SIZE,
+    GIAS_EMBED_CONCURRENCY and GIAS_EMBED_TIMEOUT.
+    """
+    global _embeddings
+    with _embeddings_guard:
+        if _embeddings is None:
+            _embeddings = CachedEmbeddings(
+                OllamaBatchEmbeddings(
+                    model=OLLAMA_EMBEDDING_MODEL, base_url=OLLAMA_BASE_URL
+                ),
+                EmbeddingCache(),
+                model_name=OLLAMA_EMBEDDING_MODEL,
+            )
+        return _embeddings
+
+
+def get_splitter() -> ParallelSplitter:
+    """
+    Return the process-wide chunking pool.
+
+    The number of worker processes is configured through GIAS_SPLIT_WORKERS
+    (default: one per CPU core). Workers count tokens with the tokenizer
+    this process resolved, which the chunker signature names.
+    """
+    global _splitter
+    with _splitter_guard:
+        if _splitter is None:
+            _splitter = ParallelSplitter(
+                split_with_ids, initializer=use_tokenizer, initargs=tokenizer_spec()
+            )
+        return _splitter
+
+
+def _new_pipeline(
+    embeddings: Embeddings,
+    vectorstore: VectorStore,
+    on_document=None,
+    on_progress=None,
+    cancel_event: Optional[threading.Event] = None,
+    lexical: Optional[LexicalIndex] = None,
+) -> IngestPipeline:
+    # One pipeline batch keeps every concurrent embedding request busy
+    batch_size = getattr(embeddings, "batch_size", 64) * getattr(
+        embeddings, "max_concurrency", 1
+    )
+    upsert = chroma_upsert(vectorstore)
+    if lexical is not None:
+        # Index the lexical tokens of each batch as it goes into the collection
+        def upsert(ids, texts, metadatas, vectors, chroma=upsert):
+            chroma(ids, texts, metadatas, vectors)
+            lexical.add(ids, texts, metadatas)
+
+    return IngestPipeline(
+        split_with_ids,
+        embeddings,
+        upsert,
+        batch_size=batch_size,
+        on_document=on_document,
+        on_progress=on_progress,
+        cancel_event=cancel_event,
+        splitter=get_splitter(),
+    )
+
+
+def _seal(vectorstore: VectorStore):
+    """Make a complete staging version readable as a live one."""
+    if isinstance(vectorstore, FlatVectorStore):
+        vectorstore.flush()
+
+
+def _copy_vectors(
+    source: VectorStore,
+    target: VectorStore,
+    exclude_ids: set,
+    batch_size: int = 1000,
+    on_progress: Optional[Callable[[dict], None]] = None,
+    cancel_event: Optional[threading.Event] = None,
+    lexical: Optional[LexicalIndex] = None,
+) -> int:
+    """
+    Copy chunks with their stored embeddings, skipping ``exclude_ids``.
+
+    Copied chunks are also added to ``lexical`` if given.
+    """
+    copied = 0
+    offset = 0
+    while True:
+        if cancel_event is not None and cancel_event.is_set():
+            raise PipelineCancelled("Copy cancelled")
+        batch = source._collection.get(
+            limit=batch_size,
+            offset=offset,
+            include=["embeddings", "documents", "metadatas"],
+        )
+        if not batch["ids"]:
+            return copied
+        offset += len(batch["ids"])
+        keep = [i for i, id_ in enumerate(batch["ids"]) if id_ not in exclude_ids]
+        if keep:
+            ids = [batch["ids"][i] for i in keep]
+            documents = [batch["documents"][i] for i in keep]
+            metadatas = [batch["metadatas"][i] for i in keep]
+            target._collection.upsert(
+                ids=ids,
+                embeddings=[batch["embeddings"][i] for i in keep],
+                documents=documents,
+                metadatas=metadatas,
+            )
+            if lexical is not None:
+                lexical.add(ids, documents, metadatas)
+            copied += len(keep)
+        if on_progress is not None:
+            on_progress({"chunks_copied": copied})
 
 
 def create_rag_knowledge_base(
-    docs: list[Document],
-    repo_owner: str = None,
-    repo_name: str = None,
+    docs: Iterable[Document],
+    repo_owner: str,
+    repo_name: str,
     save_repo_code: bool = True,
-    old_vectorstore = None,
-) -> tuple[Chroma, str]:
+    commit: Optional[str] = None,
+    cancel_event: Optional[threading.Event] = None,
+    on_progress: Optional[Callable[[dict], None]] = None,
+) -> tuple[VectorStore, Optional[str]]:
     """
     Splits documents and builds the vector store using local Ollama for embeddings.
-    
-    IMPORTANT: This function does NOT delete or close the old vectorstore.
-    Instead, it rebuilds the database in-place by:
-    1. Clearing the old Chroma collection
-    2. Adding new documents to it
-    
-    This avoids all Windows file locking issues since we never try to delete
-    or rename files that are in use by the running server.
+
+    The index is built into a new, versioned staging collection while the
+    live version keeps serving queries. Only once the build is complete does
+    the index state switch to the new collection; a failed or cancelled
+    build drops its staging collection and leaves the live one untouched.
+    Retiring the previous version is up to the caller (see
+    ``IndexRegistry.put``), since requests may still be reading it.
+
+    Documents are streamed through the ingest pipeline (load -> split ->
+    embed -> upsert), so ``docs`` may be a generator and memory use stays
+    flat regardless of repository size.
     
     Args:
-        docs: List of documents to process
-        repo_owner: Repository owner (for saving code)
-        repo_name: Repository name (for saving code)
+        docs: Documents to process (list or iterator)
+        repo_owner: Repository owner
+        repo_name: Repository name
         save_repo_code: Whether to save the repository code to disk
-        old_vectorstore: Existing vectorstore (kept in place, not closed)
+        commit: Commit SHA the documents were loaded from. When given, later
+            builds can run incrementally from it.
+        cancel_event: Set it to abort the build
+        on_progress: Optional callback with the ingest pipeline statistics
+            (files loaded, chunks embedded, ...) as the build advances
         
     Returns:
-        Tuple of (Chroma vectorstore, path to saved repo code if enabled else None)
+        Tuple of (vectorstore of the new live version, path to saved repo
+        code if enabled else None)
     """
 
-    if not docs:
+    docs = iter(docs)
+    first_doc = next(docs, None)
+    if first_doc is None:
         logger.error("No documents available for processing. RAG creation failed.")
         raise ValueError("Document list is empty.")
+    docs = itertools.chain([first_doc], docs)
 
-    logger.info("Starting code chunking...")
-
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000, chunk_overlap=100, separators=["\n\n", "\n", " ", ""]
-    )
-
-    processed_docs = text_splitter.split_documents(docs)
     logger.info(
-        f"Code chunking complete. Total chunks generated: {len(processed_docs)}"
+        f"Streaming documents through chunking and local Ollama embeddings ({OLLAMA_EMBEDDING_MODEL})..."
     )
 
-    logger.info(
-        f"Generating embeddings using local Ollama model: {OLLAMA_EMBEDDING_MODEL}..."
-    )
+    embeddings = get_embeddings()
 
-    try:
-        embeddings = OllamaEmbeddings(
-            model=OLLAMA_EMBEDDING_MODEL, base_url=OLLAMA_BASE_URL
-        )
-    except Exception as e:
-        logger.error(
-            f"Failed to initialize Ollama Embeddings. Is Ollama running and model '{OLLAMA_EMBEDDING_MODEL}' pulled? Error: {e}"
-        )
-        raise
+    writer = None
+    if save_repo_code:
+        writer = RepositoryCodeWriter(repo_owner, repo_name)
 
-    # Strategy: Rebuild Chroma database in-place without deleting
-    # This completely avoids Windows file locking issues
-    logger.info("Building new Chroma vectorstore (in-place, no deletion needed)...")
-    
+    vectorstore, version = _new_version(repo_owner, repo_name)
+    logger.info(f"Building new vectorstore [{vectorstore._collection.name}]...")
+    lexical = LexicalIndex(lexical_index_path(vectorstore._collection.name))
     try:
-        # Create new Chroma vectorstore at the same location
-        # Chroma will handle clearing old data and creating new embeddings
-        vectorstore = Chroma.from_documents(
-            documents=processed_docs, 
-            embedding=embeddings, 
-            persist_directory=CHROMA_DB_PATH
+        pipeline = _new_pipeline(
+            embeddings,
+            vectorstore,
+            on_document=writer.write if writer else None,
+            on_progress=on_progress,
+            cancel_event=cancel_event,
+            lexical=lexical,
+        )
+        stats = pipeline.run(docs)
+        _seal(vectorstore)
+        lexical.close()
+        logger.info(
+            f"✓ New vectorstore created successfully at {CHROMA_DB_PATH} "
+            f"[{vectorstore._collection.name}] "
+            f"({stats['chunks_upserted']} chunks)"
         )
-        logger.info("✓ New vectorstore created successfully at " + CHROMA_DB_PATH)
+        if hasattr(embeddings, "stats"):
+            logger.info(f"Embedding stats: {embeddings.stats()}")
         
-    except Exception as e:
+    except BaseException as e:
         logger.error(f"Failed to create vectorstore: {e}")
+        lexical.close()
+        drop_collection(vectorstore._collection.name)
         raise
+
+    # Go live
+    save_index_state(
+        repo_owner,
+        repo_name,
+        commit,
+        pipeline.file_chunks,
+        collection=vectorstore._collection.name,
+        version=version,
+    )
     
     # Save repository code if requested
-    saved_repo_path = None
-    if save_repo_code and repo_owner and repo_name:
-        saved_repo_path = save_repository_code(docs, repo_owner, repo_name)
+    saved_repo_path = writer.close() if writer else None
     
     return vectorstore, saved_repo_path
 
 
-if __name__ == "__main__":
-    logger.info(f"Loading repository contents from {REPO_OWNER}/{REPO_NAME}...")
-    documents = get_repo_content_by_git(REPO_OWNER, REPO_NAME)
+def update_rag_knowledge_base(
+    changes: dict,
+    repo_owner: str,
+    repo_name: str,
+    cancel_event: Optional[threading.Event] = None,
+    on_progress: Optional[Callable[[dict], None]] = None,
+) -> tuple[VectorStore, dict]:
+    """
+    Incrementally update the vector store from a set of repository changes.
 
-    if not documents:
-        logger.error("No documents retrieved from the repository. Exiting.")
-        exit(1)
+    Chunks of unchanged files are copied with their stored embeddings from
+    the live version into a new staging collection, then only
+    ``changes["documents"]`` are split and embedded into it. As with
+    ``create_rag_knowledge_base``, the new version goes live only once it is
+    complete.
 
-    logger.info(f"Total documents retrieved: {len(documents)}")
+    Args:
+        changes: Change set from ``checkout_repo_changes`` with ``incremental=True``
+        repo_owner: Repository owner
+        repo_name: Repository name
+        cancel_event: Set it to abort the update
+        on_progress: Optional callback with the number of chunks copied and
+            then the ingest pipeline statistics as the update advances
+
+    Returns:
+        Tuple of (vectorstore of the new live version, build statistics
+        dictionary)
+    """
+    state = load_index_state(repo_owner, repo_name)
+    if state is None:
+        raise ValueError(f"No index state recorded for {repo_owner}/{repo_name}")
+
+    embeddings = get_embeddings()
+    live = open_vectorstore(repo_owner, repo_name, collection=state["collection"])
+
+    file_chunks = dict(state["files"])
+    docs = list(changes["documents"])
+    stale_paths = set(changes["stale_paths"])
+    stale_paths.update(doc.metadata["path"] for doc in docs)
+
+    stale_ids = set()
+    for path in stale_paths:
+        count = file_chunks.pop(path, 0)
+        source = f"{repo_owner}/{repo_name}/{path}"
+        stale_ids.update(f"{source}#{i}" for i in range(count))
+
+    vectorstore, version = _new_version(repo_owner, repo_name)
+    live_lexical = open_lexical_index(state["collection"])
+    lexical = None
+    try:
+        if live_lexical is not None:
+            # Start from the live lexical index and replace the changed files
+            lexical = live_lexical.copy_to(
+                lexical_index_path(vectorstore._collection.name)
+            )
+            live_lexical.close()
+            lexical.delete(stale_ids)
+        else:
+            # Built before lexical indexes existed: index the copied chunks
+            lexical = LexicalIndex(lexical_index_path(vectorstore._collection.name))
+        copied = _copy_vectors(
+            live,
+            vectorstore,
+            stale_ids,
+            on_progress=on_progress,
+            cancel_event=cancel_event,
+            lexical=lexical if live_lexical is None else None,
+        )
+        logger.info(
+            f"Copied {copied} chunks into [{vectorstore._collection.name}], "
+            f"dropped {len(stale_ids)} stale chunks from {len(stale_paths)} files"
+        )
+
+        pipeline = _new_pipeline(
+            embeddings,
+            vectorstore,
+            on_progress=on_progress,
+            cancel_event=cancel_event,
+            lexical=lexical,
+        )
+        if on_progress is not None:
+            on_progress({"phase": "embedding"})
+        if docs:
+            logger.info(f"Embedding chunks from {len(docs)} changed files...")
+            pipeline.run(docs)
+        _seal(vectorstore)
+        lexical.close()
+    except BaseException:
+        for index in (live_lexical, lexical):
+            if index is not None:
+                index.close()
+        drop_collection(vectorstore._collection.name)
+        raise
+    new_file_chunks = pipeline.file_chunks
+
+    stats = {
+        "files_reused": len(file_chunks),
+        "chunks_reused": sum(file_chunks.values()),
+        "files_reembedded": len(new_file_chunks),
+        "chunks_reembedded": sum(new_file_chunks.values()),
+        "files_deleted": len(stale_paths - set(new_file_chunks)),
+    }
+
+    file_chunks.update(new_file_chunks)
+    # Go live
+    save_index_state(
+        repo_owner,
+        repo_name,
+        changes["head_commit"],
+        file_chunks,
+        collection=vectorstore._collection.name,
+        version=version,
+    )
+
+    logger.info(
+        f"✓ Incremental update complete: reused {stats['chunks_reused']} chunks "
+        f"from {stats['files_reused']} files, re-embedded {stats['chunks_reembedded']} "
+        f"chunks from {stats['files_reembedded']} files"
+    )
+    return vectorstore, stats
+
+
+if __name__ == "__main__":
+    logger.info(f"Loading repository contents from {REPO_OWNER}/{REPO_NAME}...")
+    documents = iter_repo_content_by_git(REPO_OWNER, REPO_NAME)
 
     try:
         rag_knowledge_base, saved_path = create_rag_knowledge_base(
             documents, REPO_OWNER, REPO_NAME, save_repo_code=True
         )
-        rag_knowledge_base.persist()
+        # Both backends persist on write
         logger.info("RAG knowledge base created and persisted successfully.")
         if saved_path:
             logger.info(f"Repository code saved to: {saved_path}")
@@ -0,0 +1,308 @@
+"""
+Persistent local cache of cloned repositories.
+
+Each repository gets its own checkout under the cache directory, keyed by
+a hash of ``owner/name``. The first use clones it (shallow, blobless); every
+later use only fetches the new HEAD and resets the working tree to it, so
+rebuilds start from a warm checkout instead of a fresh clone. A checkout is
+only re-cloned if it is corrupt; a failed fetch leaves it as it was. Patch
+validation reads the checkout as last updated and never waits for it.
+
+Entries are locked while in use (per process with a threading lock, across
+processes with a lock file), so two builds of different repositories run in
+parallel and two builds of the same repository take turns. When the cache
+grows past its size limit, the least recently used idle entries are evicted.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from git import Repo
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+load_dotenv()
+REPO_CACHE_DIR = os.getenv("GIAS_REPO_CACHE_DIR", "./repo_cache")
+REPO_CACHE_MAX_BYTES = int(os.getenv("GIAS_REPO_CACHE_MAX_BYTES", 5 * 1024**3))
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for filename in files:
+            try:
+                total += os.lstat(os.path.join(root, filename)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def _remove_dir(path: str):
+    if not os.path.exists(path):
+        return
+    if os.name == "nt":
+        os.system('rmdir /S /Q "{}"'.format(path))
+    else:
+        shutil.rmtree(path)
+
+
+class RepoMirrorCache:
+    """Size-bounded cache of repository checkouts, one directory per repo."""
+
+    def __init__(
+        self,
+        cache_dir: str = REPO_CACHE_DIR,
+        max_bytes: int = REPO_CACHE_MAX_BYTES,
+        remote_url_template: str = "https://github.com/{owner}/{name}.git",
+    ):
+        """
+        Initialize the repository cache.
+
+        Args:
+            cache_dir: Directory holding one checkout per repository
+            max_bytes: Total size above which idle entries are evicted
+            remote_url_template: Clone URL, formatted with ``owner`` and ``name``
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.remote_url_template = remote_url_template
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def entry_path(self, owner: str, name: str) -> str:
+        """
+        Directory of the checkout for ``owner/name``.
+
+        ``owner`` and ``name`` come from requests, so they never form the
+        path themselves: the directory is a sanitized name suffixed with a
+        hash of the exact ``owner/name`` (as ``rag_tool.collection_name``).
+        """
+        readable = re.sub(r"[^a-zA-Z0-9_-]+", "-", f"{owner}__{name}")[:40]
+        digest = hashlib.sha1(f"{owner}/{name}".encode("utf-8")).hexdigest()[:8]
+        return os.path.join(self.cache_dir, f"{readable}_{digest}")
+
+    def _check_inside(self, entry_path: str):
+        """Refuse to delete or clone into anything but a direct child of the cache."""
+        cache_dir = os.path.realpath(self.cache_dir)
+        if os.path.dirname(os.path.realpath(entry_path)) != cache_dir:
+            raise ValueError(f"{entry_path} is outside the cache {cache_dir}")
+
+    def _meta_path(self, entry_path: str) -> str:
+        return entry_path + ".json"
+
+    def _lock_for(self, entry_path: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(entry_path, threading.Lock())
+
+    @contextmanager
+    def _locked(self, entry_path: str, blocking: bool = True) -> Iterator[bool]:
+        """Hold the in-process and cross-process lock of a cache entry."""
+        lock = self._lock_for(entry_path)
+        if not lock.acquire(blocking=blocking):
+            yield False
+            return
+        lock_file = None
+        try:
+            if fcntl is not None:
+                lock_file = open(entry_path + ".lock", "a")
+                flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+                try:
+                    fcntl.flock(lock_file, flags)
+                except BlockingIOError:
+                    yield False
+                    return
+            yield True
+        finally:
+            if lock_file is not None:
+                lock_file.close()
+            lock.release()
+
+    @contextmanager
+    def checkout(self, owner: str, name: str) -> Iterator[Repo]:
+        """
+        Yield an up-to-date checkout of ``owner/name``.
+
+        The entry stays locked until the ``with`` block exits, so callers can
+        read the working tree without another build resetting it underneath.
+
+        Raises:
+            GitCommandError: If the repository can be neither updated nor
+                cloned. A cached checkout that failed to update without being
+                corrupt (e.g. the network is down) is kept.
+        """
+        entry_path = self.entry_path(owner, name)
+        with self._locked(entry_path):
+            repo, changed = self._update_or_clone(owner, name, entry_path)
+            try:
+                yield repo
+            finally:
+                self._write_meta(entry_path, owner, name, measure=changed)
+        self.evict(keep=(entry_path,))
+
+    @contextmanager
+    def cached_checkout(self, owner: str, name: str) -> Iterator[Optional[Repo]]:
+        """
+        Yield the cached checkout of ``owner/name`` as last updated, without
+        fetching.
+
+        Never waits: yields None if the repository is not cached or its entry
+        is in use (e.g. by a build).
+        """
+        entry_path = self.entry_path(owner, name)
+        if not os.path.isdir(os.path.join(entry_path, ".git")):
+            yield None
+            return
+        with self._locked(entry_path, blocking=False) as acquired:
+            repo = None
+            if acquired:
+                try:
+                    repo = Repo(entry_path)
+                except Exception as e:
+                    logger.warning(f"Cached checkout of {owner}/{name} is unreadable: {e}")
+            yield repo
+
+    @staticmethod
+    def _is_corrupt(repo: Repo) -> bool:
+        try:
+            repo.git.fsck("--connectivity-only", "--no-progress")
+            return False
+        except Exception as e:
+            logger.warning(f"git fsck failed: {e}")
+            return True
+
+    def _update_or_clone(
+        self, owner: str, name: str, entry_path: str
+    ) -> Tuple[Repo, bool]:
+        """Return the updated checkout and whether its HEAD changed."""
+        repo_url = self.remote_url_template.format(owner=owner, name=name)
+
+        if os.path.isdir(os.path.join(entry_path, ".git")):
+            start = time.time()
+            try:
+                repo = Repo(entry_path)
+                previous_head = repo.head.commit.hexsha
+            except Exception as e:
+                logger.warning(
+                    f"Cached checkout of {owner}/{name} is unreadable, re-cloning: {e}"
+                )
+            else:
+                try:
+                    repo.git.fetch("--depth=1", "origin", "HEAD")
+                    repo.git.reset("--hard", "FETCH_HEAD")
+                    repo.git.clean("-fdx")
+                except Exception as e:
+                    # A network failure must not throw away a warm checkout
+                    if not self._is_corrupt(repo):
+                        raise
+                    logger.warning(
+                        f"Cached checkout of {owner}/{name} is corrupt, re-cloning: {e}"
+                    )
+                else:
+                    logger.info(
+                        f"Updated cached checkout of {owner}/{name} "
+                        f"in {time.time() - start:.1f}s"
+                    )
+                    return repo, repo.head.commit.hexsha != previous_head
+
+        self._check_inside(entry_path)
+        _remove_dir(entry_path)
+        logger.info(f"Starting shallow cloning (depth=1) of {repo_url}...")
+        repo = Repo.clone_from(
+            repo_url, entry_path, depth=1, multi_options=["--filter=blob:none"]
+        )
+        return repo, True
+
+    def _read_meta(self, entry_path: str) -> Optional[Dict]:
+        try:
+            with open(self._meta_path(entry_path), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            return None
+
+    def _write_meta(self, entry_path: str, owner: str, name: str, measure: bool):
+        """Record the entry's use; its size is only re-measured if ``measure``."""
+        previous = None if measure else self._read_meta(entry_path)
+        meta = {
+            "repository": f"{owner}/{name}",
+            "size": previous["size"] if previous else _dir_size(entry_path),
+            "last_used": time.time(),
+        }
+        with open(self._meta_path(entry_path), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+    def entries(self) -> List[Dict]:
+        """List cached repositories with their size and last use time."""
+        entries = []
+        for filename in os.listdir(self.cache_dir):
+            if not filename.endswith(".json"):
+                continue
+            entry_path = os.path.join(self.cache_dir, filename[: -len(".json")])
+            meta = self._read_meta(entry_path)
+            if meta is None:
+                continue
+            meta["path"] = entry_path
+            entries.append(meta)
+        return sorted(entries, key=lambda x: x["last_used"])
+
+    def evict(self, keep: tuple = ()) -> List[str]:
+        """
+        Evict least recently used entries until the cache fits ``max_bytes``.
+
+        Entries in ``keep`` and entries currently checked out are skipped.
+
+        Returns:
+            Repositories that were evicted
+        """
+        entries = self.entries()
+        total = sum(entry["size"] for entry in entries)
+        evicted = []
+
+        for entry in entries:
+            if total <= self.max_bytes:
+                break
+            if entry["path"] in keep:
+                continue
+            with self._locked(entry["path"], blocking=False) as acquired:
+                if not acquired:
+                    continue
+                self._check_inside(entry["path"])
+                _remove_dir(entry["path"])
+                os.remove(self._meta_path(entry["path"]))
+            total -= entry["size"]
+            evicted.append(entry["repository"])
+            logger.info(f"Evicted {entry['repository']} from repository cache")
+
+        return evicted
+
+
+_repo_cache: Optional[RepoMirrorCache] = None
+_repo_cache_guard = threading.Lock()
+
+
+def get_repo_cache() -> RepoMirrorCache:
+    """Return the process-wide repository cache."""
+    global _repo_cache
+    with _repo_cache_guard:
+        if _repo_cache is None:
+            _repo_cache = RepoMirrorCache()
+        return _repo_cache
@@ -0,0 +1,156 @@
+"""
+Single-pass walker that turns a repository checkout into LangChain Documents.
+
+The tree is walked once. Excluded and hidden directories are pruned before
+they are descended into, files are filtered by extension and size from
+their path and ``stat`` alone, and binary files are detected from their
+first bytes before the rest is read. Documents are yielded one at a time,
+so memory use does not grow with the size of the repository.
+"""
+
+import logging
+import os
+import stat
+from typing import Iterator, Optional
+
+from langchain_core.documents import Document
+
+INCLUDE_EXTENSIONS = (".py", ".js", ".ts", ".go", ".java", ".c", ".cpp", ".h")
+EXCLUDED_DIRS = ("venv", "node_modules", "dist", "docs", "tests")
+MAX_FILE_SIZE = 1024 * 1024
+BINARY_SNIFF_BYTES = 8192
+MIN_CONTENT_LENGTH = 50
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+
+def is_indexable_path(rel_path: str) -> bool:
+    """Whether a repository-relative path should be part of the RAG index."""
+    parts = rel_path.split("/")
+    if any(_is_excluded_dir(part) for part in parts[:-1]):
+        return False
+    if parts[-1].startswith("."):
+        return False
+    return rel_path == "README.md" or rel_path.endswith(INCLUDE_EXTENSIONS)
+
+
+def is_indexable_dir(rel_path: str) -> bool:
+    """Whether a repository-relative directory may contain indexed files."""
+    return not any(_is_excluded_dir(part) for part in rel_path.split("/"))
+
+
+def _is_excluded_dir(dirname: str) -> bool:
+    return dirname.startswith(".") or dirname in EXCLUDED_DIRS
+
+
+def make_document(owner: str, name: str, rel_path: str, content: str) -> Document:
+    """Create the Document for one repository file."""
+    return Document(
+        page_content=content,
+        metadata={
+            "source": f"{owner}/{name}/{rel_path}",
+            "path": rel_path,
+            "file_type": rel_path.split(".")[-1],
+        },
+    )
+
+
+def document_from_bytes(
+    owner: str, name: str, rel_path: str, data: bytes
+) -> Optional[Document]:
+    """
+    Decode raw file contents into a Document, or return None if the file is
+    binary, not valid UTF-8 or nearly empty.
+    """
+    if b"\0" in data[:BINARY_SNIFF_BYTES]:
+        logger.debug(f"Skipping binary file: {rel_path}")
+        return None
+    try:
+        content = data.decode("utf-8")
+    except UnicodeDecodeError as e:
+        logger.warning(f"Could not decode {rel_path}: {e}")
+        return None
+    if len(content.strip()) <= MIN_CONTENT_LENGTH:
+        return None
+    return make_document(owner, name, rel_path, content)
+
+
+def load_repo_file(
+    local_path: str,
+    owner: str,
+    name: str,
+    rel_path: str,
+    max_file_size: int = MAX_FILE_SIZE,
+) -> Optional[Document]:
+    """
+    Load one repository file, or return None if it should not be indexed.
+
+    Files that are not regular files, larger than ``max_file_size``, binary
+    (a NUL byte in the first ``BINARY_SNIFF_BYTES``), not valid UTF-8 or
+    nearly empty are skipped.
+    """
+    full_path = os.path.join(local_path, rel_path)
+    try:
+        st = os.lstat(full_path)
+        if not stat.S_ISREG(st.st_mode) or st.st_size > max_file_size:
+            logger.debug(f"Skipping non-regular or large file: {rel_path}")
+            return None
+
+        with open(full_path, "rb") as f:
+            head = f.read(BINARY_SNIFF_BYTES)
+            if b"\0" in head:
+                logger.debug(f"Skipping binary file: {rel_path}")
+                return None
+            data = head + f.read()
+    except OSError as e:
+        logger.warning(f"Could not load {rel_path}: {e}")
+        return None
+
+    return document_from_bytes(owner, name, rel_path, data)
+
+
+def iter_repo_documents(
+    local_path: str,
+    owner: str,
+    name: str,
+    max_file_size: int = MAX_FILE_SIZE,
+) -> Iterator[Document]:
+    """
+    Walk a checkout once and lazily yield a Document per indexable file.
+
+    Args:
+        local_path: Root of the repository checkout
+        owner: Repository owner (for document metadata)
+        name: Repository name (for document metadata)
+        max_file_size: Files larger than this many bytes are skipped
+
+    Yields:
+        Documents in a deterministic (sorted) path order
+    """
+    for rel_path in iter_repo_paths(local_path):
+        doc = load_repo_file(local_path, owner, name, rel_path, max_file_size)
+        if doc is not None:
+            yield doc
+
+
+def iter_repo_paths(local_path: str) -> Iterator[str]:
+    """
+    Yield the repository-relative paths of indexable files in sorted order.
+
+    Only the directory tree is read, so counting the result is a cheap
+    upper bound on the number of documents ``iter_repo_documents`` yields.
+    """
+    for root, dirs, files in os.walk(local_path):
+        # Prune in place so excluded trees are never descended into
+        dirs[:] = sorted(d for d in dirs if not _is_excluded_dir(d))
+
+        rel_root = os.path.relpath(root, local_path).replace(os.sep, "/")
+        for filename in sorted(files):
+            rel_path = filename if rel_root == "." else f"{rel_root}/{filename}"
+            if is_indexable_path(rel_path):
+                yield rel_path
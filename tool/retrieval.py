@@ -0,0 +1,200 @@
+"""
+Per-request retrieval shared by the agents serving the request.
+
+An analyze-issue request runs the root agent (top 5 chunks) and then the
+patch agent (top 10 chunks) over the same issue. Rather than embedding a
+query and searching the index once per agent, the request creates one
+``RetrievalContext`` for the largest k needed; each agent takes the prefix
+it wants, which is the same as its own top-k search would have returned.
+
+If the index version has a lexical index (see ``tool.lexical_index``), the
+search is hybrid: the top ``HYBRID_DEPTH`` chunks of the vector search and
+of the BM25 search are fused by reciprocal rank, so chunks naming the exact
+identifiers of the query rank high even when their embedding does not.
+Before that, names the query mentions (paths, modules, symbols) are looked
+up in the lexical index's inverted index: the chunks defining them come
+first, and the ranked search fills the remaining slots.
+
+Frames of a traceback pasted in the issue (``File "...", line N``) lead the
+context: each is resolved to the chunk whose recorded line range covers the
+line, in the file whose repository path is the longest suffix of the
+frame's path. The suffix must keep at least two path segments, unless the
+frame's path is a bare file name.
+"""
+
+import logging
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+
+from tool.lexical_index import LexicalIndex
+from tool.query_builder import extract_identifiers
+from tool.upstream import get_upstream
+
+load_dotenv()
+# Candidates taken from each of the vector and BM25 rankings before fusion
+HYBRID_DEPTH = int(os.getenv("GIAS_HYBRID_DEPTH", 20))
+# Reciprocal rank fusion constant; larger values flatten the rank weights
+RRF_K = 60
+# Slots of the top k given at most to chunks defining mentioned names
+DIRECT_LOOKUP_MAX = int(os.getenv("GIAS_DIRECT_LOOKUP_MAX", 3))
+# Slots of the top k given at most to chunks of traceback frames
+TRACEBACK_CHUNKS_MAX = int(os.getenv("GIAS_TRACEBACK_CHUNKS_MAX", 3))
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+
+def _canonical(doc: Document) -> Document:
+    # Chroma returns metadata keys in arbitrary order; sorting them renders
+    # the same prompt for the same chunks, which the LLM response cache needs
+    return Document(
+        page_content=doc.page_content, metadata=dict(sorted(doc.metadata.items()))
+    )
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = RRF_K) -> List[str]:
+    """
+    Fuse rankings of ids: each id scores ``sum(1 / (k + rank))`` over the
+    rankings it appears in (rank starting at 1). Ties keep first-seen order.
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, id_ in enumerate(ranking, start=1):
+            scores[id_] = scores.get(id_, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=lambda id_: -scores[id_])
+
+
+class RetrievalContext:
+    """Top-k chunks of one query, searched once and sliced per consumer."""
+
+    def __init__(
+        self,
+        vectorstore,
+        query: str,
+        k: int,
+        lexical: Optional[LexicalIndex] = None,
+        frames: Optional[List[Tuple[str, int]]] = None,
+    ):
+        """
+        Args:
+            vectorstore: Vectorstore of the repository, as opened by
+                ``rag_tool.open_vectorstore``: its searches and fetches by
+                id return documents carrying their chunk ``id``
+            query: Text to search for
+            k: Largest number of chunks any consumer will ask for
+            lexical: Lexical index of the same index version; enables
+                hybrid search
+            frames: ``(path, line)`` of traceback frames, innermost first
+                (see ``query_builder.extract_traceback_frames``)
+        """
+        self.vectorstore = vectorstore
+        self.lexical = lexical
+        self.query = query
+        self.k = k
+        self.frames = frames or []
+        self.searches = 0
+        self._documents: Optional[List[Document]] = None
+        self._lock = threading.Lock()
+
+    def documents(self, k: Optional[int] = None) -> List[Document]:
+        """
+        Return the top ``k`` chunks (default: all), searching on first use.
+
+        Asking for more than the context was created for searches again.
+        """
+        k = k or self.k
+        with self._lock:
+            if self._documents is None or k > self.k:
+                self.k = max(k, self.k)
+                self._documents = [_canonical(doc) for doc in self._search(self.k)]
+                self.searches += 1
+                logger.debug(f"Retrieved {len(self._documents)} chunks (k={self.k})")
+            return self._documents[:k]
+
+    def _search(self, k: int) -> List[Document]:
+        """
+        Chunks of traceback frames, then chunks defining names mentioned in
+        the query, then the top chunks of the vector ranking (fused with the
+        BM25 ranking by reciprocal rank if there is a lexical index), ``k``
+        in all.
+        """
+        documents: Dict[str, Document] = {}
+        ranked = self._frame_chunks(min(TRACEBACK_CHUNKS_MAX, k), documents)
+        if self.lexical is not None and k > len(ranked):
+            direct = self.lexical.lookup(
+                extract_identifiers(self.query),
+                self.query,
+                min(DIRECT_LOOKUP_MAX, k - len(ranked)),
+            )
+            ranked += [id_ for id_ in direct if id_ not in ranked]
+        if ranked:
+            logger.debug(f"{len(ranked)} chunks found by traceback or name: {ranked}")
+
+        if k > len(ranked):
+            depth = k if self.lexical is None else max(k, HYBRID_DEPTH)
+            dense = self.vectorstore.similarity_search_by_vector_with_score(
+                self.vectorstore.embeddings.embed_query(self.query), k=depth
+            )
+            for doc, _ in dense:
+                documents.setdefault(doc.id, doc)
+            ranking = [doc.id for doc, _ in dense]
+            if self.lexical is not None:
+                lexical_ids = [id_ for id_, _ in self.lexical.search(self.query, depth)]
+                ranking = reciprocal_rank_fusion([ranking, lexical_ids])
+            ranked += [id_ for id_ in ranking if id_ not in ranked][: k - len(ranked)]
+
+        # Chunks neither the frames nor the vector search returned
+        missing = [id_ for id_ in ranked if id_ not in documents]
+        if missing:
+            for doc in self.vectorstore.get_by_ids(missing):
+                documents[doc.id] = doc
+        return [documents[id_] for id_ in ranked if id_ in documents]
+
+    def _frame_chunks(self, limit: int, documents: Dict[str, Document]) -> List[str]:
+        """Ids of the chunks covering the traceback frames, adding them to ``documents``."""
+        ids: List[str] = []
+        for path, line in self.frames:
+            if len(ids) >= limit:
+                break
+            parts = path.replace("\\", "/").strip("/").split("/")
+            # At least two segments: a bare basename (utils.py, setup.py,
+            # __init__.py) of a stdlib or site-packages frame would match
+            # an unrelated file of the repository
+            suffixes = ["/".join(parts[i:]) for i in range(max(1, len(parts) - 1))]
+            found = self.vectorstore.get(
+                where={
+                    "$and": [
+                        {"path": {"$in": suffixes}},
+                        {"start_line": {"$lte": line}},
+                        {"end_line": {"$gte": line}},
+                    ]
+                },
+                include=["documents", "metadatas"],
+            )
+            matches = sorted(
+                zip(found["ids"], found["documents"], found["metadatas"]),
+                # The longest matching path, then the first overlapping chunk
+                key=lambda match: (-len(match[2]["path"]), match[2]["start_line"]),
+            )
+            if not matches:
+                continue
+            id_, text, metadata = matches[0]
+            if id_ not in ids:
+                ids.append(id_)
+                documents[id_] = Document(id=id_, page_content=text, metadata=metadata)
+        return ids
+
+    async def adocuments(self, k: Optional[int] = None) -> List[Document]:
+        """Async ``documents``; the search runs on the retrieval pool."""
+        with self._lock:
+            if self._documents is not None and (k or self.k) <= self.k:
+                return self._documents[: k or self.k]
+        return await get_upstream("retrieval").run(self.documents, k)
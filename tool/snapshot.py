@@ -0,0 +1,306 @@
+"""
+Portable, versioned snapshots of repository indexes.
+
+A Chroma persist directory is tied to the Chroma version that wrote it and
+holds every collection of the store. A snapshot is one index version in a
+self-describing directory that any instance can use:
+
+- ``manifest.json``: format version, repository, commit, embedding model,
+  chunker, vector dimension, chunk count, per-file chunk counts and the
+  SHA-256 of every other file
+- ``vectors.npy``: the L2-normalised float32 embeddings, memory-mappable
+- ``chunks.sqlite3``: chunk ids, text and JSON metadata, one row per vector
+- ``lexical.sqlite3``: the BM25 and name index (see ``tool.lexical_index``)
+
+The vectors and chunk table are laid out as a flat index (see
+``tool.flat_index``), so a server mounts a snapshot read-only in place: the
+matrix is mapped and the databases are opened immutable, nothing is loaded
+or copied, and pages are read as queries touch them. ``import_snapshot``
+instead copies it into the local store as a regular index version that later
+builds can update incrementally.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+from tool.code_chunker import chunker_signature
+from tool.flat_index import CHUNKS_FILE, VECTORS_FILE, FlatIndex, FlatVectorStore
+from tool.lexical_index import LexicalIndex
+from tool.rag_tool import (
+    OLLAMA_EMBEDDING_MODEL,
+    _copy_vectors,
+    collection_name,
+    drop_collection,
+    flat_index_path,
+    get_embeddings,
+    lexical_index_path,
+    load_index_state,
+    open_lexical_index,
+    open_vectorstore,
+    read_index_state,
+    save_index_state,
+)
+
+load_dotenv()
+# Snapshot directories the server mounts at startup, separated by os.pathsep
+SNAPSHOT_PATHS = [
+    path for path in os.getenv("GIAS_SNAPSHOTS", "").split(os.pathsep) if path
+]
+
+SNAPSHOT_FORMAT = "gias-index-snapshot"
+SNAPSHOT_FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+LEXICAL_FILE = "lexical.sqlite3"
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+
+class SnapshotError(ValueError):
+    """Raised when a snapshot is malformed or unusable with the current settings."""
+
+
+class Snapshot:
+    """A snapshot mounted read-only."""
+
+    def __init__(self, path: str, manifest: Dict):
+        self.path = path
+        self.manifest = manifest
+        self.owner = manifest["owner"]
+        self.repo = manifest["repo"]
+        # Named after its content, so every instance mounting the same
+        # snapshot shares analysis cache entries
+        self.collection = f"snapshot_{manifest['checksums'][VECTORS_FILE][:16]}"
+        self.vectorstore = FlatVectorStore(
+            FlatIndex(path, name=self.collection, read_only=True), get_embeddings()
+        )
+        lexical_path = os.path.join(path, LEXICAL_FILE)
+        self.lexical = (
+            LexicalIndex(lexical_path, read_only=True)
+            if os.path.exists(lexical_path)
+            else None
+        )
+
+    def info(self) -> Dict:
+        """``collection``, ``commit``, ``updated_at`` and ``snapshot`` path, as listed by the registry."""
+        return {
+            "collection": self.collection,
+            "commit": self.manifest["commit"],
+            "updated_at": self.manifest["created_at"],
+            "snapshot": self.path,
+        }
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024**2), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _compact(path: str):
+    """Fold the WAL into an SQLite file and drop free pages, leaving one self-contained file."""
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("PRAGMA journal_mode=DELETE")
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+
+def read_manifest(path: str) -> Dict:
+    """
+    Read and check the manifest of a snapshot.
+
+    Raises:
+        SnapshotError: If ``path`` is not a snapshot, was written by a newer
+            format version, or was embedded with another model
+    """
+    manifest_path = os.path.join(path, MANIFEST_FILE)
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        raise SnapshotError(f"{path} is not an index snapshot: {e}")
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        raise SnapshotError(f"{path} is not an index snapshot")
+    if manifest.get("format_version", 0) > SNAPSHOT_FORMAT_VERSION:
+        raise SnapshotError(
+            f"{path} has format version {manifest['format_version']}; "
+            f"this version reads up to {SNAPSHOT_FORMAT_VERSION}"
+        )
+    # Queries must be embedded by the model the chunks were embedded with
+    if manifest["embedding_model"] != OLLAMA_EMBEDDING_MODEL:
+        raise SnapshotError(
+            f"{path} was embedded with {manifest['embedding_model']}, "
+            f"not {OLLAMA_EMBEDDING_MODEL}"
+        )
+    return manifest
+
+
+def export_snapshot(repo_owner: str, repo_name: str, path: str) -> Dict:
+    """
+    Write the live index version of a repository as a snapshot.
+
+    Works from either vector backend. The snapshot is written next to
+    ``path`` and renamed into place once complete.
+
+    Args:
+        repo_owner: Repository owner
+        repo_name: Repository name
+        path: Snapshot directory to create; must not exist
+
+    Returns:
+        The snapshot's manifest
+    """
+    state = load_index_state(repo_owner, repo_name)
+    if state is None:
+        raise ValueError(f"{repo_owner}/{repo_name} is not indexed")
+    if os.path.exists(path):
+        raise FileExistsError(f"{path} already exists")
+
+    start = time.perf_counter()
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    try:
+        live = open_vectorstore(repo_owner, repo_name, collection=state["collection"])
+        index = FlatIndex(tmp_path)
+        chunks = _copy_vectors(live, FlatVectorStore(index, get_embeddings()), set())
+        index.flush()
+        index.close()
+        dimension = np.load(os.path.join(tmp_path, VECTORS_FILE), mmap_mode="r").shape[1]
+        _compact(os.path.join(tmp_path, CHUNKS_FILE))
+
+        lexical = open_lexical_index(state["collection"])
+        if lexical is not None:
+            lexical.copy_to(os.path.join(tmp_path, LEXICAL_FILE)).close()
+            lexical.close()
+            _compact(os.path.join(tmp_path, LEXICAL_FILE))
+
+        manifest = {
+            "format": SNAPSHOT_FORMAT,
+            "format_version": SNAPSHOT_FORMAT_VERSION,
+            "owner": repo_owner,
+            "repo": repo_name,
+            "commit": state["commit"],
+            "embedding_model": OLLAMA_EMBEDDING_MODEL,
+            "chunker": state["chunker"],
+            "dimension": dimension,
+            "chunks": chunks,
+            "files": state["files"],
+            "created_at": datetime.now().isoformat(),
+            "checksums": {
+                filename: _sha256(os.path.join(tmp_path, filename))
+                for filename in sorted(os.listdir(tmp_path))
+            },
+        }
+        with open(os.path.join(tmp_path, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, path)
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+    logger.info(
+        f"Exported {repo_owner}/{repo_name}@{(state['commit'] or '?')[:12]} "
+        f"({chunks} chunks) to {path} in {time.perf_counter() - start:.1f}s"
+    )
+    return manifest
+
+
+def verify_snapshot(path: str, manifest: Optional[Dict] = None) -> Dict:
+    """
+    Check every file of a snapshot against its manifest.
+
+    Raises:
+        SnapshotError: If a file is missing or corrupt, or the vectors do
+            not match the recorded shape
+    """
+    manifest = manifest or read_manifest(path)
+    for filename, checksum in manifest["checksums"].items():
+        file_path = os.path.join(path, filename)
+        if not os.path.exists(file_path):
+            raise SnapshotError(f"{path} is missing {filename}")
+        if _sha256(file_path) != checksum:
+            raise SnapshotError(f"{filename} of {path} does not match its checksum")
+    shape = np.load(os.path.join(path, VECTORS_FILE), mmap_mode="r").shape
+    if shape[0] != manifest["chunks"] or (shape[0] and shape[1] != manifest["dimension"]):
+        raise SnapshotError(
+            f"{path} holds {shape} vectors, the manifest records "
+            f"{manifest['chunks']} x {manifest['dimension']}"
+        )
+    return manifest
+
+
+def open_snapshot(path: str) -> Snapshot:
+    """
+    Mount a snapshot read-only, without verifying checksums.
+
+    Raises:
+        SnapshotError: If the manifest is unusable (see ``read_manifest``)
+    """
+    return Snapshot(path, read_manifest(path))
+
+
+def import_snapshot(path: str) -> Dict:
+    """
+    Copy a verified snapshot into the local store as the next index version
+    of its repository and make it live.
+
+    The previously live version is left for a running server to retire; the
+    next server start drops it as an orphan.
+
+    Raises:
+        SnapshotError: If the snapshot is corrupt, or was chunked by another
+            chunker version (its chunks could not be updated incrementally)
+
+    Returns:
+        The snapshot's manifest, with the ``collection`` it was imported as
+    """
+    manifest = verify_snapshot(path)
+    if manifest["chunker"] != chunker_signature():
+        raise SnapshotError(
+            f"{path} was chunked with another chunker version; rebuild the "
+            f"index instead"
+        )
+    owner, repo = manifest["owner"], manifest["repo"]
+    state = read_index_state(owner, repo)
+    version = (state.get("version", 0) if state else 0) + 1
+    collection = collection_name(owner, repo, version)
+    # Left over from a failed build or import
+    drop_collection(collection)
+    target = flat_index_path(collection)
+    try:
+        os.makedirs(target)
+        for filename in (VECTORS_FILE, CHUNKS_FILE):
+            shutil.copyfile(os.path.join(path, filename), os.path.join(target, filename))
+        if os.path.exists(os.path.join(path, LEXICAL_FILE)):
+            os.makedirs(os.path.dirname(lexical_index_path(collection)), exist_ok=True)
+            shutil.copyfile(
+                os.path.join(path, LEXICAL_FILE), lexical_index_path(collection)
+            )
+    except BaseException:
+        drop_collection(collection)
+        raise
+
+    # Go live
+    save_index_state(
+        owner, repo, manifest["commit"], manifest["files"], collection, version
+    )
+    logger.info(f"Imported {path} as {owner}/{repo} [{collection}]")
+    return {**manifest, "collection": collection}
+
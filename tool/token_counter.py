@@ -0,0 +1,214 @@
+"""
+Token counting for chunk sizing.
+
+Chunks are budgeted in tokens of the embedding model rather than characters,
+so dense code is not truncated by the model's context window and sparse code
+is not spread over needlessly many vectors. The embedding model's
+HuggingFace ``tokenizer.json`` is loaded with the ``tokenizers`` library
+from the first available of:
+
+1. The file at GIAS_TOKENIZER_PATH
+2. The copy of the HuggingFace Hub repository GIAS_TOKENIZER_REPO
+   (embeddinggemma's by default) in GIAS_TOKENIZER_CACHE_DIR. Nothing is
+   downloaded on import: run ``python -m tool.token_counter`` once (the
+   repository is gated, so HF_TOKEN must grant access to it), or set
+   GIAS_TOKENIZER_DOWNLOAD=1 to download it on first use.
+
+If neither is available, token counts are approximated with a regex (words,
+numbers and single punctuation characters). The tokenizer name is part of
+the chunker signature, so this is logged as a warning: existing indexes keep
+being served, but the next build of each re-chunks it in full.
+
+The tokenizer is resolved once per process, and chunking worker processes
+are handed the parent's choice (``use_tokenizer``) rather than resolving
+their own, so every chunk matches the signature recorded with the index.
+Counts are cached, because the chunker measures the same lines and pieces
+repeatedly while packing.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+TOKENIZER_PATH = os.getenv("GIAS_TOKENIZER_PATH")
+TOKENIZER_REPO = os.getenv("GIAS_TOKENIZER_REPO", "google/embeddinggemma-300m")
+TOKENIZER_CACHE_DIR = os.getenv("GIAS_TOKENIZER_CACHE_DIR", "./tokenizer_cache")
+TOKENIZER_DOWNLOAD = os.getenv("GIAS_TOKENIZER_DOWNLOAD", "").lower() in (
+    "1", "true", "yes", "on"
+)
+CHUNK_TOKENS = int(os.getenv("GIAS_CHUNK_TOKENS", 512))
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+# Roughly how BPE vocabularies split code: identifiers are cut into pieces of
+# a few characters, every punctuation character is a token of its own
+_APPROX_TOKEN_PATTERN = re.compile(r"[A-Za-z]{1,6}|\d{1,3}|[^\sA-Za-z\d]")
+
+
+def _approximate_count(text: str) -> int:
+    return len(_APPROX_TOKEN_PATTERN.findall(text))
+
+
+def _hub_tokenizer_name() -> str:
+    return f"hf:{TOKENIZER_REPO.rsplit('/', 1)[-1]}"
+
+
+def download_tokenizer() -> str:
+    """Download the tokenizer of GIAS_TOKENIZER_REPO and return its path."""
+    from huggingface_hub import hf_hub_download
+
+    logger.info(f"Downloading the tokenizer of {TOKENIZER_REPO}...")
+    return hf_hub_download(
+        TOKENIZER_REPO, "tokenizer.json", cache_dir=TOKENIZER_CACHE_DIR
+    )
+
+
+def _resolve_tokenizer_file() -> Tuple[str, str]:
+    """Return the tokenizer's name and the path of its ``tokenizer.json``."""
+    if TOKENIZER_PATH:
+        directory = os.path.dirname(os.path.abspath(TOKENIZER_PATH))
+        return f"hf:{os.path.basename(directory)}", TOKENIZER_PATH
+
+    from huggingface_hub import hf_hub_download
+
+    try:
+        path = hf_hub_download(
+            TOKENIZER_REPO,
+            "tokenizer.json",
+            cache_dir=TOKENIZER_CACHE_DIR,
+            local_files_only=True,
+        )
+    except Exception:
+        if not TOKENIZER_DOWNLOAD:
+            raise FileNotFoundError(
+                f"the tokenizer of {TOKENIZER_REPO} is not in "
+                f"{TOKENIZER_CACHE_DIR}; run python -m tool.token_counter"
+            )
+        path = download_tokenizer()
+    return _hub_tokenizer_name(), path
+
+
+def _load_count(path: Optional[str]) -> Callable[[str], int]:
+    """Token count function of a ``tokenizer.json``, the approximation if None."""
+    if path is None:
+        return _approximate_count
+    from tokenizers import Tokenizer
+
+    tokenizer = Tokenizer.from_file(path)
+    return lambda text: len(tokenizer.encode(text, add_special_tokens=False).ids)
+
+
+def _resolve_tokenizer() -> Tuple[str, Optional[str]]:
+    try:
+        name, path = _resolve_tokenizer_file()
+        _load_count(path)
+        return name, path
+    except Exception as e:
+        logger.warning(
+            f"Could not load the embedding tokenizer ({e}); approximating "
+            f"token counts. Indexes chunked with another tokenizer are "
+            f"rebuilt in full"
+        )
+    return "approx", None
+
+
+_tokenizer: Optional[Tuple[str, Optional[str]]] = None
+_tokenizer_guard = threading.Lock()
+
+
+def tokenizer_spec() -> Tuple[str, Optional[str]]:
+    """
+    Name and ``tokenizer.json`` path (None for the approximation) of the
+    tokenizer this process counts with, resolved on first use.
+    """
+    global _tokenizer
+    with _tokenizer_guard:
+        if _tokenizer is None:
+            _tokenizer = _resolve_tokenizer()
+        return _tokenizer
+
+
+def use_tokenizer(name: str, path: Optional[str]):
+    """
+    Count with the given tokenizer (see ``tokenizer_spec``) instead of
+    resolving one. Used as the initializer of chunking worker processes.
+    """
+    global _tokenizer, _token_counter
+    with _tokenizer_guard:
+        _tokenizer = (name, path)
+    with _token_counter_guard:
+        _token_counter = None
+
+
+class TokenCounter:
+    """Counts tokens with a bounded cache of recent results."""
+
+    def __init__(
+        self,
+        count: Optional[Callable[[str], int]] = None,
+        name: Optional[str] = None,
+        cache_size: int = 100_000,
+    ):
+        """
+        Args:
+            count: Function returning the token count of a text. Defaults to
+                the best available tokenizer (see module docstring).
+            name: Tokenizer name, recorded with the index so a tokenizer
+                change forces re-chunking
+            cache_size: Maximum number of cached counts
+        """
+        if count is None:
+            name, path = tokenizer_spec()
+            count = _load_count(path)
+        self.name = name or "custom"
+        self._count = count
+        # Keyed by digest, so the cache does not hold copies of every chunk
+        self._cache: OrderedDict[bytes, int] = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+
+    def __call__(self, text: str) -> int:
+        key = hashlib.blake2b(
+            text.encode("utf-8", "surrogatepass"), digest_size=16
+        ).digest()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+        tokens = self._count(text)
+        with self._lock:
+            self._cache[key] = tokens
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return tokens
+
+
+_token_counter = None
+_token_counter_guard = threading.Lock()
+
+
+def get_token_counter() -> TokenCounter:
+    """Return the process-wide token counter."""
+    global _token_counter
+    with _token_counter_guard:
+        if _token_counter is None:
+            _token_counter = TokenCounter()
+            logger.info(f"Counting chunk tokens with {_token_counter.name}")
+        return _token_counter
+
+
+if __name__ == "__main__":
+    print(download_tokenizer())
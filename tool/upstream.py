@@ -0,0 +1,143 @@
+"""
+Concurrency limits for the services a request depends on.
+
+Request handlers are async. Native async calls (LangChain ``ainvoke`` to the
+LLM) are capped by a per-upstream semaphore, and calls that can only block
+(PyGithub, Chroma, local files) run on the upstream's own bounded thread
+pool. A slow upstream therefore queues only the requests that need it:
+it cannot exhaust the event loop's default executor or stall unrelated
+endpoints such as /api/health.
+
+Limits are configured per upstream through GIAS_<NAME>_CONCURRENCY.
+"""
+
+import asyncio
+import functools
+import logging
+import os
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+UPSTREAM_LIMITS = {
+    # Chat completions (OpenRouter)
+    "llm": int(os.getenv("GIAS_LLM_CONCURRENCY", 16)),
+    # GitHub REST API through PyGithub
+    "github": int(os.getenv("GIAS_GITHUB_CONCURRENCY", 8)),
+    # Opening, leasing and searching Chroma indexes (incl. query embedding)
+    "retrieval": int(os.getenv("GIAS_RETRIEVAL_CONCURRENCY", 8)),
+    # Reading and writing patch files
+    "files": int(os.getenv("GIAS_FILES_CONCURRENCY", 4)),
+}
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+
+class Upstream:
+    """Concurrency limit and worker threads of one upstream service."""
+
+    def __init__(self, name: str, max_concurrency: int):
+        """
+        Args:
+            name: Upstream name, used for thread names and statistics
+            max_concurrency: Calls in flight at the same time; further calls
+                wait on the event loop without holding a thread
+        """
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # One semaphore per event loop, as asyncio primitives are loop-bound
+        self._semaphores: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self._in_flight = 0
+        self._waiting = 0
+        self._guard = threading.Lock()
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with self._guard:
+            semaphore = self._semaphores.get(loop)
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(self.max_concurrency)
+                self._semaphores[loop] = semaphore
+            return semaphore
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._guard:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_concurrency,
+                    thread_name_prefix=f"gias-{self.name}",
+                )
+            return self._executor
+
+    @asynccontextmanager
+    async def limit(self):
+        """Hold one of the upstream's concurrency slots."""
+        semaphore = self._semaphore()
+        self._waiting += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        self._in_flight += 1
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+            semaphore.release()
+
+    async def run(self, func: Callable, *args, **kwargs):
+        """Run a blocking call on the upstream's thread pool and await it."""
+        async with self.limit():
+            return await asyncio.get_running_loop().run_in_executor(
+                self._get_executor(), functools.partial(func, *args, **kwargs)
+            )
+
+    def stats(self) -> Dict:
+        return {
+            "limit": self.max_concurrency,
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+        }
+
+    def shutdown(self):
+        with self._guard:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+
+_upstreams: Dict[str, Upstream] = {}
+_upstreams_guard = threading.Lock()
+
+
+def get_upstream(name: str) -> Upstream:
+    """
+    Return the process-wide limiter of an upstream.
+
+    Raises:
+        KeyError: If ``name`` is not one of ``UPSTREAM_LIMITS``
+    """
+    with _upstreams_guard:
+        upstream = _upstreams.get(name)
+        if upstream is None:
+            upstream = Upstream(name, UPSTREAM_LIMITS[name])
+            _upstreams[name] = upstream
+        return upstream
+
+
+def upstream_stats() -> Dict[str, Dict]:
+    """Statistics of every upstream used so far."""
+    with _upstreams_guard:
+        upstreams = list(_upstreams.values())
+    return {upstream.name: upstream.stats() for upstream in upstreams}